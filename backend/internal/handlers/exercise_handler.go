@@ -3,6 +3,7 @@ package handlers
 
 import (
 	"context"
+	"encoding/base64"
 	"encoding/json"
 	"fmt"
 	"lfk-backend/internal/config"
@@ -14,6 +15,7 @@ import (
 	"lfk-backend/pkg/python_bridge"
 	"log"
 	"net/http"
+	"strings"
 	"sync"
 	"time"
 
@@ -217,6 +219,12 @@ func (h *ExerciseHandler) processClientMessage(client *websocket.Client, message
 		return
 	}
 
+	// Устройство с собственной моделью присылает landmarks вместо кадра
+	if landmarks, ok := clientMsg["landmarks"]; ok {
+		h.handleLandmarks(client, clientMsg, landmarks)
+		return
+	}
+
 	// Получаем кадр
 	frameData, ok := clientMsg["frame"].(string)
 	if !ok {
@@ -245,12 +253,29 @@ func (h *ExerciseHandler) processClientMessage(client *websocket.Client, message
 
 	// Отправляем в Python синхронно (ВСЕГДА для кадров)
 	log.Printf("📤 Sending frame to Python processor for user %s", client.UserID)
-	pythonRequest := map[string]interface{}{
-		"frame":         frameData,
-		"exercise_type": exerciseType,
+	// render=none: клиент рисует оверлей сам, Python возвращает только landmarks
+	render, _ := clientMsg["render"].(string)
+
+	var resp *python_bridge.FrameResponse
+	var err error
+	if frameBytes, decodeErr := decodeFrame(frameData); decodeErr == nil {
+		// Сырой JPEG: без повторной упаковки в base64/JSON на пути к Python
+		resp, err = h.pythonClient.ProcessFrameBinary(ctx, frameBytes, python_bridge.FrameMeta{
+			SessionID:    client.UserID,
+			ExerciseType: exerciseType,
+			Render:       render,
+		})
+	} else {
+		pythonRequest := map[string]interface{}{
+			"frame":         frameData,
+			"exercise_type": exerciseType,
+			"session_id":    client.UserID,
+		}
+		if render != "" {
+			pythonRequest["render"] = render
+		}
+		resp, err = h.pythonClient.ProcessFrame(ctx, pythonRequest)
 	}
-
-	resp, err := h.pythonClient.ProcessFrame(ctx, pythonRequest)
 	if err != nil {
 		log.Printf("❌ Failed to process frame: %v", err)
 		errorMsg := map[string]interface{}{
@@ -289,6 +314,50 @@ func (h *ExerciseHandler) processClientMessage(client *websocket.Client, message
 	}
 }
 
+// handleLandmarks - обработка landmarks, посчитанных на клиенте
+func (h *ExerciseHandler) handleLandmarks(client *websocket.Client, clientMsg map[string]interface{}, landmarks interface{}) {
+	ctx := context.Background()
+
+	exerciseType := client.ExerciseID
+	if et, ok := clientMsg["exercise_type"].(string); ok {
+		exerciseType = et
+	}
+
+	resp, err := h.pythonClient.ProcessLandmarks(ctx, map[string]interface{}{
+		"landmarks":     landmarks,
+		"exercise_type": exerciseType,
+		"session_id":    client.UserID,
+	})
+	if err != nil {
+		log.Printf("❌ Failed to process landmarks: %v", err)
+		errorJSON, _ := json.Marshal(map[string]interface{}{
+			"status":  "error",
+			"message": "Failed to process landmarks",
+		})
+		client.Send <- errorJSON
+		return
+	}
+
+	feedbackJSON, _ := json.Marshal(resp)
+	client.Send <- feedbackJSON
+
+	if resp.Structured != nil && resp.Structured.Completed {
+		log.Printf("🎯 Exercise completed for user %s", client.UserID)
+		go h.saveExerciseStats(client.UserID, exerciseType)
+	}
+}
+
+// decodeFrame - base64 кадра от клиента в байты JPEG (допускается data URL и отсутствие паддинга)
+func decodeFrame(frameData string) ([]byte, error) {
+	if idx := strings.Index(frameData, ","); idx >= 0 && strings.HasPrefix(frameData, "data:") {
+		frameData = frameData[idx+1:]
+	}
+	if frame, err := base64.StdEncoding.DecodeString(frameData); err == nil {
+		return frame, nil
+	}
+	return base64.RawStdEncoding.DecodeString(strings.TrimRight(frameData, "="))
+}
+
 // handleReset - обработка сброса упражнения
 func (h *ExerciseHandler) handleReset(client *websocket.Client) {
 	log.Printf("🔄 Processing reset for user %s", client.UserID)
@@ -306,6 +375,7 @@ func (h *ExerciseHandler) handleReset(client *websocket.Client) {
 	resetRequest := map[string]interface{}{
 		"exercise_type":         client.ExerciseID,
 		"reset_for_new_attempt": true,
+		"session_id":            client.UserID,
 	}
 
 	resp, err := h.pythonClient.ProcessFrame(ctx, resetRequest)
@@ -402,6 +472,7 @@ func (h *ExerciseHandler) GetExerciseState(c *gin.Context) {
 	stateRequest := map[string]interface{}{
 		"exercise_type":  exerciseType,
 		"get_state_only": true,
+		"session_id":     userID,
 	}
 
 	resp, err := h.pythonClient.ProcessFrame(ctx, stateRequest)
@@ -450,6 +521,7 @@ func (h *ExerciseHandler) ResetExercise(c *gin.Context) {
 	resetRequest := map[string]interface{}{
 		"exercise_type":         req.ExerciseType,
 		"reset_for_new_attempt": true,
+		"session_id":            userID,
 	}
 
 	resp, err := h.pythonClient.ProcessFrame(ctx, resetRequest)
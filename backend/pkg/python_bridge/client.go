@@ -4,6 +4,7 @@ package python_bridge
 import (
 	"bytes"
 	"context"
+	"encoding/binary"
 	"encoding/json"
 	"fmt"
 	"io"
@@ -75,9 +76,39 @@ type FrameResponse struct {
 	ExerciseName    string          `json:"exercise_name"`
 	Status          string          `json:"status"`
 	Structured      *StructuredData `json:"structured,omitempty"`
+	Render          string          `json:"render,omitempty"`
+	Landmarks       json.RawMessage `json:"landmarks,omitempty"` // при render=none вместо processed_frame
 	Error           string          `json:"error,omitempty"`
 }
 
+// FrameMeta - метаданные бинарного кадра (передаются заголовками)
+type FrameMeta struct {
+	SessionID    string
+	ExerciseType string
+	Render       string // "frame" (по умолчанию) или "none" - только landmarks без JPEG
+}
+
+// BatchFrame - кадр одной сессии в пачке /process_batch
+type BatchFrame struct {
+	SessionID    string `json:"session_id"`
+	Seq          int64  `json:"seq"`
+	ExerciseType string `json:"exercise_type,omitempty"`
+	Render       string `json:"render,omitempty"`
+	Frame        []byte `json:"-"` // сырой JPEG
+}
+
+// BatchResult - ответ на один кадр пачки: HTTP-статус, как у /process, и тело ответа
+type BatchResult struct {
+	Code   int            `json:"code"`
+	Result *FrameResponse `json:"result"`
+}
+
+// BatchResponse - ответы пачки: Results[session_id][seq]
+type BatchResponse struct {
+	Count   int                               `json:"count"`
+	Results map[string]map[string]BatchResult `json:"results"`
+}
+
 type FrameTask struct {
 	TaskID       string          `json:"task_id"`
 	UserID       string          `json:"user_id"`
@@ -128,24 +159,97 @@ func NewClient(redisClient *redis.RedisClient, cfg *config.PythonProcessorConfig
 
 // ProcessFrame отправляет кадр на обработку (синхронно)
 func (c *Client) ProcessFrame(ctx context.Context, request map[string]interface{}) (*FrameResponse, error) {
-	processor := c.pool.GetNextProcessor()
-	if processor == nil {
-		return nil, fmt.Errorf("no healthy processors available")
+	jsonData, err := json.Marshal(request)
+	if err != nil {
+		return nil, fmt.Errorf("failed to marshal request: %w", err)
 	}
 
+	return c.postProcess(ctx, "/process", "application/json", jsonData, nil)
+}
+
+// ProcessLandmarks отправляет landmarks, посчитанные на устройстве (кадр и инференс не нужны)
+func (c *Client) ProcessLandmarks(ctx context.Context, request map[string]interface{}) (*FrameResponse, error) {
 	jsonData, err := json.Marshal(request)
 	if err != nil {
 		return nil, fmt.Errorf("failed to marshal request: %w", err)
 	}
 
-	url := fmt.Sprintf("http://%s/process", processor.Address)
+	return c.postProcess(ctx, "/process_landmarks", "application/json", jsonData, nil)
+}
+
+// ProcessFrameBinary отправляет сырой JPEG без base64 и JSON, метаданные - в заголовках
+func (c *Client) ProcessFrameBinary(ctx context.Context, frame []byte, meta FrameMeta) (*FrameResponse, error) {
+	headers := map[string]string{
+		"X-Session-ID":    meta.SessionID,
+		"X-Exercise-Type": meta.ExerciseType,
+		"X-Render":        meta.Render,
+	}
+	return c.postProcess(ctx, "/process", "application/octet-stream", frame, headers)
+}
+
+// ProcessBatch отправляет кадры многих сессий одним запросом (application/x-lfk-frames):
+// записи подряд, у каждой - длины метаданных и JPEG (uint32 big-endian), метаданные JSON, JPEG
+func (c *Client) ProcessBatch(ctx context.Context, frames []BatchFrame) (*BatchResponse, error) {
+	var body bytes.Buffer
+	for _, frame := range frames {
+		meta, err := json.Marshal(frame)
+		if err != nil {
+			return nil, fmt.Errorf("failed to marshal batch frame: %w", err)
+		}
+		var header [8]byte
+		binary.BigEndian.PutUint32(header[:4], uint32(len(meta)))
+		binary.BigEndian.PutUint32(header[4:], uint32(len(frame.Frame)))
+		body.Write(header[:])
+		body.Write(meta)
+		body.Write(frame.Frame)
+	}
+
+	respBody, err := c.post(ctx, "/process_batch", "application/x-lfk-frames", body.Bytes(), nil)
+	if err != nil {
+		return nil, err
+	}
+
+	var result BatchResponse
+	if err := json.Unmarshal(respBody, &result); err != nil {
+		return nil, fmt.Errorf("failed to unmarshal batch response: %w", err)
+	}
+
+	return &result, nil
+}
 
-	req, err := http.NewRequestWithContext(ctx, "POST", url, bytes.NewBuffer(jsonData))
+func (c *Client) postProcess(ctx context.Context, path, contentType string, body []byte, headers map[string]string) (*FrameResponse, error) {
+	respBody, err := c.post(ctx, path, contentType, body, headers)
+	if err != nil {
+		return nil, err
+	}
+
+	var result FrameResponse
+	if err := json.Unmarshal(respBody, &result); err != nil {
+		return nil, fmt.Errorf("failed to unmarshal response: %w", err)
+	}
+
+	return &result, nil
+}
+
+func (c *Client) post(ctx context.Context, path, contentType string, body []byte, headers map[string]string) ([]byte, error) {
+	processor := c.pool.GetNextProcessor()
+	if processor == nil {
+		return nil, fmt.Errorf("no healthy processors available")
+	}
+
+	url := fmt.Sprintf("http://%s%s", processor.Address, path)
+
+	req, err := http.NewRequestWithContext(ctx, "POST", url, bytes.NewReader(body))
 	if err != nil {
 		return nil, fmt.Errorf("failed to create request: %w", err)
 	}
 
-	req.Header.Set("Content-Type", "application/json")
+	req.Header.Set("Content-Type", contentType)
+	for name, value := range headers {
+		if value != "" {
+			req.Header.Set(name, value)
+		}
+	}
 
 	resp, err := c.httpClient.Do(req)
 	if err != nil {
@@ -154,21 +258,16 @@ func (c *Client) ProcessFrame(ctx context.Context, request map[string]interface{
 	}
 	defer resp.Body.Close()
 
-	body, err := io.ReadAll(resp.Body)
+	respBody, err := io.ReadAll(resp.Body)
 	if err != nil {
 		return nil, fmt.Errorf("failed to read response: %w", err)
 	}
 
 	if resp.StatusCode != http.StatusOK {
-		return nil, fmt.Errorf("processor returned error %d: %s", resp.StatusCode, string(body))
-	}
-
-	var result FrameResponse
-	if err := json.Unmarshal(body, &result); err != nil {
-		return nil, fmt.Errorf("failed to unmarshal response: %w", err)
+		return nil, fmt.Errorf("processor returned error %d: %s", resp.StatusCode, string(respBody))
 	}
 
-	return &result, nil
+	return respBody, nil
 }
 
 // ProcessFrameAsync отправляет кадр на асинхронную обработку через очередь
@@ -330,7 +429,9 @@ func (p *ProcessorPool) healthCheck() {
 
 		for _, proc := range processors {
 			go func(pInfo *ProcessorInfo) {
-				url := fmt.Sprintf("http://%s/health", pInfo.Address)
+				// /ready, а не /health: процессор жив сразу после старта, но кадры принимает
+				// только после загрузки моделей MediaPipe
+				url := fmt.Sprintf("http://%s/ready", pInfo.Address)
 				resp, err := client.Get(url)
 
 				p.mu.Lock()
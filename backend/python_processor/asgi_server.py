@@ -0,0 +1,449 @@
+"""
+Асинхронный (ASGI) фронтенд процессора
+Те же маршруты и события Socket.IO, что и у exercise_detector.py, но на asyncio + uvicorn
+вместо dev-сервера Werkzeug. Event loop только принимает соединения и пересылает данные:
+декодирование, инференс и кодирование кадра выполняются в пуле потоков (LocalEngine)
+или в воркерах пула процессов (InferencePool).
+
+Запуск: python asgi_server.py [--host 0.0.0.0] [--port 5001]
+    или uvicorn asgi_server:app --host 0.0.0.0 --port 5001
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from email import policy as email_policy
+from email.parser import BytesParser
+from urllib.parse import parse_qs
+
+import socketio
+
+from config import INFERENCE_TIMEOUT, INFERENCE_WORKERS, BATCH_MAX_FRAMES, MAX_BODY_SIZE
+from engine import (create_engine, get_exercise_list, collect_stats, collect_metrics, print_stats, process_request,
+                    landmarks_request, result_completed, BINARY_FRAME_TYPES, frame_meta, split_frame_event,
+                    state_request, parse_etag, state_etag, BATCH_FRAMES_TYPE, parse_batch_frames,
+                    batch_requests, batch_response)
+from logging_setup import setup_logging
+from metrics import stage_metrics, STAGE_JSON
+from readiness import readiness
+from sessions import resolve_session_id
+
+log = setup_logging()
+
+# ==================== ИНИЦИАЛИЗАЦИЯ ====================
+engine = create_engine(INFERENCE_WORKERS)
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', ping_timeout=60,
+                           ping_interval=25, logger=False, engineio_logger=False)
+
+# Socket.IO sid -> идентификатор сессии
+socket_sessions = {}
+
+
+async def run_op(op, session_id, payload=None):
+    """Операция движка вне event loop"""
+    future = asyncio.wrap_future(engine.submit(op, session_id, payload))
+    try:
+        # shield: таймаут не отменяет future движка - кадр дообработается и освободит очередь сессии
+        return await asyncio.wait_for(asyncio.shield(future), timeout=INFERENCE_TIMEOUT)
+    except asyncio.TimeoutError:
+        log.error(f"Таймаут операции {op} (сессия {session_id})")
+        return {"status": "error", "message": "Processing timeout"}, 504
+
+
+async def poll_state(session_id, payload):
+    """Операция state; с wait > 0 - ждет изменения версии, не занимая потоки движка"""
+    wait = payload.get('wait') or 0.0
+    if wait <= 0 or payload.get('since_version') is None:
+        return await run_op('state', session_id, payload)
+
+    deadline = time.monotonic() + wait
+    while True:
+        # Подписка до запроса: изменение между ответом и ожиданием не потеряется
+        changed = engine.watch.watch(session_id, payload['since_version'])
+        result, status = await run_op('state', session_id, payload)
+        remaining = deadline - time.monotonic()
+        if status != 200 or not result.get('unchanged') or remaining <= 0:
+            engine.watch.cancel(session_id, changed)
+            return result, status
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(changed), timeout=remaining)
+        except asyncio.TimeoutError:
+            engine.watch.cancel(session_id, changed)
+            return result, status
+
+# ==================== HTTP ====================
+class Request:
+    """Минимальный HTTP-запрос поверх ASGI scope"""
+
+    def __init__(self, scope, body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        self.args = {key: values[0] for key, values in
+                     parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        self.body = body
+
+    @property
+    def mimetype(self):
+        return self.headers.get('content-type', '').split(';')[0].strip().lower()
+
+    def get_json(self):
+        if not self.body:
+            return None
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+    def header(self, name):
+        return self.headers.get(name.lower())
+
+    def session_id(self, data=None):
+        return resolve_session_id(data, self.headers.get('x-session-id'), self.args.get('session_id'))
+
+
+def parse_multipart(content_type: str, body: bytes):
+    """multipart/form-data -> (текстовые поля, файлы)"""
+    message = BytesParser(policy=email_policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body
+    )
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if not name:
+            continue
+        payload = part.get_payload(decode=True) or b''
+        if part.get_filename() is not None or part.get_content_type() in BINARY_FRAME_TYPES:
+            files[name] = payload
+        else:
+            fields[name] = payload.decode(part.get_content_charset() or 'utf-8')
+    return fields, files
+
+
+def read_frame_request(request):
+    """Тело /process: JSON с base64 (старые клиенты), сырой JPEG или multipart"""
+    if request.mimetype in BINARY_FRAME_TYPES:
+        data = frame_meta(request.header, request.args)
+        data['frame'] = request.body
+        return data
+    if request.mimetype == 'multipart/form-data':
+        fields, files = parse_multipart(request.headers['content-type'], request.body)
+        data = frame_meta(request.header, fields)
+        if files.get('frame'):
+            data['frame'] = files['frame']
+        return data
+    return request.get_json()
+
+
+def read_batch_request(request):
+    """Тело /process_batch: бинарная пачка или JSON {"frames": [...]} с кадрами в base64"""
+    if request.mimetype == BATCH_FRAMES_TYPE:
+        return parse_batch_frames(request.body)
+    data = request.get_json()
+    return data.get('frames') if isinstance(data, dict) else data
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+async def read_body(scope, receive, limit: int) -> bytes:
+    """Тело запроса; больше limit - BodyTooLarge (по Content-Length - до чтения тела)"""
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length' and value.isdigit() and int(value) > limit:
+            raise BodyTooLarge()
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def send_body(send, payload: bytes, content_type: bytes, status=200, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type),
+                    (b'content-length', str(len(payload)).encode())] + list(headers)
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def send_json(send, body, status=200, headers=()):
+    started = time.perf_counter()
+    payload = json.dumps(body).encode('utf-8')
+    if isinstance(body, dict) and 'current_exercise' in body:
+        stage_metrics.observe(STAGE_JSON, body['current_exercise'], time.perf_counter() - started)
+    await send_body(send, payload, b'application/json', status, headers)
+
+
+async def send_not_modified(send, headers=()):
+    await send({'type': 'http.response.start', 'status': 304, 'headers': list(headers)})
+    await send({'type': 'http.response.body', 'body': b''})
+
+# ==================== МАРШРУТЫ ====================
+async def health(request):
+    # Процесс жив: отвечает сразу после старта, не дожидаясь загрузки моделей
+    if not readiness.ready:
+        return {"status": "starting", "ready": False}, 200
+    return {
+        "status": "ok",
+        "ready": True,
+        "current_exercise": engine.current_exercise(request.session_id()) or "fist",
+        "available_exercises": get_exercise_list(),
+        "stats": engine.health_stats()
+    }, 200
+
+
+async def ready(request):
+    # Готовность к кадрам: 503, пока загружаются модели
+    return readiness.info(), 200 if readiness.ready else 503
+
+
+async def list_exercises(request):
+    return {"exercises": get_exercise_list()}, 200
+
+
+async def get_stats(request):
+    return await asyncio.to_thread(collect_stats, engine), 200
+
+
+async def get_metrics(request):
+    # Строка - ответ text/plain (формат Prometheus)
+    return await asyncio.to_thread(collect_metrics, engine), 200
+
+
+async def get_exercise_state(request):
+    payload = state_request(request.args, parse_etag(request.header('If-None-Match')))
+    result, status = await poll_state(request.session_id(), payload)
+    # ETag по версии; совпавший If-None-Match - 304 без тела
+    headers = [(b'etag', state_etag(result['state_version']).encode())] if result.get('state_version') else []
+    if result.get('unchanged') and request.header('If-None-Match'):
+        return None, 304, headers
+    return result, status, headers
+
+
+async def reset_exercise(request):
+    return await run_op('reset', request.session_id(request.get_json()))
+
+
+async def reset_for_new_attempt(request):
+    data = request.get_json() or {}
+    return await run_op('reset_for_new_attempt', request.session_id(data), {
+        "exercise_type": data.get('exercise_type')
+    })
+
+
+async def set_exercise(request):
+    data = request.get_json() or {}
+    return await run_op('set_exercise', request.session_id(data), {
+        "exercise_id": data.get('exercise_id'),
+        "render": data.get('render')
+    })
+
+
+async def process_frame(request):
+    # Сырой JPEG разбирать не нужно; JSON с base64 и multipart разбираются в потоке, не блокируя event loop
+    if request.mimetype in BINARY_FRAME_TYPES:
+        data = read_frame_request(request)
+    else:
+        data = await asyncio.to_thread(read_frame_request, request)
+    if not data:
+        return {"error": "No data provided"}, 400
+
+    op, payload = process_request(data)
+    if op == 'state':
+        return await poll_state(request.session_id(data), payload)
+    return await run_op(op, request.session_id(data), payload)
+
+
+async def process_batch(request):
+    # Кадры многих сессий одним запросом: параллельно в потоках движка или воркерах пула
+    try:
+        # Пачка - до BATCH_MAX_FRAMES кадров: разбор в потоке
+        items = await asyncio.to_thread(read_batch_request, request)
+        if not isinstance(items, list) or not items:
+            return {"error": "No frames provided"}, 400
+        if len(items) > BATCH_MAX_FRAMES:
+            return {"error": f"Too many frames in batch (max {BATCH_MAX_FRAMES})"}, 413
+        requests = await asyncio.to_thread(batch_requests, items)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    replies = await asyncio.gather(*(run_op(op, session_id, payload)
+                                     for session_id, _, op, payload in requests))
+    return batch_response(requests, replies), 200
+
+
+async def process_landmarks(request):
+    data = request.get_json()
+    if not data or not isinstance(data, dict):
+        return {"error": "No data provided"}, 400
+
+    return await run_op('landmarks', request.session_id(data), landmarks_request(data))
+
+
+ROUTES = {
+    ('GET', '/health'): health,
+    ('GET', '/ready'): ready,
+    ('GET', '/exercises'): list_exercises,
+    ('GET', '/stats'): get_stats,
+    ('GET', '/metrics'): get_metrics,
+    ('GET', '/exercise_state'): get_exercise_state,
+    ('POST', '/reset_exercise'): reset_exercise,
+    ('POST', '/reset_for_new_attempt'): reset_for_new_attempt,
+    ('POST', '/set_exercise'): set_exercise,
+    ('POST', '/process'): process_frame,
+    ('POST', '/process_batch'): process_batch,
+    ('POST', '/process_landmarks'): process_landmarks,
+}
+ROUTE_PATHS = {path for _, path in ROUTES}
+
+
+async def stats_reporter():
+    while True:
+        await asyncio.sleep(60)
+        await asyncio.to_thread(engine.evict_idle)
+        await asyncio.to_thread(print_stats, engine)
+
+
+async def lifespan(receive, send):
+    reporter = None
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Воркеры стартуют до приема соединений
+            await asyncio.to_thread(engine.start)
+            # Модели загружаются в фоне: соединения принимаются сразу, готовность - /ready
+            readiness.start(engine.preload)
+            reporter = asyncio.create_task(stats_reporter())
+            log.info(f"ASGI фронтенд запущен (воркеры: {INFERENCE_WORKERS or 'в процессе сервера'})")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if reporter:
+                reporter.cancel()
+            await asyncio.to_thread(engine.shutdown)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def http_app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    try:
+        body = await read_body(scope, receive, MAX_BODY_SIZE)
+    except BodyTooLarge:
+        await send_json(send, {"error": f"Request body too large (max {MAX_BODY_SIZE} bytes)"}, 413)
+        return
+    request = Request(scope, body)
+    handler = ROUTES.get((request.method, request.path))
+    if handler is None:
+        status = 405 if request.path in ROUTE_PATHS else 404
+        await send_json(send, {"status": "error", "message": "Not found"}, status)
+        return
+
+    headers = ()
+    try:
+        # (тело, статус) или (тело, статус, заголовки)
+        body, status, *extra = await handler(request)
+        if extra:
+            headers = extra[0]
+    except Exception as e:
+        log.error(f"Ошибка при обработке {request.path}: {e}")
+        body, status = {"status": "error", "message": str(e)}, 500
+    if status == 304:
+        await send_not_modified(send, headers)
+    elif isinstance(body, str):
+        await send_body(send, body.encode('utf-8'), b'text/plain; version=0.0.4', status, headers)
+    else:
+        await send_json(send, body, status, headers)
+
+# ==================== WEBSOCKET ====================
+@sio.event
+async def connect(sid, environ, auth=None):
+    query = parse_qs(environ.get('QUERY_STRING', ''))
+    session_id = (query.get('session_id') or [sid])[0]
+    socket_sessions[sid] = session_id
+    log.info(f"Клиент подключен: {sid} (сессия {session_id})")
+    await run_op('connect', session_id, {"render": (query.get('render') or [None])[0]})
+
+
+@sio.event
+async def disconnect(sid):
+    session_id = socket_sessions.pop(sid, sid)
+    # Анонимная сессия живет только пока открыт сокет
+    if session_id == sid:
+        await run_op('close', session_id)
+    log.info(f"Клиент отключен: {sid}")
+
+
+@sio.on('frame')
+async def handle_frame(sid, data, attachment=None):
+    try:
+        meta, frame = split_frame_event(data, attachment)
+        if meta is None:
+            await sio.emit('feedback', {"status": "error", "message": "Invalid data format"}, to=sid)
+            return
+
+        session_id = str(meta.get('session_id') or socket_sessions.get(sid, sid))
+        if not frame:
+            await sio.emit('feedback', {"status": "error", "message": "No frame data"}, to=sid)
+            return
+
+        result, _ = await run_op('process', session_id, {
+            "frame": frame,
+            "exercise_type": meta.get('exercise_type'),
+            "render": meta.get('render'),
+            "state_version": meta.get('state_version')
+        })
+        await sio.emit('feedback', result, to=sid)
+        if result_completed(result):
+            log.info(f"Упражнение завершено (сессия {session_id})")
+    except Exception as e:
+        log.error(f"WebSocket ошибка: {e}")
+        await sio.emit('feedback', {"status": "error", "message": str(e)}, to=sid)
+
+
+@sio.on('landmarks')
+async def handle_landmarks(sid, data):
+    try:
+        if not isinstance(data, dict):
+            await sio.emit('feedback', {"status": "error", "message": "Invalid data format"}, to=sid)
+            return
+
+        session_id = str(data.get('session_id') or socket_sessions.get(sid, sid))
+        result, _ = await run_op('landmarks', session_id, landmarks_request(data))
+        await sio.emit('feedback', result, to=sid)
+        if result_completed(result):
+            log.info(f"Упражнение завершено (сессия {session_id})")
+    except Exception as e:
+        log.error(f"WebSocket ошибка: {e}")
+        await sio.emit('feedback', {"status": "error", "message": str(e)}, to=sid)
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=http_app)
+
+# ==================== ЗАПУСК ====================
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="LFK Python processor (ASGI)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
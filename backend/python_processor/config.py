@@ -0,0 +1,97 @@
+"""
+Настройки Python-процессора
+Значения по умолчанию можно переопределить переменными окружения (см. docker-compose)
+"""
+
+import os
+
+# ==================== КОНСТАНТЫ ДЛЯ ОПТИМИЗАЦИИ ====================
+JPEG_QUALITY = 60  # Снижаем качество с 70 до 60
+# Обрабатываем каждый N-й кадр. Под нагрузкой лишние кадры и так отбрасывает почтовый ящик
+# сессии (frame_mailbox.py: обрабатывается только самый свежий), поэтому по умолчанию - каждый
+FRAME_PROCESS_INTERVAL = int(os.environ.get('LFK_FRAME_PROCESS_INTERVAL', 1))
+
+# Адаптивный интервал (frame_controller.py): под нагрузкой интервал растет до MAX_FRAME_INTERVAL,
+# удерживая задержку кадра около TARGET_LATENCY_MS
+ADAPTIVE_INTERVAL = os.environ.get('LFK_ADAPTIVE_INTERVAL', '1') not in ('0', 'false', 'no')
+TARGET_LATENCY_MS = float(os.environ.get('LFK_TARGET_LATENCY_MS', 150))
+MAX_FRAME_INTERVAL = int(os.environ.get('LFK_MAX_FRAME_INTERVAL', 6))
+CPU_HIGH_WATERMARK = float(os.environ.get('LFK_CPU_HIGH_WATERMARK', 0.85))
+DETECTION_CONFIDENCE = 0.4  # Снижаем порог для скорости
+# Разрешение инференса: длинная сторона кадра для MediaPipe, пиксели (0 - без ограничения).
+# Без отрисовки (render=none) JPEG декодируется сразу уменьшенным (frame_decode.py)
+INFERENCE_MAX_SIDE = int(os.environ.get('LFK_INFERENCE_MAX_SIDE', 640))
+
+# Слежение за рукой/головой (roi_tracker.py): инференс на вырезке вокруг прошлой детекции.
+# Вырезка - только после детекции с оценкой не ниже ROI_MIN_SCORE и если она не больше
+# ROI_MAX_AREA кадра; при потере кадр обрабатывается целиком
+ROI_TRACKING = os.environ.get('LFK_ROI_TRACKING', '1') not in ('0', 'false', 'no')
+ROI_MIN_SCORE = float(os.environ.get('LFK_ROI_MIN_SCORE', 0.7))
+ROI_MAX_AREA = float(os.environ.get('LFK_ROI_MAX_AREA', 0.5))
+
+# Пропущенные по интервалу кадры: ответ по модели движения (motion_model.py) вместо "skipped".
+# Предсказание - не дольше PREDICT_MAX_GAP секунд после последней детекции
+PREDICT_SKIPPED = os.environ.get('LFK_PREDICT_SKIPPED', '1') not in ('0', 'false', 'no')
+PREDICT_MAX_GAP = float(os.environ.get('LFK_PREDICT_MAX_GAP', 0.5))
+
+# Пропуск инференса на неподвижных кадрах (motion_gate.py): средняя разница яркости миниатюры
+# с последним кадром инференса (0-255) ниже порога - результаты прошлого инференса,
+# но не больше MOTION_GATE_MAX_REUSE кадров подряд
+MOTION_GATE = os.environ.get('LFK_MOTION_GATE', '1') not in ('0', 'false', 'no')
+MOTION_GATE_THRESHOLD = float(os.environ.get('LFK_MOTION_GATE_THRESHOLD', 2.0))
+MOTION_GATE_MAX_REUSE = int(os.environ.get('LFK_MOTION_GATE_MAX_REUSE', 5))
+
+# Режим ожидания (presence.py): после PRESENCE_IDLE_AFTER кадров подряд без руки/тела
+# инференс - раз в PRESENCE_PROBE_INTERVAL секунд, остальные кадры без обработки (0 - выключено)
+PRESENCE_IDLE_AFTER = int(os.environ.get('LFK_PRESENCE_IDLE_AFTER', 15))
+PRESENCE_PROBE_INTERVAL = float(os.environ.get('LFK_PRESENCE_PROBE_INTERVAL', 1.0))
+
+# Детектор лица вместо MediaPipe Pose для упражнений, которым нужен только нос (шея).
+# Лицо потеряно - кадр и следующие FACE_RETRY_INTERVAL секунд обрабатывает полная поза
+FACE_DETECTOR = os.environ.get('LFK_FACE_DETECTOR', '1') not in ('0', 'false', 'no')
+FACE_RETRY_INTERVAL = float(os.environ.get('LFK_FACE_RETRY_INTERVAL', 2.0))
+
+# Режим ответа: frame - размеченный JPEG в processed_frame, none - только landmarks и состояние
+# (клиент рисует оверлей сам, сервер не рисует и не кодирует кадр)
+RENDER_FRAME = 'frame'
+RENDER_NONE = 'none'
+RENDER_MODES = (RENDER_FRAME, RENDER_NONE)
+DEFAULT_RENDER_MODE = os.environ.get('LFK_RENDER_MODE', RENDER_FRAME)
+
+# Ограничения реестра сессий (LRU + вытеснение по простою)
+SESSION_MAX = int(os.environ.get('LFK_SESSION_MAX', 5000))
+SESSION_IDLE_TTL = float(os.environ.get('LFK_SESSION_IDLE_TTL', 600))
+
+# Загрузка моделей MediaPipe в фоне сразу после старта (readiness.py): до ее окончания /ready
+# отвечает 503. Выключено - модели и упражнения загружаются на первом кадре, процессор готов сразу
+PRELOAD = os.environ.get('LFK_PRELOAD', '1') not in ('0', 'false', 'no')
+# Прогрев при загрузке: кадров через каждую модель на каждую ориентацию кадра (0 - без прогрева).
+# Первый process() графа выделяет память и инициализирует TFLite - платит прогрев, а не первый пациент
+WARMUP_FRAMES = int(os.environ.get('LFK_WARMUP_FRAMES', 3))
+
+# Пул процессов инференса: 0 - обработка в текущем процессе
+INFERENCE_WORKERS = int(os.environ.get('LFK_INFERENCE_WORKERS', 0))
+INFERENCE_TIMEOUT = float(os.environ.get('LFK_INFERENCE_TIMEOUT', 10))
+
+# Пачка кадров многих сессий в одном запросе (/process_batch): не больше кадров в пачке
+BATCH_MAX_FRAMES = int(os.environ.get('LFK_BATCH_MAX_FRAMES', 256))
+# Наибольшее тело HTTP-запроса, байт: больше - 413 без чтения тела целиком (пачка из BATCH_MAX_FRAMES
+# кадров в base64 должна помещаться)
+MAX_BODY_SIZE = int(os.environ.get('LFK_MAX_BODY_SIZE', 64 * 1024 * 1024))
+
+# Потоки для операций движка в асинхронном фронтенде (декодирование, инференс, кодирование)
+EXECUTOR_THREADS = int(os.environ.get('LFK_EXECUTOR_THREADS', os.cpu_count() or 4))
+# Ограничение очереди воркера: при переполнении кадр отклоняется (503), а не копится
+WORKER_QUEUE_LIMIT = int(os.environ.get('LFK_WORKER_QUEUE_LIMIT', 64))
+# forkserver - пре-форк: сервер форков один раз импортирует cv2/MediaPipe, воркеры - его копии
+# (copy-on-write), графы каждый воркер строит свои. Где forkserver нет (Windows) - spawn
+WORKER_START_METHOD = os.environ.get('LFK_WORKER_START_METHOD', 'forkserver' if os.name == 'posix' else 'spawn')
+
+# Запись landmarks сессий (landmark_recorder.py): пустое значение - запись выключена
+RECORD_DIR = os.environ.get('LFK_RECORD_DIR', '')
+# Кадров в одном блоке файла записи и блоков в очереди фонового писателя
+RECORD_CHUNK_FRAMES = int(os.environ.get('LFK_RECORD_CHUNK_FRAMES', 256))
+RECORD_QUEUE_LIMIT = int(os.environ.get('LFK_RECORD_QUEUE_LIMIT', 64))
+
+# Long-poll состояния (/exercise_state?wait=...): максимальное ожидание изменения, секунды
+STATE_POLL_MAX_WAIT = float(os.environ.get('LFK_STATE_POLL_MAX_WAIT', 25))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+БЕНЧМАРК ДЕКОДИРОВАНИЯ: полный кадр против разрешения инференса (frame_decode.py)
+
+Для типичных размеров кадров телефона сравнивает подготовку кадра к MediaPipe:
+  legacy       - прежний код: IMREAD_COLOR в полном разрешении и cvtColor всего кадра;
+  render=frame - полный кадр для оверлея, в RGB переводится уменьшенная копия;
+  render=none  - JPEG декодируется сразу уменьшенным (IMREAD_REDUCED_COLOR_2/4/8) + ресайз остатка.
+С --inference дополнительно замеряется MediaPipe Hands на полном и уменьшенном кадре.
+
+Пример:
+    python debug_frames/bench_decode.py --max-side 640 --inference
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from frame_decode import decode_frame, fit_side  # noqa: E402
+
+# Типичные кадры камеры телефона (ширина, высота)
+FRAME_SIZES = ((640, 480), (1280, 720), (720, 1280), (1920, 1080), (2560, 1440), (3840, 2160))
+
+
+def make_jpeg(width, height, quality=80, seed=1):
+    """Кадр с текстурой (размытый шум + фигуры), чтобы размер JPEG был похож на снимок камеры"""
+    rnd = np.random.default_rng(seed)
+    noise = rnd.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    img = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+    cv2.circle(img, (width // 2, height // 2), min(width, height) // 5, (40, 170, 220), -1)
+    cv2.putText(img, "LFK bench", (10, height // 10), cv2.FONT_HERSHEY_SIMPLEX, height / 480, (255, 255, 255), 2)
+    _, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return np.frombuffer(buffer.tobytes(), np.uint8)
+
+
+def legacy_prepare(buffer, max_side):
+    frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def frame_prepare(buffer, max_side):
+    frame, _ = decode_frame(buffer, max_side, full=True)
+    return cv2.cvtColor(fit_side(frame, max_side), cv2.COLOR_BGR2RGB)
+
+
+def none_prepare(buffer, max_side):
+    frame, _ = decode_frame(buffer, max_side, full=False)
+    return cv2.cvtColor(fit_side(frame, max_side), cv2.COLOR_BGR2RGB)
+
+
+def best_ms(fn, repeat, number):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return best / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк декодирования кадра под инференс")
+    parser.add_argument('--max-side', type=int, default=640, help="LFK_INFERENCE_MAX_SIDE")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    parser.add_argument('--inference', action='store_true', help="замерить MediaPipe Hands")
+    args = parser.parse_args()
+
+    hands = None
+    if args.inference:
+        import mediapipe as mp
+        hands = mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=1, model_complexity=0)
+
+    header = f"{'кадр':<11}{'JPEG КБ':>8}{'legacy':>9}{'frame':>9}{'none':>9}{'вход MP':>11}"
+    if hands:
+        header += f"{'MP полн.':>10}{'MP умен.':>10}"
+    print(f"Длинная сторона инференса: {args.max_side}, время подготовки кадра, мс\n")
+    print(header)
+
+    for width, height in FRAME_SIZES:
+        buffer = make_jpeg(width, height)
+        small = none_prepare(buffer, args.max_side)
+        row = (f"{f'{width}x{height}':<11}{buffer.size / 1024:>8.0f}"
+               f"{best_ms(lambda: legacy_prepare(buffer, args.max_side), args.repeat, args.number):>9.2f}"
+               f"{best_ms(lambda: frame_prepare(buffer, args.max_side), args.repeat, args.number):>9.2f}"
+               f"{best_ms(lambda: none_prepare(buffer, args.max_side), args.repeat, args.number):>9.2f}"
+               f"{f'{small.shape[1]}x{small.shape[0]}':>11}")
+        if hands:
+            full = legacy_prepare(buffer, args.max_side)
+            row += (f"{best_ms(lambda: hands.process(full), args.repeat, 3):>10.2f}"
+                    f"{best_ms(lambda: hands.process(small), args.repeat, 3):>10.2f}")
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+БЕНЧМАРК ДЕТЕКТОРОВ ДЛЯ УПРАЖНЕНИЯ "ШЕЯ": MediaPipe Pose против детектора лица
+
+Упражнению нужен только нос. Сравнивает время кадра:
+  pose - mp_pose.Pose (как get_pose(): видео-режим, без сглаживания);
+  face - mp_face.FaceDetection (как get_face(): BlazeFace ближнего радиуса).
+По умолчанию кадры синтетические (без человека: у позы работает только детектор, сеть точек
+не запускается) - для реальной оценки передайте снимок с человеком в кадре (--image).
+
+Пример:
+    python debug_frames/bench_detectors.py --image person.jpg --frames 200
+"""
+
+import argparse
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+FRAME_SIZES = ((640, 480), (640, 360), (360, 640))
+
+
+def synthetic_frame(width, height, seed=1):
+    rnd = np.random.default_rng(seed)
+    noise = rnd.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    img = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+    cv2.circle(img, (width // 2, height // 3), min(width, height) // 6, (150, 180, 220), -1)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def per_frame_ms(process, frame, frames):
+    # Первые кадры - инициализация графа и трекинга
+    for _ in range(5):
+        process(frame)
+    started = time.perf_counter()
+    for _ in range(frames):
+        result = process(frame)
+    return (time.perf_counter() - started) / frames * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк детекторов для упражнения шеи")
+    parser.add_argument('--image', help="снимок с человеком (по умолчанию - синтетические кадры)")
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--pose-complexity', type=int, default=0, help="model_complexity позы (в сервисе 0)")
+    args = parser.parse_args()
+
+    pose = mp.solutions.pose.Pose(static_image_mode=False, model_complexity=args.pose_complexity,
+                                  smooth_landmarks=False, min_detection_confidence=0.4,
+                                  min_tracking_confidence=0.4)
+    face = mp.solutions.face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.4)
+
+    if args.image:
+        image = cv2.imread(args.image)
+        if image is None:
+            parser.error(f"не удалось прочитать {args.image}")
+        frames = [(f"{image.shape[1]}x{image.shape[0]}", cv2.cvtColor(image, cv2.COLOR_BGR2RGB))]
+    else:
+        frames = [(f"{w}x{h}", synthetic_frame(w, h)) for w, h in FRAME_SIZES]
+
+    print(f"Pose model_complexity={args.pose_complexity}, кадров: {args.frames}, мс на кадр\n")
+    print(f"{'кадр':<11}{'pose':>9}{'face':>9}{'выигрыш':>10}   найдено (pose / face)")
+    for name, frame in frames:
+        frame.flags.writeable = False
+        pose_ms, pose_result = per_frame_ms(pose.process, frame, args.frames)
+        face_ms, face_result = per_frame_ms(face.process, frame, args.frames)
+        print(f"{name:<11}{pose_ms:>9.2f}{face_ms:>9.2f}{pose_ms / face_ms:>9.1f}x   "
+              f"{bool(pose_result.pose_landmarks)} / {bool(face_result.detections)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+БЕНЧМАРК ФРОНТЕНДОВ: Werkzeug (exercise_detector.py) против ASGI (asgi_server.py)
+
+Открывает N keep-alive соединений к /process и гоняет по ним кадры, замеряя пропускную
+способность, задержки и CPU процесса сервера (вместе с воркерами пула).
+Итог - сколько одновременных соединений выдерживает одно ядро при p95 ниже порога.
+
+Пример:
+    python exercise_detector.py &                      # порт 5001
+    python asgi_server.py --port 5002 &
+    python debug_frames/bench_frontends.py --url http://localhost:5001 --server-pid <pid>
+    python debug_frames/bench_frontends.py --url http://localhost:5002 --server-pid <pid>
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+
+def make_frame(width=640, height=480, quality=60):
+    """Синтетический кадр (как в test.py)"""
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.circle(img, (width // 2, height // 2), height // 5, (255, 255, 255), -1)
+    cv2.putText(img, "LFK bench", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    _, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return base64.b64encode(buffer).decode('utf-8')
+
+
+def process_tree_cpu(pid):
+    """CPU-секунды процесса и всех его потомков (воркеры пула)"""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            parents[int(entry)] = (int(fields[1]), int(fields[11]) + int(fields[12]))
+        except (OSError, IndexError):
+            continue
+
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        if current in parents:
+            total += parents[current][1]
+        stack.extend(child for child, (ppid, _) in parents.items() if ppid == current)
+    return total / CLK_TCK
+
+
+async def connection_loop(host, port, body, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = (
+        f"POST /process HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n"
+    ).encode() + body
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError("closed")
+            length, close = 0, False
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value.strip())
+                elif name.lower() == 'connection' and value.strip().lower() == 'close':
+                    close = True
+            await reader.readexactly(length)
+
+            if b' 200 ' in status_line:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors.append(status_line.decode().strip())
+
+            if close:
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+    except (ConnectionError, asyncio.IncompleteReadError, OSError) as e:
+        errors.append(str(e))
+    finally:
+        writer.close()
+
+
+async def run_level(host, port, connections, duration, mode, frame):
+    latencies, errors = [], []
+    body_base = {"exercise_type": "fist-palm"}
+    if mode == 'state':
+        body_base["get_state_only"] = True
+    else:
+        body_base["frame"] = frame
+
+    deadline = time.perf_counter() + duration
+    tasks = []
+    for i in range(connections):
+        body = json.dumps(dict(body_base, session_id=f"bench-{i}")).encode()
+        tasks.append(connection_loop(host, port, body, deadline, latencies, errors))
+    await asyncio.gather(*tasks)
+    return latencies, errors
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--connections', default='1,4,16,64,256')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--mode', choices=('frame', 'state'), default='frame',
+                        help="frame - полный кадр, state - только get_state_only (стоимость фронтенда)")
+    parser.add_argument('--server-pid', type=int, help="PID сервера для замера CPU")
+    parser.add_argument('--target-p95', type=float, default=200.0, help="порог p95, мс")
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    frame = make_frame()
+
+    print(f"{'conn':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'err':>6} {'cpu':>6} {'req/s/core':>11}")
+    best_per_core = 0.0
+    for connections in [int(c) for c in args.connections.split(',')]:
+        cpu_before = process_tree_cpu(args.server_pid) if args.server_pid else None
+        started = time.perf_counter()
+        latencies, errors = asyncio.run(run_level(host, port, connections, args.duration, args.mode, frame))
+        elapsed = time.perf_counter() - started
+
+        rps = len(latencies) / elapsed
+        cores = None
+        if cpu_before is not None:
+            cores = max(1e-6, (process_tree_cpu(args.server_pid) - cpu_before) / elapsed)
+        p95 = percentile(latencies, 95)
+
+        print(f"{connections:>6} {rps:>9.1f} {percentile(latencies, 50):>8.1f} {p95:>8.1f} "
+              f"{len(errors):>6} {cores if cores is not None else float('nan'):>6.2f} "
+              f"{(rps / cores) if cores else float('nan'):>11.1f}")
+
+        if cores and p95 <= args.target_p95 and not errors:
+            best_per_core = max(best_per_core, connections / max(cores, 1.0))
+
+    if args.server_pid:
+        print(f"\nСоединений на ядро при p95 <= {args.target_p95:.0f}мс: {best_per_core:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+БЕНЧМАРК РАЗБОРА LANDMARKS: обход объектов по атрибутам против массива NumPy
+
+Сравнивает на одних и тех же точках руки:
+  legacy - прежний код: get_finger_states и проверка "Считалочки" обходят hand_landmarks.landmark[i]
+           (для "Считалочки" - три обхода за кадр: калибровка, состояния, касание),
+           ответ render=none - еще один обход (landmarks_to_list);
+  array  - точки один раз переводятся в (21, 3) float32, дальше - операции над массивом;
+  batch  - те же функции над пачкой кадров (N, 21, 3), как при разборе записи сессии.
+Если установлен mediapipe, точки - настоящие protobuf NormalizedLandmarkList.
+
+Для одной руки сами операции NumPy не быстрее обхода атрибутов (накладные расходы вызова
+сравнимы с 21 точкой) - выигрыш дает единственный перевод в массив на кадр, который затем
+переиспользуют упражнение, ответ и запись, и обработка пачками.
+
+Пример:
+    python debug_frames/bench_landmarks.py --frames 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from exercises import LandmarkList  # noqa: E402
+from exercises.landmark_math import (HAND_TIPS, HAND_DIPS, HAND_MCPS, hand_array, raised_fingers,  # noqa: E402
+                                     finger_states, tip_positions, manhattan)
+
+FRAME_SHAPE = (480, 640, 3)
+FINGER_TIPS = (4, 8, 12, 16, 20)
+FINGER_PIPS = (3, 6, 10, 14, 18)
+FINGER_MCP = (1, 5, 9, 13, 17)
+
+
+def make_hands(count, seed=1):
+    """Случайные руки: protobuf MediaPipe, если он есть, иначе LandmarkList"""
+    rnd = random.Random(seed)
+    raw = [[(rnd.random(), rnd.random(), rnd.uniform(-0.1, 0.1)) for _ in range(21)] for _ in range(count)]
+    try:
+        from mediapipe.framework.formats import landmark_pb2
+    except ImportError:
+        return [LandmarkList.from_points(points) for points in raw], 'LandmarkList'
+
+    hands = []
+    for points in raw:
+        hand = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z in points:
+            hand.landmark.add(x=x, y=y, z=z)
+        hands.append(hand)
+    return hands, 'protobuf'
+
+
+# ==================== ПРЕЖНИЙ КОД ====================
+def legacy_finger_states(hand_landmarks, frame_shape, pips=FINGER_PIPS):
+    h, w, _ = frame_shape
+    finger_states, tip_positions = [], []
+    for i in range(5):
+        tip = hand_landmarks.landmark[FINGER_TIPS[i]]
+        pip = hand_landmarks.landmark[pips[i]]
+        tip_positions.append((int(tip.x * w), int(tip.y * h)))
+        if i == 0:
+            index_mcp = hand_landmarks.landmark[5]
+            finger_states.append(abs(tip.x - index_mcp.x) + abs(tip.y - index_mcp.y) > 0.15)
+        else:
+            finger_states.append(tip.y < pip.y - 0.02)
+    return finger_states, tip_positions
+
+
+def legacy_finger_touching(hand_landmarks, frame_shape, sizes):
+    for i in range(5):
+        tip = hand_landmarks.landmark[FINGER_TIPS[i]]
+        mcp = hand_landmarks.landmark[FINGER_MCP[i]]
+        sizes[i] = sizes[i] * 0.7 + abs(tip.y - mcp.y) * 0.3
+    states = legacy_finger_states(hand_landmarks, frame_shape, tuple(t - 1 for t in FINGER_TIPS))
+    thumb, target = hand_landmarks.landmark[4], hand_landmarks.landmark[8]
+    return states, abs(thumb.x - target.x) + abs(thumb.y - target.y)
+
+
+def legacy_landmarks_out(hand_landmarks):
+    return [[round(p.x, 4), round(p.y, 4), round(p.z, 4)] for p in hand_landmarks.landmark]
+
+
+def legacy_frame(hand_landmarks):
+    legacy_finger_states(hand_landmarks, FRAME_SHAPE)
+    return legacy_landmarks_out(hand_landmarks)
+
+
+def legacy_touching_frame(hand_landmarks):
+    legacy_finger_touching(hand_landmarks, FRAME_SHAPE, [0.0] * 5)
+    return legacy_landmarks_out(hand_landmarks)
+
+
+# ==================== МАССИВ ====================
+def array_finger_states(points, frame_shape):
+    return finger_states(points), tip_positions(points, frame_shape)
+
+
+def array_finger_touching(points, frame_shape, sizes):
+    sizes = sizes * 0.7 + np.abs(points[HAND_TIPS, 1] - points[HAND_MCPS, 1]) * 0.3
+    states = finger_states(points, HAND_DIPS), tip_positions(points, frame_shape)
+    return states, manhattan(points, 4, 8)
+
+
+def array_landmarks_out(points):
+    return points.astype(np.float64).round(4).tolist()
+
+
+def array_frame(hand_landmarks):
+    points = hand_array(hand_landmarks)
+    array_finger_states(points, FRAME_SHAPE)
+    return array_landmarks_out(points)
+
+
+def array_touching_frame(hand_landmarks):
+    points = hand_array(hand_landmarks)
+    array_finger_touching(points, FRAME_SHAPE, np.zeros(5))
+    return array_landmarks_out(points)
+
+
+def per_frame_us(fn, hands, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for hand in hands:
+            fn(hand)
+        best = min(best, time.perf_counter() - started)
+    return best / len(hands) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора landmarks")
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    hands, kind = make_hands(args.frames)
+    arrays = np.stack([hand_array(hand) for hand in hands])
+
+    # Состояния пальцев должны совпадать с прежним кодом
+    for hand in hands:
+        assert legacy_finger_states(hand, FRAME_SHAPE)[0] == array_finger_states(hand_array(hand), FRAME_SHAPE)[0]
+
+    rows = [
+        ("кадр render=none: legacy", per_frame_us(legacy_frame, hands, args.repeat)),
+        ("кадр render=none: array", per_frame_us(array_frame, hands, args.repeat)),
+        ("Считалочка, render=none: legacy", per_frame_us(legacy_touching_frame, hands, args.repeat)),
+        ("Считалочка, render=none: array", per_frame_us(array_touching_frame, hands, args.repeat)),
+        ("get_finger_states: legacy",
+         per_frame_us(lambda hand: legacy_finger_states(hand, FRAME_SHAPE), hands, args.repeat)),
+        ("get_finger_states: array",
+         per_frame_us(lambda hand: array_finger_states(hand_array(hand), FRAME_SHAPE), hands, args.repeat)),
+        ("только перевод в массив", per_frame_us(hand_array, hands, args.repeat)),
+    ]
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        raised_fingers(arrays)
+        best = min(best, time.perf_counter() - started)
+    rows.append(("состояния пальцев: пачка (N, 21, 3)", best / len(arrays) * 1e6))
+
+    print(f"Точки: {kind}, кадров: {args.frames}\n")
+    print(f"{'операция':<36}{'мкс/кадр':>10}")
+    for name, value in rows:
+        print(f"{name:<36}{value:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
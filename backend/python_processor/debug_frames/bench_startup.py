@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+БЕНЧМАРК ЗАПУСКА ПРОЦЕССОРА: импорт, построение и прогрев моделей, первый кадр
+
+Каждый замер - отдельный процесс Python (холодный старт, как у перезапуска или новой реплики):
+  import_frontend   - импорт фронтенда (exercise_detector: Flask/Socket.IO и движок, без cv2/MediaPipe);
+  import_processing - импорт обработки (exercise_manager: cv2, MediaPipe, упражнения);
+  model_*           - построение графов MediaPipe (preload(), в сервисе - фоновый поток readiness.py);
+  warmup_*          - прогон синтетических кадров (LFK_WARMUP_FRAMES);
+  first_frame       - первый кадр сессии;
+  steady_frame      - медиана следующих кадров.
+Режимы: warm - модели построены и прогреты до первого кадра (по умолчанию в сервисе),
+preload - построены без прогрева (LFK_WARMUP_FRAMES=0), lazy - их строит первый кадр (LFK_PRELOAD=0).
+
+С --workers N дополнительно сравниваются способы запуска пула воркеров (spawn и пре-форк forkserver):
+время до готовности всех воркеров (preload), первый кадр в каждом воркере и память воркеров
+(PSS - доля общих страниц делится между процессами; только Linux).
+По умолчанию кадры синтетические (без руки) - для реальной оценки передайте снимок (--image).
+
+Пример:
+    python debug_frames/bench_startup.py --runs 3 --exercise fist --image hand.jpg --workers 4
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Кадры бенчмарка должны доходить до инференса: без пропуска по интервалу, по неподвижности
+# и без режима ожидания (на синтетических кадрах нет руки)
+CHILD_ENV = {
+    'LFK_ADAPTIVE_INTERVAL': '0',
+    'LFK_FRAME_PROCESS_INTERVAL': '1',
+    'LFK_MOTION_GATE': '0',
+    'LFK_PRESENCE_IDLE_AFTER': '0',
+}
+
+STAGES = ('import_frontend', 'import_processing', 'model_hand', 'model_pose', 'model_face',
+          'warmup_hand', 'warmup_pose', 'warmup_face', 'warmup_codec', 'first_frame', 'steady_frame')
+
+# Режим -> (режим дочернего процесса, окружение)
+MODES = {
+    'warm': ('preload', {}),
+    'preload': ('preload', {'LFK_WARMUP_FRAMES': '0'}),
+    'lazy': ('lazy', {}),
+}
+
+POOL_STAGES = ('pool_ready', 'first_frame', 'steady_frame', 'worker_pss_mb')
+START_METHODS = ('spawn', 'forkserver')
+
+
+def make_jpegs(image_path, count):
+    """Кадры сессии: снимок или синтетика, сдвинутые на пару пикселей от кадра к кадру"""
+    import cv2
+    import numpy as np
+
+    if image_path:
+        image = cv2.imread(image_path)
+        if image is None:
+            raise SystemExit(f"не удалось прочитать {image_path}")
+    else:
+        rnd = np.random.default_rng(1)
+        noise = rnd.integers(0, 256, (61, 81, 3), dtype=np.uint8)
+        image = cv2.resize(noise, (640, 480), interpolation=cv2.INTER_CUBIC)
+        cv2.circle(image, (320, 240), 90, (150, 180, 220), -1)
+    jpegs = []
+    for idx in range(count):
+        shifted = np.roll(image, 2 * (idx % 5), axis=1)
+        _, buffer = cv2.imencode('.jpg', shifted, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        jpegs.append(buffer.tobytes())
+    return jpegs
+
+
+def child(args):
+    """Один холодный старт: время этапов в JSON на stdout"""
+    sys.path.insert(0, ROOT)
+    timings = {}
+
+    started = time.perf_counter()
+    try:
+        import exercise_detector  # noqa: F401
+        timings['import_frontend'] = time.perf_counter() - started
+    except ImportError:
+        # Flask не установлен - замеряется только обработка
+        pass
+
+    started = time.perf_counter()
+    import exercise_manager
+    timings['import_processing'] = time.perf_counter() - started
+
+    if args.mode == 'preload':
+        timings.update(exercise_manager.preload())
+
+    jpegs = make_jpegs(args.image, args.frames + 1)
+    manager = exercise_manager.ExerciseManager('bench')
+    manager.set_exercise(args.exercise)
+
+    started = time.perf_counter()
+    manager.process_frame(jpegs[0], render=args.render)
+    timings['first_frame'] = time.perf_counter() - started
+
+    steady = []
+    for jpeg in jpegs[1:]:
+        started = time.perf_counter()
+        manager.process_frame(jpeg, render=args.render)
+        steady.append(time.perf_counter() - started)
+    timings['steady_frame'] = statistics.median(steady)
+    print(json.dumps(timings))
+
+
+def worker_pss_mb(pid):
+    """PSS процесса, МБ (None - не Linux)"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def pool_child(args):
+    """Холодный старт пула воркеров: готовность, первый кадр каждого воркера, память"""
+    sys.path.insert(0, ROOT)
+    from inference_pool import InferencePool
+
+    timings = {}
+    jpegs = make_jpegs(args.image, args.frames + 1)
+    started = time.perf_counter()
+    pool = InferencePool(args.workers, start_method=args.pool).start()
+    pool.preload()
+    timings['pool_ready'] = time.perf_counter() - started
+
+    # По сессии на воркер
+    sessions = {}
+    for idx in range(args.workers * 100):
+        sessions.setdefault(pool.worker_for(f'bench-{idx}'), f'bench-{idx}')
+    payload = {"exercise_type": args.exercise, "render": args.render}
+
+    first = []
+    for session_id in sessions.values():
+        started = time.perf_counter()
+        pool.call('process', session_id, dict(payload, frame=jpegs[0]))
+        first.append(time.perf_counter() - started)
+    timings['first_frame'] = max(first)
+
+    steady = []
+    for jpeg in jpegs[1:]:
+        for session_id in sessions.values():
+            started = time.perf_counter()
+            pool.call('process', session_id, dict(payload, frame=jpeg))
+            steady.append(time.perf_counter() - started)
+    timings['steady_frame'] = statistics.median(steady)
+
+    pss = [worker_pss_mb(proc.pid) for proc in pool._procs]
+    if None not in pss:
+        timings['worker_pss_mb'] = sum(pss) / len(pss)
+    pool.shutdown()
+    print(json.dumps(timings))
+
+
+def run_child(args, mode, pool=None):
+    child_mode, extra_env = MODES.get(mode, ('preload', {}))
+    env = dict(os.environ, **CHILD_ENV, **extra_env)
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', '--mode', child_mode,
+           '--exercise', args.exercise, '--frames', str(args.frames), '--render', args.render]
+    if args.image:
+        cmd += ['--image', args.image]
+    if pool:
+        cmd += ['--pool', pool, '--workers', str(args.workers)]
+    started = time.perf_counter()
+    output = subprocess.run(cmd, env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    total = time.perf_counter() - started
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['total'] = total
+    return timings
+
+
+def print_table(results, stages, columns):
+    print(f"{'этап':<19}" + ''.join(f"{column:>12}" for column in columns))
+    for stage in stages:
+        row = f"{stage:<19}"
+        # Время - в мс, память (*_mb) - как есть
+        scale = 1 if stage.endswith('_mb') else 1000
+        for column in columns:
+            values = [run[stage] for run in results[column] if stage in run]
+            row += f"{statistics.median(values) * scale:>12.1f}" if values else f"{'-':>12}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк запуска процессора")
+    parser.add_argument('--runs', type=int, default=3, help="холодных стартов на режим (медиана)")
+    parser.add_argument('--frames', type=int, default=30, help="кадров после первого")
+    parser.add_argument('--exercise', default='fist')
+    parser.add_argument('--render', default='frame', choices=('frame', 'none'))
+    parser.add_argument('--image', help="снимок с рукой/человеком (по умолчанию - синтетические кадры)")
+    parser.add_argument('--workers', type=int, default=0, help="сравнить запуск пула из N воркеров")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', default='preload', choices=('preload', 'lazy'), help=argparse.SUPPRESS)
+    parser.add_argument('--pool', choices=START_METHODS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        pool_child(args) if args.pool else child(args)
+        return
+
+    print(f"Упражнение {args.exercise}, render={args.render}, стартов на режим: {args.runs}, мс (медиана)\n")
+    results = {mode: [run_child(args, mode) for _ in range(args.runs)] for mode in MODES}
+    print_table(results, STAGES + ('total',), tuple(MODES))
+
+    if args.workers > 0:
+        print(f"\nПул из {args.workers} воркеров, мс (worker_pss_mb - МБ на воркер)\n")
+        results = {method: [run_child(args, 'warm', pool=method) for _ in range(args.runs)]
+                   for method in START_METHODS}
+        print_table(results, POOL_STAGES + ('total',), START_METHODS)
+
+
+if __name__ == '__main__':
+    main()
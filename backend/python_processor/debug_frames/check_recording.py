@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+ПРОВЕРКА ЗАПИСИ СЕССИИ: запись landmarks -> воспроизведение дает тот же timeline
+
+Синтетическая сессия упражнения для шеи (движения головы с удержанием, кадры без лица)
+проходит через упражнение так же, как в ExerciseManager, и одновременно пишется в *.lfkrec
+(landmark_recorder.py). Затем запись воспроизводится (exercises.replay) и timeline сверяется
+с живым прогоном. Источники точек:
+  face - детектор лица: в записи поза из одного носа (остальные точки NaN);
+  pose - MediaPipe Pose: все 33 точки.
+MediaPipe не нужен.
+
+Пример:
+    python debug_frames/check_recording.py --frames 600
+"""
+
+import argparse
+import copy
+import math
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from exercises import EXERCISE_CLASSES  # noqa: E402
+from exercises.clock import ManualClock  # noqa: E402
+from exercises.landmark_math import POSE_SUBSET, POSE_POINTS_COUNT, POSE_ROW_NOSE, nose_pose  # noqa: E402
+from exercises.replay import diff_timelines, load_recording, replay  # noqa: E402
+from landmark_recorder import KIND_POSE, RecordingWriter, SessionRecorder  # noqa: E402
+
+EXERCISE = 'neck'
+FRAME_SHAPE = (480, 640, 3)
+FPS = 30
+# Смещение носа на каждом движении упражнения (вперед, влево, назад, вправо) и нейтраль
+MOVES = ((0.0, 0.03), (0.03, 0.0), (0.0, -0.03), (-0.03, 0.0))
+
+
+def make_session(frames, seed=1):
+    """Кадры (t, нос [x, y] или None): движения по 2.5 с с нейтралью между ними, дрожание, пропуски"""
+    rnd = np.random.default_rng(seed)
+    t0 = 1_700_000_000.0
+    session = []
+    for idx in range(frames):
+        t = t0 + idx / FPS
+        phase = (idx // (FPS * 5 // 2)) % (2 * len(MOVES))
+        dx, dy = MOVES[phase // 2] if phase % 2 else (0.0, 0.0)
+        if rnd.random() < 0.03:
+            session.append((t, None))
+            continue
+        nose = (0.5 + dx + rnd.normal(0, 0.001), 0.4 + dy + rnd.normal(0, 0.001))
+        session.append((t, nose))
+    return session
+
+
+def source_points(source, nose, score=0.9):
+    """Точки кадра от детектора: (точки упражнению, точки записи, уверенность записи)"""
+    if source == 'face':
+        # Как face_points(): нос и плечи с нулевой видимостью
+        points = np.zeros((3, 4), dtype=np.float32)
+        points[POSE_ROW_NOSE] = (nose[0], nose[1], 0.0, score)
+        return points, nose_pose(points[POSE_ROW_NOSE]), score
+    full = np.zeros((POSE_POINTS_COUNT, 4), dtype=np.float32)
+    full[:, 3] = 0.9
+    full[POSE_SUBSET[0], :2] = nose
+    full[POSE_SUBSET[1], :2] = (0.4, 0.6)
+    full[POSE_SUBSET[2], :2] = (0.6, 0.6)
+    return full[list(POSE_SUBSET)], full, float(full[:, 3].mean())
+
+
+def live_timeline(source, session, recorder):
+    """Прогон как в ExerciseManager: кадр без лица/тела не доходит до упражнения, но пишется"""
+    exercise = EXERCISE_CLASSES[EXERCISE]()
+    clock = ManualClock()
+    exercise.set_clock(clock)
+    timeline = []
+    for t, nose in session:
+        clock.set(t)
+        if nose is None:
+            recorder.record(KIND_POSE, timestamp=t)
+            is_correct, message = False, "Тело не обнаружено"
+        else:
+            points, recorded, confidence = source_points(source, nose)
+            is_correct, message = exercise.evaluate_pose(points, FRAME_SHAPE, source=source)
+            recorder.record(KIND_POSE, recorded, confidence, timestamp=t)
+        timeline.append({
+            "t": t,
+            "detected": nose is not None,
+            "correct": bool(is_correct),
+            "message": message,
+            "structured": copy.deepcopy(exercise.get_structured_data())
+        })
+    return timeline
+
+
+def check(source, frames, directory):
+    writer = RecordingWriter()
+    recorder = SessionRecorder(os.path.join(directory, f'{source}.lfkrec'), chunk_frames=128, writer=writer)
+    session = make_session(frames)
+    expected = live_timeline(source, session, recorder)
+    recorder.close()
+    writer.flush()
+
+    recorded = load_recording(recorder.path)
+    timeline = replay(EXERCISE, recorded)
+    # Запись хранит время и точки как есть - расхождение означает потерю данных при записи/чтении
+    mismatch = diff_timelines(timeline, expected)
+    completed = expected[-1]["structured"]["progress_percent"] if expected else math.nan
+    print(f"{source:<5} кадров {len(recorded):>5}, прогресс {completed:>5.1f}%: "
+          f"{'timeline совпадает' if mismatch is None else 'РАСХОЖДЕНИЕ ' + mismatch}")
+    return mismatch is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка записи и воспроизведения сессии")
+    parser.add_argument('--frames', type=int, default=600)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        ok = all([check(source, args.frames, directory) for source in ('face', 'pose')])
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
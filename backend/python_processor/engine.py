@@ -0,0 +1,696 @@
+"""
+Движок обработки: операции над сессиями упражнений
+Фронтенды (Flask/Socket.IO) не трогают ExerciseManager напрямую - только через engine.call(),
+поэтому одни и те же операции выполняются и в текущем процессе, и в воркерах пула.
+"""
+
+import json
+import logging
+import struct
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Tuple
+
+from config import SESSION_MAX, SESSION_IDLE_TTL, EXECUTOR_THREADS, STATE_POLL_MAX_WAIT, INFERENCE_TIMEOUT
+from frame_controller import load_monitor
+from frame_mailbox import TURN
+from landmark_recorder import recording_writer
+from metrics import STAT_COUNTERS, stage_metrics, render_prometheus
+from sessions import SessionRegistry, resolve_session_id
+from state_watch import StateWatch
+
+log = logging.getLogger('LFK')
+
+def structured_state(manager):
+    if hasattr(manager.current_exercise, 'get_structured_data'):
+        return manager.current_exercise.get_structured_data()
+    return None
+
+
+def state_version(value):
+    """state_version из запроса клиента (версия structured-состояния, которая у него есть)"""
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def state_etag(version) -> str:
+    """ETag ответа о состоянии: версии уникальны в процессе, номера достаточно"""
+    return f'"{version}"'
+
+
+def parse_etag(value):
+    """If-None-Match -> версия состояния (первая из перечисленных, W/ допускается)"""
+    if not value:
+        return None
+    tag = value.split(',')[0].strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    return state_version(tag.strip('"'))
+
+
+def poll_wait(value) -> float:
+    """Параметр wait long-poll (секунды), ограниченный STATE_POLL_MAX_WAIT"""
+    try:
+        return max(0.0, min(float(value), STATE_POLL_MAX_WAIT))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def state_request(data: Dict[str, Any], since_version=None) -> Dict[str, Any]:
+    """Запрос состояния (/exercise_state, get_state_only) -> payload операции state"""
+    return {
+        "exercise_type": data.get('exercise_type') or data.get('type') or 'fist-palm',
+        "since_version": state_version(data.get('since_version', since_version)),
+        "wait": poll_wait(data.get('wait'))
+    }
+
+
+def notify_state(watch: StateWatch, session_id: str, reply):
+    """После операции над сессией: будим long-poll, если версия состояния могла измениться"""
+    result, _ = reply
+    if not isinstance(result, dict):
+        watch.notify(session_id)
+    elif result.get('status') != 'skipped':
+        # Ответ без версии (сброс, смена упражнения, ошибка) - версия неизвестна
+        watch.notify(session_id, result.get('state_version'))
+
+
+def resolve_future(future: Future, reply):
+    """Ответ в future, если его еще ждут: ASGI-фронтенд может отменить future по таймауту"""
+    # После set_running_or_notify_cancel() отмена из другого потока уже не пройдет
+    if not future.done() and future.set_running_or_notify_cancel():
+        future.set_result(reply)
+
+
+def poll_state(engine, session_id: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Операция state; с wait > 0 - ждет, пока версия не станет отличаться от since_version"""
+    wait = payload.get('wait') or 0.0
+    if wait <= 0 or payload.get('since_version') is None:
+        return engine.call('state', session_id, payload)
+
+    deadline = time.monotonic() + wait
+    while True:
+        # Подписка до запроса: изменение между ответом и ожиданием не потеряется
+        changed = engine.watch.watch(session_id, payload['since_version'])
+        result, status = engine.call('state', session_id, payload)
+        remaining = deadline - time.monotonic()
+        if status != 200 or not result.get('unchanged') or remaining <= 0:
+            engine.watch.cancel(session_id, changed)
+            return result, status
+        try:
+            changed.result(timeout=remaining)
+        except FutureTimeoutError:
+            engine.watch.cancel(session_id, changed)
+            return result, status
+
+
+def result_completed(result) -> bool:
+    """Упражнение завершено по ответу на кадр (полные structured-данные или дельта)"""
+    if not result:
+        return False
+    structured = result.get('structured') or result.get('structured_delta')
+    return bool(structured and structured.get('completed'))
+
+
+def merge_stats(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Складывает "сырую" статистику движков (процессов) в итоговую для /stats"""
+    totals = {key: 0 for key in STAT_COUNTERS}
+    processing_time_total = 0.0
+    sessions_info = {"active": 0, "max_sessions": 0, "idle_ttl": 0, "created": 0, "evicted": 0}
+
+    for part in parts:
+        for key in STAT_COUNTERS:
+            totals[key] += part.get(key, 0)
+        processing_time_total += part.get('processing_time_total', 0.0)
+        info = part.get('sessions', {})
+        for key in ('active', 'max_sessions', 'created', 'evicted'):
+            sessions_info[key] += info.get(key, 0)
+        sessions_info['idle_ttl'] = info.get('idle_ttl', sessions_info['idle_ttl'])
+
+    totals['avg_processing_time'] = (
+        processing_time_total / totals['frames_processed'] if totals['frames_processed'] else 0
+    )
+    totals['sessions'] = sessions_info
+    return totals
+
+
+def dropped_response(exercise_id=None, dropped=True) -> Dict[str, Any]:
+    """Ответ на кадр, вытесненный более новым кадром той же сессии (или пропущенный по интервалу)"""
+    response = {
+        "hand_detected": False,
+        "raised_fingers": 0,
+        "finger_states": [False] * 5,
+        "message": "",
+        "processed_frame": "",
+        "current_exercise": exercise_id,
+        "status": "skipped"
+    }
+    if dropped:
+        response["dropped"] = True
+    return response
+
+
+def landmarks_request(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Тело /process_landmarks и события landmarks -> payload операции"""
+    return {
+        "landmarks": data.get('landmarks'),
+        "exercise_type": data.get('exercise_type'),
+        "state_version": data.get('state_version'),
+        "mark_completed": True
+    }
+
+
+def process_request(data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Разбирает тело /process в (операция, payload)"""
+    if data.get('get_state_only'):
+        return 'state', state_request(data)
+    if data.get('reset_for_new_attempt'):
+        return 'reset_for_new_attempt', {"exercise_type": data.get('exercise_type', 'fist-palm')}
+    return 'process', {
+        "frame": data.get('frame'),
+        "exercise_type": data.get('exercise_type'),
+        "render": data.get('render'),
+        "state_version": data.get('state_version'),
+        "mark_completed": True
+    }
+
+
+# Content-Type тела /process с сырым JPEG вместо JSON
+BINARY_FRAME_TYPES = ('application/octet-stream', 'image/jpeg')
+
+# Метаданные бинарного кадра в заголовках
+FRAME_META_HEADERS = {
+    'X-Session-ID': 'session_id',
+    'X-Exercise-Type': 'exercise_type',
+    'X-Render': 'render',
+    'X-State-Version': 'state_version',
+}
+
+
+def frame_meta(get_header, fields: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Метаданные бинарного кадра: query/поля формы, поверх них - заголовки X-*"""
+    meta = dict(fields or {})
+    for header, key in FRAME_META_HEADERS.items():
+        value = get_header(header)
+        if value:
+            meta[key] = value
+    return meta
+
+
+# Content-Type бинарной пачки /process_batch: записи подряд, у каждой заголовок BATCH_RECORD
+# (длина метаданных JSON, длина JPEG), затем метаданные и сам JPEG
+BATCH_FRAMES_TYPE = 'application/x-lfk-frames'
+BATCH_RECORD = struct.Struct('>II')
+
+
+def parse_batch_frames(body: bytes) -> List[Dict[str, Any]]:
+    """Бинарная пачка -> элементы (метаданные кадра и frame с байтами JPEG)"""
+    items = []
+    offset = 0
+    while offset < len(body):
+        if offset + BATCH_RECORD.size > len(body):
+            raise ValueError("Truncated batch record header")
+        meta_size, frame_size = BATCH_RECORD.unpack_from(body, offset)
+        offset += BATCH_RECORD.size
+        end = offset + meta_size + frame_size
+        if end > len(body):
+            raise ValueError("Truncated batch record")
+        item = json.loads(body[offset:offset + meta_size]) if meta_size else {}
+        if not isinstance(item, dict):
+            raise ValueError("Batch record metadata must be an object")
+        if frame_size:
+            item['frame'] = body[offset + meta_size:end]
+        items.append(item)
+        offset = end
+    return items
+
+
+def batch_requests(items: List[Any]) -> List[Tuple[str, str, str, Dict[str, Any]]]:
+    """Элементы пачки -> (сессия, номер, операция, payload)
+
+    Элемент - то же, что тело /process (или /process_landmarks с полем landmarks), плюс session_id
+    и seq (по умолчанию - позиция в пачке). Long-poll состояния в пачке не ждет.
+    """
+    requests = []
+    for idx, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"Batch item {idx} must be an object")
+        if item.get('landmarks') is not None:
+            op, payload = 'landmarks', landmarks_request(item)
+        else:
+            op, payload = process_request(item)
+        if op == 'state':
+            payload['wait'] = 0.0
+        requests.append((resolve_session_id(item), str(item.get('seq', idx)), op, payload))
+    return requests
+
+
+def batch_response(requests, replies) -> Dict[str, Any]:
+    """Ответ /process_batch: results[сессия][номер] = {"code": HTTP-статус кадра, "result": ответ}"""
+    results = {}
+    for (session_id, seq, _, _), (result, status) in zip(requests, replies):
+        results.setdefault(session_id, {})[seq] = {"code": status, "result": result}
+    return {"status": "success", "count": len(replies), "results": results}
+
+
+def run_batch(engine, requests, timeout: float = INFERENCE_TIMEOUT) -> Dict[str, Any]:
+    """Операции пачки параллельно (потоки движка или воркеры пула); общий таймаут на пачку"""
+    futures = [engine.submit(op, session_id, payload) for session_id, _, op, payload in requests]
+    deadline = time.monotonic() + timeout
+    replies = []
+    for future in futures:
+        try:
+            replies.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            replies.append(({"status": "error", "message": "Processing timeout"}, 504))
+    return batch_response(requests, replies)
+
+
+def split_frame_event(data, attachment=None):
+    """Событие Socket.IO frame -> (метаданные, кадр)
+
+    Поддерживаются: {'frame': base64 | bytes, ...}, сырые байты без метаданных
+    и пара (метаданные, байты) - бинарное вложение отдельным аргументом.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        return {}, data
+    if not isinstance(data, dict):
+        return None, None
+    frame = attachment if attachment is not None else data.get('frame')
+    return data, frame
+
+
+_exercise_catalog = None
+
+
+def get_exercise_list():
+    """Список упражнений (не зависит от сессии); первый вызов импортирует пакет упражнений"""
+    global _exercise_catalog
+    if _exercise_catalog is None:
+        from exercises import EXERCISE_CLASSES
+        _exercise_catalog = [{"id": ex_id, "name": ex_class().name}
+                             for ex_id, ex_class in EXERCISE_CLASSES.items()]
+    return _exercise_catalog
+
+
+def collect_stats(engine):
+    stats = engine.stats()
+    stats['pool'] = engine.info()
+    stats['adaptive'] = load_monitor.info()
+    return stats
+
+
+def collect_metrics(engine) -> str:
+    """Текст /metrics: гистограммы этапов всех процессов и счетчики /stats"""
+    return render_prometheus(engine.metrics(), collect_stats(engine))
+
+
+def print_stats(engine):
+    stats = collect_stats(engine)
+    log.info("=" * 60)
+    log.info("СТАТИСТИКА РАБОТЫ:")
+    log.info(f"  Активных сессий: {stats['sessions']['active']}")
+    log.info(f"  Обработано кадров: {stats['frames_processed']}")
+    log.info(f"  Пропущено кадров: {stats['frames_skipped']} (вытеснено новыми: {stats['frames_dropped']}, "
+             f"ответов по модели движения: {stats['frames_predicted']})")
+    log.info(f"  Landmarks от клиентов: {stats['landmarks_processed']}")
+    log.info(f"  Рук обнаружено: {stats['hands_detected']}")
+    log.info(f"  Поз обнаружено: {stats['pose_detected']} (по детектору лица: {stats['face_frames']}, "
+             f"переходов на полную позу: {stats['face_fallbacks']})")
+    log.info(f"  Кадров по рамке слежения: {stats['roi_frames']} (потерь: {stats['roi_fallbacks']})")
+    log.info(f"  Неподвижных кадров без инференса: {stats['frames_gated']}")
+    log.info(f"  Кадров в режиме ожидания (нет пациента): {stats['frames_idle']}")
+    log.info(f"  Среднее время: {stats['avg_processing_time']:.1f}ms")
+    if stats['pool']['workers']:
+        log.info(f"  Очереди воркеров: {stats['pool']['queue_depth']}")
+    if stats['adaptive']['adaptive']:
+        log.info(f"  Интервал кадров: {stats['adaptive']['interval']} "
+                 f"(задержка {stats['adaptive']['latency_ms']}ms, CPU {stats['adaptive']['cpu']:.0%})")
+    log.info("=" * 60)
+
+
+class LocalEngine:
+    """Выполняет операции над сессиями в текущем процессе"""
+
+    def __init__(self, max_sessions=SESSION_MAX, idle_ttl=SESSION_IDLE_TTL):
+        self.sessions = SessionRegistry(self._new_session, max_sessions=max_sessions,
+                                        idle_ttl=idle_ttl, on_evict=self._retire_session)
+        # Время этапов загрузки (preload), пока ее не было - None
+        self._preloaded = None
+        # Статистика вытесненных сессий, чтобы /stats не "забывал" обработанные кадры
+        self._retired = {key: 0 for key in STAT_COUNTERS}
+        self._retired['processing_time_total'] = 0.0
+        self._retired_lock = threading.Lock()
+        # Long-poll состояния сессий
+        self.watch = StateWatch()
+        # Потоки для асинхронного фронтенда (cv2 и MediaPipe отпускают GIL)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        self._ops = {
+            'process': self._op_process,
+            'predict': self._op_predict,
+            'landmarks': self._op_landmarks,
+            'state': self._op_state,
+            'reset': self._op_reset,
+            'reset_for_new_attempt': self._op_reset_for_new_attempt,
+            'set_exercise': self._op_set_exercise,
+            'connect': self._op_connect,
+            'close': self._op_close,
+        }
+
+    # ============ ИНТЕРФЕЙС ДВИЖКА ============
+
+    def start(self):
+        return self
+
+    def preload(self) -> Dict[str, float]:
+        """Импорт модулей обработки и графы MediaPipe заранее; время этапов, секунды"""
+        if self._preloaded is None:
+            started = time.perf_counter()
+            import exercise_manager
+            timings = {'import': time.perf_counter() - started}
+            timings.update(exercise_manager.preload())
+            started = time.perf_counter()
+            get_exercise_list()
+            timings['exercises'] = time.perf_counter() - started
+            self._preloaded = timings
+        return self._preloaded
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        for manager in self.sessions.sessions():
+            manager.close()
+        recording_writer.flush()
+
+    def call(self, op: str, session_id: str, payload: Dict[str, Any] = None) -> Tuple[Dict[str, Any], int]:
+        """Выполняет операцию и возвращает (ответ, HTTP-статус)"""
+        handler = self._ops.get(op)
+        if handler is None:
+            return {"status": "error", "message": f"Unknown operation: {op}"}, 400
+        return self._run(op, session_id, handler, payload or {})
+
+    def _run(self, op: str, session_id: str, handler, *args) -> Tuple[Dict[str, Any], int]:
+        try:
+            reply = handler(session_id, *args)
+        except Exception as e:
+            return self._failed(op, session_id, e)
+        if op != 'state':
+            notify_state(self.watch, session_id, reply)
+        return reply
+
+    def _failed(self, op: str, session_id: str, error: Exception) -> Tuple[Dict[str, Any], int]:
+        log.error(f"Ошибка операции {op} (сессия {session_id}): {error}")
+        import traceback
+        traceback.print_exc()
+        reply = {"status": "error", "message": str(error)}, 500
+        if op != 'state':
+            notify_state(self.watch, session_id, reply)
+        return reply
+
+    def submit(self, op: str, session_id: str, payload: Dict[str, Any] = None) -> Future:
+        """Выполняет операцию в пуле потоков, не блокируя вызывающий (event loop)"""
+        if op == 'process':
+            return self._submit_frame(session_id, payload or {})
+        return self._pool().submit(self.call, op, session_id, payload)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=EXECUTOR_THREADS,
+                                                        thread_name_prefix='lfk-engine')
+        return self._executor
+
+    def _submit_frame(self, session_id: str, payload) -> Future:
+        """Кадр без потока на ожидание: кадр, ждущий предыдущий кадр своей сессии, не занимает
+        поток пула - его обработка ставится в пул, когда до него дойдет очередь (как в InferencePool)"""
+        result = Future()
+
+        def run(manager, started):
+            resolve_future(result, self._run('process', session_id, self._process_turn, manager, payload, started))
+
+        def on_turn(manager, started, turn):
+            if turn.result() == TURN:
+                self._pool().submit(run, manager, started)
+            else:
+                resolve_future(result, (dropped_response(manager.current_exercise_id), 200))
+
+        def offer():
+            started = time.perf_counter()
+            try:
+                manager = self.sessions.get(session_id)
+            except Exception as e:
+                resolve_future(result, self._failed('process', session_id, e))
+                return
+            entry, run_now = manager.mailbox.offer(payload)
+            if run_now:
+                run(manager, started)
+            else:
+                entry.future.add_done_callback(lambda turn: on_turn(manager, started, turn))
+
+        if payload.get('frame'):
+            self._pool().submit(offer)
+        else:
+            result.set_result(({"error": "No frame provided"}, 400))
+        return result
+
+    def raw_stats(self) -> Dict[str, Any]:
+        """Статистика этого процесса в виде, пригодном для merge_stats()"""
+        with self._retired_lock:
+            totals = dict(self._retired)
+        for manager in self.sessions.sessions():
+            for key, value in self._session_counters(manager).items():
+                totals[key] += value
+        totals['sessions'] = self.sessions.info()
+        return totals
+
+    def stats(self) -> Dict[str, Any]:
+        return merge_stats([self.raw_stats()])
+
+    def info(self) -> Dict[str, Any]:
+        return {"mode": "local", "workers": 0, "queue_depth": []}
+
+    def metrics(self):
+        return stage_metrics.snapshot()
+
+    def current_exercise(self, session_id: str):
+        manager = self.sessions.peek(session_id)
+        return manager.current_exercise_id if manager else None
+
+    def evict_idle(self) -> int:
+        return self.sessions.evict_idle()
+
+    def health_stats(self) -> Dict[str, Any]:
+        """Сводка для /health: только состояние этого процесса"""
+        stats = self.stats()
+        return {
+            "frames_processed": stats['frames_processed'],
+            "avg_processing_time": round(stats['avg_processing_time'], 1),
+            "active_sessions": stats['sessions']['active'],
+            "workers": 0
+        }
+
+    # ============ ОПЕРАЦИИ ============
+
+    @staticmethod
+    def _new_session(session_id):
+        # Импорт здесь: тяжелые модули (cv2, mediapipe) загружаются с первой сессией или в preload(),
+        # а не при импорте фронтенда
+        from exercise_manager import ExerciseManager
+        return ExerciseManager(session_id)
+
+    @staticmethod
+    def _session_counters(manager) -> Dict[str, Any]:
+        stats = manager.stats
+        counters = {key: stats.get(key, 0) for key in STAT_COUNTERS}
+        counters['frames_dropped'] = manager.mailbox.dropped
+        counters['processing_time_total'] = stats['avg_processing_time'] * stats['frames_processed']
+        return counters
+
+    def _retire_session(self, session_id, manager):
+        manager.close()
+        counters = self._session_counters(manager)
+        with self._retired_lock:
+            for key, value in counters.items():
+                self._retired[key] += value
+
+    def _op_process(self, session_id, payload):
+        frame = payload.get('frame')
+        if not frame:
+            return {"error": "No frame provided"}, 400
+
+        started = time.perf_counter()
+        manager = self.sessions.get(session_id)
+
+        # Пока обрабатывается предыдущий кадр сессии, этот ждет; более новый кадр его вытеснит.
+        # Синхронный вызов (Flask) ждет в своем потоке запроса, но не дольше INFERENCE_TIMEOUT
+        entry, run_now = manager.mailbox.offer(payload)
+        if not run_now:
+            try:
+                turn = entry.future.result(timeout=INFERENCE_TIMEOUT)
+            except FutureTimeoutError:
+                # Очередь дойдет до кадра позже - она передается дальше без обработки
+                entry.future.add_done_callback(lambda late: late.result() == TURN and self._skip_turn(manager))
+                return {"status": "error", "message": "Processing timeout"}, 504
+            if turn != TURN:
+                return dropped_response(manager.current_exercise_id), 200
+        return self._process_turn(session_id, manager, payload, started)
+
+    @staticmethod
+    def _skip_turn(manager):
+        following = manager.mailbox.complete(False)
+        if following is not None:
+            following.future.set_result(TURN)
+
+    def _process_turn(self, session_id, manager, payload, started):
+        """Кадр, до которого дошла очередь сессии; по завершении очередь переходит к ждущему кадру"""
+        frame = payload['frame']
+        result = None
+        try:
+            with manager.lock:
+                if payload.get('exercise_type'):
+                    manager.set_exercise(payload['exercise_type'])
+                manager.acked_state_version = state_version(payload.get('state_version'))
+
+                result = manager.process_frame(frame, render=payload.get('render'))
+                self._mark_completed(manager, payload, result)
+        finally:
+            # Ответ по модели движения или в режиме ожидания - кадр не обрабатывался, в задержку не идет
+            processed = (bool(result) and result.get('status') == 'success'
+                         and not (result.get('predicted') or result.get('idle')))
+            following = manager.mailbox.complete(processed)
+            if following is not None:
+                following.future.set_result(TURN)
+
+        if result:
+            if processed:
+                manager.controller.record((time.perf_counter() - started) * 1000)
+            result['pipeline'] = dict(manager.mailbox.info(), **manager.controller.info())
+        return result, 200
+
+    def _op_predict(self, session_id, payload):
+        """Кадр, пропущенный пулом по интервалу: ответ по модели движения без самого кадра"""
+        manager = self.sessions.get(session_id)
+        with manager.lock:
+            if payload.get('exercise_type'):
+                manager.set_exercise(payload['exercise_type'])
+            manager.acked_state_version = state_version(payload.get('state_version'))
+
+            result = manager.predict_frame()
+            self._mark_completed(manager, payload, result)
+        return result, 200
+
+    def _op_landmarks(self, session_id, payload):
+        landmarks = payload.get('landmarks')
+        if not isinstance(landmarks, dict):
+            return {"error": "No landmarks provided"}, 400
+
+        manager = self.sessions.get(session_id)
+        with manager.lock:
+            if payload.get('exercise_type'):
+                manager.set_exercise(payload['exercise_type'])
+            manager.acked_state_version = state_version(payload.get('state_version'))
+
+            result = manager.process_landmarks(landmarks)
+            self._mark_completed(manager, payload, result)
+
+        return result, 400 if result.get('status') == 'error' else 200
+
+    @staticmethod
+    def _mark_completed(manager, payload, result):
+        # HTTP-клиент (Go) сбрасывает упражнение при следующем старте после завершения
+        structured = structured_state(manager) if payload.get('mark_completed') and result else None
+        if structured and structured.get('completed'):
+            if hasattr(manager.current_exercise, 'mark_for_reset'):
+                manager.current_exercise.mark_for_reset()
+
+    def _op_state(self, session_id, payload):
+        manager = self.sessions.get(session_id)
+        with manager.lock:
+            exercise_type = payload.get('exercise_type', 'fist-palm')
+            if exercise_type != manager.current_exercise_id:
+                manager.set_exercise(exercise_type)
+
+            version, structured = manager.current_exercise.structured_state()
+            if version and payload.get('since_version') == version:
+                # У клиента актуальное состояние (HTTP-фронтенд отвечает 304 на If-None-Match)
+                return {
+                    "status": "success",
+                    "unchanged": True,
+                    "state_version": version,
+                    "current_exercise": manager.current_exercise_id
+                }, 200
+
+            return {
+                "status": "success",
+                "current_exercise": manager.current_exercise_id,
+                "exercise_name": manager.current_exercise.name,
+                "structured": structured,
+                "state_version": version,
+                "auto_reset": getattr(manager.current_exercise, 'auto_reset_on_next_start', False),
+                "message": "State check"
+            }, 200
+
+    def _op_reset(self, session_id, payload):
+        manager = self.sessions.get(session_id)
+        with manager.lock:
+            if manager.reset_current_exercise():
+                return {"status": "success", "message": "Exercise reset successfully"}, 200
+        return {"status": "error", "message": "Exercise does not support reset"}, 400
+
+    def _op_reset_for_new_attempt(self, session_id, payload):
+        manager = self.sessions.get(session_id)
+        with manager.lock:
+            exercise_type = payload.get('exercise_type')
+            if exercise_type and exercise_type != manager.current_exercise_id:
+                manager.set_exercise(exercise_type)
+
+            if manager.reset_exercise_for_new_attempt():
+                return {
+                    "status": "success",
+                    "message": "Exercise reset for new attempt",
+                    "structured": structured_state(manager)
+                }, 200
+        return {"status": "error", "message": "Exercise does not support reset"}, 400
+
+    def _op_set_exercise(self, session_id, payload):
+        manager = self.sessions.get(session_id)
+        with manager.lock:
+            # Режим ответа сессии (render) можно сменить вместе с упражнением или отдельно
+            if payload.get('render') and not manager.set_render_mode(payload['render']):
+                return {"status": "error", "message": f"Unknown render mode: {payload['render']}"}, 400
+            if payload.get('exercise_id') is None and payload.get('render'):
+                return {"status": "success", "current_exercise": manager.current_exercise_id,
+                        "render": manager.render_mode}, 200
+            if manager.set_exercise(payload.get('exercise_id')):
+                return {"status": "success", "current_exercise": manager.current_exercise_id,
+                        "render": manager.render_mode}, 200
+        return {"status": "error", "message": "Exercise not found"}, 400
+
+    def _op_connect(self, session_id, payload):
+        manager = self.sessions.get(session_id)
+        with manager.lock:
+            if payload.get('render'):
+                manager.set_render_mode(payload['render'])
+            if getattr(manager.current_exercise, 'auto_reset_on_next_start', False):
+                manager.reset_exercise_for_new_attempt()
+            else:
+                manager.reset_current_exercise()
+        return {"status": "success"}, 200
+
+    def _op_close(self, session_id, payload):
+        removed = self.sessions.remove(session_id)
+        return {"status": "success", "removed": removed}, 200
+
+
+def create_engine(workers: int = 0):
+    """Движок в текущем процессе или пул процессов с привязкой сессий к воркерам"""
+    if workers > 0:
+        from inference_pool import InferencePool
+        return InferencePool(workers)
+    return LocalEngine()
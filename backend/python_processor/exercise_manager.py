@@ -0,0 +1,839 @@
+"""
+Менеджер упражнений: декодирование кадра, MediaPipe и логика упражнения для одной сессии
+Модели MediaPipe и упражнения сессии создаются лениво - в режиме пула каждый процесс строит свои графы
+"""
+
+import base64
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from types import SimpleNamespace
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from config import (JPEG_QUALITY, DETECTION_CONFIDENCE, INFERENCE_MAX_SIDE, FACE_DETECTOR, FACE_RETRY_INTERVAL,
+                    RENDER_NONE, RENDER_MODES, DEFAULT_RENDER_MODE, WARMUP_FRAMES)
+from exercises import EXERCISE_CLASSES, LandmarkList
+from exercises.landmark_math import (hand_array, pose_array, landmarks_array, nose_pose, POSE_SUBSET,
+                                     POSE_ROW_NOSE, POSE_ROW_LEFT_SHOULDER, POSE_ROW_RIGHT_SHOULDER)
+from exercises.overlay import SkeletonStyle, draw_skeleton, panel_cache
+from frame_controller import IntervalController
+from frame_decode import decode_frame, fit_side
+from frame_mailbox import FrameMailbox
+from landmark_recorder import SessionRecorder, KIND_HAND, KIND_POSE
+from motion_gate import MotionGate
+from motion_model import MotionModel
+from presence import Presence
+from roi_tracker import RoiTracker, to_frame
+from metrics import (stage_metrics, STAGE_BASE64, STAGE_IMDECODE, STAGE_RESIZE, STAGE_GATE, STAGE_COLOR,
+                     STAGE_INFERENCE, STAGE_EXERCISE, STAGE_DRAW, STAGE_ENCODE, STAGE_TOTAL)
+from sessions import DEFAULT_SESSION_ID
+
+# Отключаем ненужные логи MediaPipe
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+os.environ['MEDIAPIPE_DISABLE_GPU'] = '1'
+
+log = logging.getLogger('LFK')
+
+# ==================== МОДЕЛИ ====================
+mp_hands = mp.solutions.hands
+mp_pose = mp.solutions.pose
+mp_face = mp.solutions.face_detection
+mp_drawing = mp.solutions.drawing_utils
+mp_drawing_styles = mp.solutions.drawing_styles
+
+_hands = None
+_pose = None
+_face = None
+_models_lock = threading.Lock()
+
+# Графы MediaPipe не потокобезопасны - общий доступ из сессий сериализуем
+inference_lock = threading.Lock()
+
+
+def get_hands():
+    global _hands
+    if _hands is None:
+        with _models_lock:
+            if _hands is None:
+                # Оптимизированные параметры MediaPipe
+                _hands = mp_hands.Hands(
+                    static_image_mode=False,
+                    max_num_hands=1,
+                    min_detection_confidence=DETECTION_CONFIDENCE,
+                    min_tracking_confidence=DETECTION_CONFIDENCE,
+                    model_complexity=0  # Используем самую простую модель
+                )
+    return _hands
+
+
+def get_pose():
+    global _pose
+    if _pose is None:
+        with _models_lock:
+            if _pose is None:
+                _pose = mp_pose.Pose(
+                    static_image_mode=False,
+                    model_complexity=0,  # Самая простая модель
+                    smooth_landmarks=False,  # Отключаем сглаживание
+                    min_detection_confidence=DETECTION_CONFIDENCE,
+                    min_tracking_confidence=DETECTION_CONFIDENCE
+                )
+    return _pose
+
+
+def get_face():
+    global _face
+    if _face is None:
+        with _models_lock:
+            if _face is None:
+                # BlazeFace ближнего радиуса (до ~2 м): вход 128x128 против детектора и сети позы
+                _face = mp_face.FaceDetection(
+                    model_selection=0,
+                    min_detection_confidence=DETECTION_CONFIDENCE
+                )
+    return _face
+
+
+_MODELS = {'hand': get_hands, 'pose': get_pose, 'face': get_face}
+
+
+def preload(warmup_frames=WARMUP_FRAMES):
+    """Строит и прогревает графы MediaPipe заранее (иначе это делает первый кадр); время этапов, секунды"""
+    kinds = ('hand', 'pose', 'face') if FACE_DETECTOR else ('hand', 'pose')
+    timings = {}
+    for kind in kinds:
+        started = time.perf_counter()
+        _MODELS[kind]()
+        timings[f'model_{kind}'] = time.perf_counter() - started
+    timings.update(warm_up(kinds, warmup_frames))
+    return timings
+
+
+def warmup_frame(width, height):
+    """Синтетический BGR-кадр: размытый шум и пятно цвета кожи (детекторам есть что проверять)"""
+    rnd = np.random.default_rng(1)
+    noise = rnd.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    frame = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+    cv2.circle(frame, (width // 2, height // 2), min(width, height) // 5, (150, 180, 220), -1)
+    return frame
+
+
+def warm_up(kinds, frames=WARMUP_FRAMES):
+    """Прогон синтетических кадров через модели и кодек JPEG; время по моделям, секунды
+
+    Первый process() графа выделяет тензоры и инициализирует делегат XNNPACK, а новый размер
+    входа - еще раз, поэтому прогреваются обе ориентации кадра в разрешении инференса.
+    """
+    if frames <= 0:
+        return {}
+    landscape = fit_side(warmup_frame(*DEFAULT_IMAGE_SIZE), INFERENCE_MAX_SIDE)
+    images = [np.ascontiguousarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+              for image in (landscape, np.ascontiguousarray(landscape.transpose(1, 0, 2)))]
+    timings = {}
+    for kind in kinds:
+        started = time.perf_counter()
+        model = _MODELS[kind]()
+        # Графы общие с сессиями: кадр пациента, пришедший во время прогрева, ждет
+        with inference_lock:
+            for _ in range(frames):
+                for image in images:
+                    model.process(image)
+        timings[f'warmup_{kind}'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _, buffer = cv2.imencode('.jpg', landscape, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    decode_frame(buffer, INFERENCE_MAX_SIDE, full=True)
+    timings['warmup_codec'] = time.perf_counter() - started
+    return timings
+
+# Точки, которые дает детектор лица (имена из POSE_POINTS)
+FACE_LANDMARKS = frozenset({'nose'})
+
+# Стили скелета MediaPipe разбираются один раз на процесс
+_skeleton_styles = {}
+
+
+def skeleton_style(kind):
+    style = _skeleton_styles.get(kind)
+    if style is None:
+        if kind == 'hand':
+            style = SkeletonStyle(mp_hands.HAND_CONNECTIONS,
+                                  mp_drawing_styles.get_default_hand_landmarks_style(),
+                                  mp_drawing_styles.get_default_hand_connections_style())
+        else:
+            style = SkeletonStyle(mp_pose.POSE_CONNECTIONS,
+                                  mp_drawing_styles.get_default_pose_landmarks_style(),
+                                  mp_drawing.DrawingSpec())
+        _skeleton_styles[kind] = style
+    return style
+
+def draw_banner(frame, text):
+    """Плашка "нет руки/тела" в углу кадра"""
+    cv2.rectangle(frame, (5, 5), (180, 45), (0, 0, 0), -1)
+    cv2.putText(frame, text, (15, 35), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+
+# Размер кадра клиента, если он не передан (нужен только для пиксельных порогов)
+DEFAULT_IMAGE_SIZE = (640, 480)
+
+
+def face_points(detection):
+    """Детекция лица -> (3, 4) как pose_array: нос из ключевой точки лица, плечи с нулевой видимостью"""
+    nose = detection.location_data.relative_keypoints[mp_face.FaceKeyPoint.NOSE_TIP]
+    points = np.zeros((3, 4), dtype=np.float32)
+    points[POSE_ROW_NOSE] = (nose.x, nose.y, 0.0, detection.score[0])
+    return points
+
+
+def face_landmarks(points):
+    """Ответ без кадра для детектора лица: только нос и оценка детекции"""
+    x, y, _, score = points[POSE_ROW_NOSE].tolist()
+    return {"face": {"nose": [round(x, 4), round(y, 4)], "score": round(score, 3)}}
+
+
+def hand_confidence(results):
+    """Оценка детекции первой руки (MediaPipe Hands) или NaN для точек с клиента"""
+    handedness = getattr(results, 'multi_handedness', None)
+    if not handedness:
+        return float('nan')
+    return handedness[0].classification[0].score
+
+
+# ==================== ДЕКОРАТОРЫ ====================
+def log_execution_time(func):
+    """Декоратор для измерения времени выполнения"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        if elapsed > 100:  # Логируем только медленные операции
+            log.warning(f"SLOW: {func.__name__} {elapsed:.1f}ms")
+        return result
+    return wrapper
+
+# ==================== МЕНЕДЖЕР УПРАЖНЕНИЙ ====================
+class ExerciseManager:
+    """Менеджер упражнений одной сессии"""
+
+    def __init__(self, session_id=DEFAULT_SESSION_ID):
+        self.session_id = session_id
+        self.lock = threading.RLock()
+        self.exercises = {}
+        self.current_exercise = None
+        self.current_exercise_id = "fist"
+        self.connection_count = 0
+        # Кадры, пришедшие пока предыдущий обрабатывается (последний кадр побеждает)
+        self.mailbox = FrameMailbox()
+        # Интервал обработки кадров по измеренной задержке
+        self.controller = IntervalController()
+        # Рамка руки/головы прошлого кадра: инференс на вырезке вместо всего кадра
+        self.roi = RoiTracker()
+        # Экстраполяция точек для пропущенных кадров и размер последнего кадра клиента
+        self.motion = MotionModel()
+        self.frame_size = DEFAULT_IMAGE_SIZE[::-1]
+        # Неподвижный кадр - результаты последнего инференса ('hand'/'pose', results) без MediaPipe
+        self.gate = MotionGate()
+        self._last_results = None
+        # Пациента долго нет в кадре - инференс редкими пробами
+        self.presence = Presence()
+        # Детектор лица потерял лицо - до этого момента (monotonic) поза считается полной моделью
+        self._face_retry_at = 0.0
+        self.render_mode = DEFAULT_RENDER_MODE if DEFAULT_RENDER_MODE in RENDER_MODES else RENDER_MODES[0]
+        # Запись landmarks (LFK_RECORD_DIR), None - запись выключена
+        self.recorder = SessionRecorder.open(session_id)
+        # Версия structured-состояния, которая уже есть у клиента (state_version из запроса)
+        self.acked_state_version = None
+        self.stats = {
+            'frames_processed': 0,
+            'hands_detected': 0,
+            'pose_detected': 0,
+            'avg_processing_time': 0,
+            'frames_skipped': 0,
+            'landmarks_processed': 0,
+            'roi_frames': 0,
+            'roi_fallbacks': 0,
+            'frames_predicted': 0,
+            'frames_gated': 0,
+            'frames_idle': 0,
+            'face_frames': 0,
+            'face_fallbacks': 0
+        }
+
+        self.set_exercise("fist")
+        log.info(f"Сессия {session_id}: менеджер упражнений инициализирован")
+
+    def load_exercise(self, exercise_id):
+        """Упражнение сессии; создается при первом выборе, а не все сразу на каждую сессию"""
+        exercise = self.exercises.get(exercise_id)
+        if exercise is None and exercise_id in EXERCISE_CLASSES:
+            try:
+                exercise = self.exercises[exercise_id] = EXERCISE_CLASSES[exercise_id]()
+                log.debug(f"Загружено: {exercise_id} - {exercise.name}")
+            except Exception as e:
+                log.error(f"Ошибка загрузки {exercise_id}: {e}")
+        return exercise
+
+    def set_exercise(self, exercise_id):
+        exercise = self.load_exercise(exercise_id)
+        if exercise is not None:
+            if exercise_id != self.current_exercise_id or self.current_exercise is None:
+                log.info(f"Сессия {self.session_id}: текущее упражнение {exercise.name}")
+                # Версии состояния сессии только растут, в том числе при возврате к прежнему упражнению
+                exercise.renew_state_version()
+                self.presence.reset()
+            self.current_exercise = exercise
+            self.current_exercise_id = exercise_id
+            return True
+        else:
+            log.error(f"Упражнение {exercise_id} не найдено")
+            return False
+
+    def close(self):
+        """Сессия закрыта или вытеснена: дописываем запись"""
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def _observe(self, stage, started):
+        """Записывает время этапа в гистограмму и возвращает текущий момент"""
+        now = time.perf_counter()
+        stage_metrics.observe(stage, self.current_exercise_id, now - started)
+        return now
+
+    def set_render_mode(self, mode):
+        """Режим ответа сессии по умолчанию (frame / none)"""
+        if mode not in RENDER_MODES:
+            return False
+        self.render_mode = mode
+        return True
+
+    def reset_current_exercise(self):
+        if self.current_exercise and hasattr(self.current_exercise, 'reset'):
+            self.current_exercise.reset()
+            log.info("Упражнение сброшено")
+            return True
+        return False
+
+    def reset_exercise_for_new_attempt(self):
+        if self.current_exercise:
+            if hasattr(self.current_exercise, 'reset_for_new_attempt'):
+                self.current_exercise.reset_for_new_attempt()
+            elif hasattr(self.current_exercise, 'reset'):
+                self.current_exercise.reset()
+            log.info("Упражнение сброшено для нового подхода")
+            return True
+        return False
+
+    def get_exercise_list(self):
+        exercises = ((ex_id, self.load_exercise(ex_id)) for ex_id in EXERCISE_CLASSES)
+        return [{"id": ex_id, "name": ex.name} for ex_id, ex in exercises if ex is not None]
+
+    def _is_pose_exercise(self):
+        return self.current_exercise.uses_pose()
+
+    def _detector(self):
+        """Самый дешевый детектор, которому хватает точек упражнения: 'hand', 'face' или 'pose'"""
+        if not self._is_pose_exercise():
+            return 'hand'
+        if (FACE_DETECTOR and FACE_LANDMARKS.issuperset(self.current_exercise.required_landmarks())
+                and time.monotonic() >= self._face_retry_at):
+            return 'face'
+        return 'pose'
+
+    @log_execution_time
+    def process_frame(self, frame_data, render=None):
+        """Обработка кадра (base64-строка или байты JPEG) с пропуском кадров
+
+        render - режим ответа для этого кадра, по умолчанию режим сессии.
+        При render=none кадр не размечается и не кодируется: в ответе landmarks вместо processed_frame,
+        а JPEG декодируется сразу в разрешении инференса (INFERENCE_MAX_SIDE).
+        """
+        # Под нагрузкой обрабатываем только каждый N-й кадр (N подбирает контроллер),
+        # пропущенные отвечаются по модели движения
+        if not self.controller.should_process():
+            self.stats['frames_skipped'] += 1
+            return self.predict_frame()
+
+        # Пациента нет в кадре: между редкими пробами кадр даже не декодируется
+        if not self.presence.should_probe():
+            self.stats['frames_idle'] += 1
+            return self._absent_response()
+
+        start_time = t = time.perf_counter()
+        self.stats['frames_processed'] += 1
+
+        try:
+            # Сырые байты JPEG (бинарный протокол) используем без копирования
+            if isinstance(frame_data, (bytes, bytearray, memoryview)):
+                frame_bytes = frame_data
+            # Декодируем base64 (старые клиенты)
+            elif isinstance(frame_data, str):
+                try:
+                    missing_padding = len(frame_data) % 4
+                    if missing_padding:
+                        frame_data += '=' * (4 - missing_padding)
+                    frame_bytes = base64.b64decode(frame_data)
+                except Exception as e:
+                    log.error(f"Ошибка декодирования: {e}")
+                    return self.error_response("Ошибка декодирования")
+                t = self._observe(STAGE_BASE64, t)
+            else:
+                return self.error_response("Invalid frame data type")
+
+            if render not in RENDER_MODES:
+                render = self.render_mode
+
+            # Полное разрешение нужно только для отрисовки оверлея; h, w - размер кадра клиента
+            nparr = np.frombuffer(frame_bytes, np.uint8)
+            frame, (h, w) = decode_frame(nparr, INFERENCE_MAX_SIDE, full=render != RENDER_NONE)
+            t = self._observe(STAGE_IMDECODE, t)
+
+            if frame is None:
+                return self.error_response("Cannot decode image")
+            self.frame_size = (h, w)
+
+            # MediaPipe получает уменьшенный кадр; координаты точек нормализованы, разрешение не важно
+            small = fit_side(frame, INFERENCE_MAX_SIDE)
+            if small is not frame:
+                self._observe(STAGE_RESIZE, t)
+
+            # MediaPipe получает отдельный RGB-массив, поэтому BGR-кадр можно размечать без копии
+            display_frame = None if render == RENDER_NONE else frame
+
+            kind = self._detector()
+            if kind == 'face':
+                results = self._gated_infer(small, 'face')
+                if results.detections:
+                    self._present(True)
+                    self.stats['pose_detected'] += 1
+                    result = self.process_face(results.detections[0], display_frame, h, w)
+                else:
+                    # Лицо потеряно (отвернулся, далеко от камеры): кадр и следующие секунды - полная поза
+                    self.stats['face_fallbacks'] += 1
+                    self._face_retry_at = time.monotonic() + FACE_RETRY_INTERVAL
+                    kind = 'pose'
+
+            if kind == 'pose':
+                results = self._gated_infer(small, 'pose')
+                if results.pose_landmarks:
+                    self._present(True)
+                    self.stats['pose_detected'] += 1
+                    result = self.process_pose(results, display_frame, h, w)
+                elif self._present(False):
+                    result = self.no_pose_response(display_frame)
+                else:
+                    result = self._absent_response(probed=True)
+            elif kind == 'hand':
+                results = self._gated_infer(small, 'hand')
+                if results.multi_hand_landmarks:
+                    self._present(True)
+                    self.stats['hands_detected'] += 1
+                    result = self.process_hand(results, display_frame, h, w)
+                elif self._present(False):
+                    result = self.no_hand_response(display_frame)
+                else:
+                    result = self._absent_response(probed=True)
+
+            process_time = (self._observe(STAGE_TOTAL, start_time) - start_time) * 1000
+            self.stats['avg_processing_time'] = (
+                                                        self.stats['avg_processing_time'] * (self.stats['frames_processed'] - 1) + process_time
+                                                ) / self.stats['frames_processed']
+
+            return result
+
+        except Exception as e:
+            log.error(f"Критическая ошибка: {e}")
+            import traceback
+            traceback.print_exc()
+            return self.error_response(str(e))
+
+    def _gated_infer(self, image, kind):
+        """Инференс, если кадр заметно изменился с прошлого инференса; иначе - прежние результаты"""
+        thumbnail = None
+        if self.gate.enabled:
+            t = time.perf_counter()
+            thumbnail = self.gate.thumbnail(image)
+            last = self._last_results
+            still = last is not None and last[0] == kind and self.gate.still(thumbnail)
+            self._observe(STAGE_GATE, t)
+            if still:
+                self.stats['frames_gated'] += 1
+                return last[1]
+
+        results = self._infer(image, kind)
+        self._last_results = (kind, results)
+        self.gate.inferred(thumbnail)
+        return results
+
+    def _infer(self, image, kind):
+        """MediaPipe на BGR-кадре инференса: по рамке слежения, а при потере - на всем кадре"""
+        if kind == 'face':
+            # Детектор лица и так дешевый - без вырезки
+            return self._run_model(image, kind)
+        pose = kind == 'pose'
+        h, w = image.shape[:2]
+        box = self.roi.crop_box(kind, w, h)
+        if box is not None:
+            x0, y0, x1, y1 = box
+            results = self._run_model(image[y0:y1, x0:x1], kind)
+            found = [results.pose_landmarks] if pose else results.multi_hand_landmarks
+            if found and found[0]:
+                for landmark_list in found:
+                    to_frame(landmark_list, box, w, h)
+                self.stats['roi_frames'] += 1
+                self._track(results, pose)
+                return results
+            self.stats['roi_fallbacks'] += 1
+            self.roi.reset()
+
+        results = self._run_model(image, kind)
+        self._track(results, pose)
+        return results
+
+    def _run_model(self, image, kind):
+        t = time.perf_counter()
+        # cvtColor принимает и вырезку (представление с шагом строки кадра) - копия только в RGB
+        frame_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        frame_rgb.flags.writeable = False
+        self._observe(STAGE_COLOR, t)
+        with inference_lock:
+            t = time.perf_counter()
+            results = _MODELS[kind]().process(frame_rgb)
+            self._observe(STAGE_INFERENCE, t)
+        return results
+
+    def _track(self, results, pose):
+        """Рамка для следующего кадра по детекции (координаты кадра)"""
+        if pose:
+            if not results.pose_landmarks:
+                self.roi.reset()
+                return
+            points = pose_array(results.pose_landmarks)
+            # Рамка по носу и плечам - нужна уверенность во всех трех точках
+            self.roi.update('pose', points, float(points[:, 3].min()))
+        else:
+            if not results.multi_hand_landmarks:
+                self.roi.reset()
+                return
+            self.roi.update('hand', hand_array(results.multi_hand_landmarks[0]), hand_confidence(results))
+
+    def _present(self, detected):
+        """Учет детекции для режима ожидания; False - пациента по-прежнему нет (ответ без кадра)"""
+        if detected:
+            if self.presence.detected():
+                log.info(f"Сессия {self.session_id}: пациент снова в кадре")
+            return True
+        if self.presence.missed():
+            log.info(f"Сессия {self.session_id}: {self.presence.misses} кадров без детекции - режим ожидания")
+        return not self.presence.idle
+
+    def _absent_response(self, probed=False):
+        """Ответ в режиме ожидания: без отрисовки и кодирования кадра"""
+        if probed:
+            # Проба прошла инференс - запись и модель движения видят пропажу, как обычно
+            self.motion.lost()
+            if self.recorder is not None:
+                self.recorder.record(KIND_POSE if self._is_pose_exercise() else KIND_HAND)
+        message = "Тело не обнаружено" if self._is_pose_exercise() else "Рука не обнаружена"
+        result = self.success_response(None, False, 0, [False] * 5, message, landmarks={})
+        result["idle"] = True
+        return result
+
+    def predict_frame(self):
+        """Ответ на пропущенный кадр: точки экстраполируются от последних детекций (motion_model.py),
+        упражнение обрабатывает их как обычный кадр. Кадр не декодируется - ответ всегда с landmarks
+        (как render=none) и пометкой predicted. Без свежей детекции - прежний ответ skipped.
+        """
+        pose = self._is_pose_exercise()
+        kind = 'hand'
+        if pose:
+            # Поза могла идти и от детектора лица - предсказываем то, что наблюдали
+            kind = 'face' if self.motion.kind == 'face' else 'pose'
+        points = self.motion.predict(kind, time.monotonic())
+        if points is None:
+            return self._skip_response()
+
+        self.stats['frames_predicted'] += 1
+        h, w = self.frame_size
+        try:
+            t = time.perf_counter()
+            if pose:
+                subset = points if kind == 'face' else points[list(POSE_SUBSET)]
+                is_correct, message = self.current_exercise.evaluate_pose(subset, (h, w, 3), source=kind)
+                raised, states = 0, [False] * 5
+            else:
+                states, _, is_correct, message = self.current_exercise.evaluate_hand(points, (h, w, 3))
+                raised = sum(states)
+            self._observe(STAGE_EXERCISE, t)
+        except Exception as e:
+            log.error(f"Ошибка предсказания кадра: {e}")
+            return self._skip_response()
+
+        if kind == 'face':
+            landmarks = face_landmarks(points)
+        else:
+            landmarks = {kind: points.astype(np.float64).round(4).tolist()}
+        result = self.success_response(None, True, raised, states, message, landmarks=landmarks)
+        result["predicted"] = True
+        return result
+
+    def process_landmarks(self, landmarks):
+        """Обработка landmarks, посчитанных на клиенте: без декодирования кадра и инференса
+
+        landmarks - {'hand': [[x, y, z], ...21]} или {'pose': [...] | {'nose': [x, y], ...}},
+        нормализованные координаты; 'image_size': [w, h] - размер кадра клиента.
+        Пустое значение (или отсутствие ключа) означает, что рука/тело не найдены.
+        """
+        self.stats['landmarks_processed'] += 1
+        if not isinstance(landmarks, dict):
+            return self.error_response("Invalid landmarks: expected an object")
+        try:
+            w, h = landmarks.get('image_size') or DEFAULT_IMAGE_SIZE
+            w, h = int(w), int(h)
+
+            if self._is_pose_exercise():
+                points = landmarks.get('pose')
+                if not points:
+                    result = self.no_pose_response(None)
+                else:
+                    self.stats['pose_detected'] += 1
+                    pose = LandmarkList.from_pose(points, self.current_exercise.required_landmarks())
+                    results = SimpleNamespace(pose_landmarks=pose)
+                    result = self.process_pose(results, None, h, w)
+            else:
+                points = landmarks.get('hand')
+                if not points:
+                    result = self.no_hand_response(None)
+                else:
+                    hand = LandmarkList.from_hand(points)
+                    self.stats['hands_detected'] += 1
+                    results = SimpleNamespace(multi_hand_landmarks=[hand])
+                    result = self.process_hand(results, None, h, w)
+        except (TypeError, ValueError) as e:
+            return self.error_response(f"Invalid landmarks: {e}")
+
+        # Точки у клиента уже есть - обратно их не отправляем
+        result.pop('landmarks', None)
+        return result
+
+    def process_hand(self, results, display_frame, h, w):
+        """Обрабатывает кадр с рукой"""
+        raised_fingers = 0
+        finger_states = []
+
+        landmarks_out = None
+        draw_time = logic_time = 0.0
+
+        for hand_landmarks in results.multi_hand_landmarks:
+            # Точки руки один раз переводятся в массив - дальше упражнение и отрисовка считают по нему
+            points = hand_array(hand_landmarks)
+
+            t = time.perf_counter()
+            # Скелет: стили и группы связей готовы заранее
+            if display_frame is not None:
+                draw_skeleton(display_frame, points, skeleton_style('hand'))
+            now = time.perf_counter()
+            draw_time += now - t
+            t = now
+
+            finger_states, tip_positions, is_correct, message = self.current_exercise.evaluate_hand(
+                points, (h, w, 3)
+            )
+            now = time.perf_counter()
+            logic_time += now - t
+            t = now
+
+            if display_frame is None:
+                landmarks_out = {"hand": points.astype(np.float64).round(4).tolist()}
+
+            if display_frame is not None and hasattr(self.current_exercise, 'draw_feedback'):
+                display_frame = self.current_exercise.draw_feedback(
+                    display_frame, finger_states, tip_positions, is_correct, message
+                )
+                draw_time += time.perf_counter() - t
+
+            raised_fingers = sum(finger_states)
+
+        if self.recorder is not None:
+            self.recorder.record(KIND_HAND, points, hand_confidence(results))
+        self.motion.observe('hand', points, time.monotonic())
+
+        stage_metrics.observe(STAGE_EXERCISE, self.current_exercise_id, logic_time)
+        if display_frame is not None:
+            stage_metrics.observe(STAGE_DRAW, self.current_exercise_id, draw_time)
+        return self.success_response(display_frame, True, raised_fingers, finger_states, message,
+                                     landmarks=landmarks_out)
+
+    def process_pose(self, results, display_frame, h, w):
+        """Обрабатывает кадр с позой"""
+        # Все точки с visibility один раз переводятся в массив - упражнение, модель движения,
+        # запись, ответ без кадра и скелет берут их отсюда
+        points = landmarks_array(results.pose_landmarks, visibility=True)
+
+        t = time.perf_counter()
+        pose = points[list(POSE_SUBSET)]
+        is_correct, message = self.current_exercise.evaluate_pose(pose, (h, w, 3), source='pose')
+        t = self._observe(STAGE_EXERCISE, t)
+
+        self.motion.observe('pose', points, time.monotonic())
+
+        if self.recorder is not None:
+            # У MediaPipe Pose нет оценки детекции - средняя видимость точек
+            self.recorder.record(KIND_POSE, points, float(points[:, 3].mean()))
+
+        if display_frame is None:
+            # Как у руки: координаты с точностью 4 знака, видимость - 3
+            pose_out = points.astype(np.float64)
+            pose_out[:, :3] = pose_out[:, :3].round(4)
+            pose_out[:, 3] = pose_out[:, 3].round(3)
+            return self.success_response(None, True, 0, [False]*5, message, landmarks={
+                "pose": pose_out.tolist()
+            })
+
+        draw_skeleton(display_frame, points, skeleton_style('pose'))
+
+        # Визуализация (упрощенная)
+        (nx, ny), (lx, ly), (rx, ry) = (pose[[POSE_ROW_NOSE, POSE_ROW_LEFT_SHOULDER, POSE_ROW_RIGHT_SHOULDER], :2]
+                                        * np.array([w, h], dtype=np.float32)).astype(np.int32).tolist()
+        cv2.circle(display_frame, (nx, ny), 6, (0, 255, 255), -1)
+
+        cv2.circle(display_frame, (lx, ly), 5, (255, 0, 0), -1)
+        cv2.circle(display_frame, (rx, ry), 5, (255, 0, 0), -1)
+        cv2.line(display_frame, (lx, ly), (rx, ry), (255, 255, 0), 2)
+
+        # Информационная панель (упрощенная) - из кэша, пока не изменились сообщение и калибровка
+        calibrated = getattr(self.current_exercise, 'calibrated', None)
+        panel_cache.draw(display_frame, (self.current_exercise_id, 'pose', is_correct, message[:40], calibrated),
+                         105, lambda canvas: self._draw_pose_panel(canvas, is_correct, message, calibrated))
+        self._observe(STAGE_DRAW, t)
+
+        return self.success_response(display_frame, True, 0, [False]*5, message)
+
+    def process_face(self, detection, display_frame, h, w):
+        """Обрабатывает кадр с лицом: упражнению нужен только нос, полная поза не считается"""
+        t = time.perf_counter()
+        points = face_points(detection)
+        is_correct, message = self.current_exercise.evaluate_pose(points, (h, w, 3), source='face')
+        t = self._observe(STAGE_EXERCISE, t)
+
+        self.stats['face_frames'] += 1
+        self.motion.observe('face', points, time.monotonic())
+        if self.recorder is not None:
+            # В записи - поза из одной точки носа (остальные точки NaN)
+            self.recorder.record(KIND_POSE, nose_pose(points[POSE_ROW_NOSE]), detection.score[0])
+
+        if display_frame is None:
+            return self.success_response(None, True, 0, [False]*5, message, landmarks=face_landmarks(points))
+
+        box = detection.location_data.relative_bounding_box
+        x0, y0 = int(box.xmin * w), int(box.ymin * h)
+        cv2.rectangle(display_frame, (x0, y0), (x0 + int(box.width * w), y0 + int(box.height * h)), (255, 255, 0), 1)
+        nx, ny = (points[POSE_ROW_NOSE, :2] * np.array([w, h], dtype=np.float32)).astype(np.int32).tolist()
+        cv2.circle(display_frame, (nx, ny), 6, (0, 255, 255), -1)
+
+        calibrated = getattr(self.current_exercise, 'calibrated', None)
+        panel_cache.draw(display_frame, (self.current_exercise_id, 'pose', is_correct, message[:40], calibrated),
+                         105, lambda canvas: self._draw_pose_panel(canvas, is_correct, message, calibrated))
+        self._observe(STAGE_DRAW, t)
+
+        return self.success_response(display_frame, True, 0, [False]*5, message)
+
+    def _draw_pose_panel(self, frame, is_correct, message, calibrated):
+        cv2.rectangle(frame, (5, 5), (400, 100), (0, 0, 0), -1)
+        cv2.putText(frame, f"{self.current_exercise.name[:20]}", (15, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1)
+
+        color = (0, 255, 0) if is_correct else (0, 0, 255)
+        cv2.putText(frame, message[:40], (15, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+        if calibrated is not None:
+            calib_text = "CALIBRATED" if calibrated else "CALIBRATING..."
+            calib_color = (0, 255, 0) if calibrated else (0, 255, 255)
+            cv2.putText(frame, calib_text, (15, 85),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.45, calib_color, 1)
+
+    def no_hand_response(self, display_frame):
+        self.motion.lost()
+        if self.recorder is not None:
+            self.recorder.record(KIND_HAND)
+        if display_frame is None:
+            return self.success_response(None, False, 0, [False]*5, "Рука не обнаружена", landmarks={})
+        panel_cache.draw(display_frame, ('banner', "NO HAND"), 50, lambda canvas: draw_banner(canvas, "NO HAND"))
+        return self.success_response(display_frame, False, 0, [False]*5, "Рука не обнаружена")
+
+    def no_pose_response(self, display_frame):
+        self.motion.lost()
+        if self.recorder is not None:
+            self.recorder.record(KIND_POSE)
+        if display_frame is None:
+            return self.success_response(None, False, 0, [False]*5, "Тело не обнаружено", landmarks={})
+        panel_cache.draw(display_frame, ('banner', "NO BODY"), 50, lambda canvas: draw_banner(canvas, "NO BODY"))
+        return self.success_response(display_frame, False, 0, [False]*5, "Тело не обнаружено")
+
+    def success_response(self, frame, detected, raised, states, message, landmarks=None):
+        try:
+            if frame is None:
+                # render=none: кадр не кодируем, клиент рисует оверлей по landmarks
+                frame_out = ""
+            else:
+                # Сниженное качество JPEG
+                t = time.perf_counter()
+                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+                frame_out = base64.b64encode(buffer).decode('utf-8')
+                self._observe(STAGE_ENCODE, t)
+
+            response = {
+                "hand_detected": detected,
+                "raised_fingers": raised,
+                "finger_states": states,
+                "message": message,
+                "processed_frame": frame_out,
+                "current_exercise": self.current_exercise_id,
+                "exercise_name": self.current_exercise.name,
+                "status": "success"
+            }
+            if frame is None:
+                response["render"] = RENDER_NONE
+                response["landmarks"] = landmarks or {}
+
+            # Клиент с актуальной версией получает только номер версии, с предыдущей - дельту
+            version, structured, is_delta = self.current_exercise.structured_delta(self.acked_state_version)
+            if version:
+                response["state_version"] = version
+            if structured:
+                response["structured_delta" if is_delta else "structured"] = structured
+
+            return response
+        except Exception as e:
+            log.error(f"Ошибка при формировании ответа: {e}")
+            return self.error_response("Error creating response")
+
+    def _skip_response(self):
+        """Ответ при пропуске кадра"""
+        return {
+            "hand_detected": False,
+            "raised_fingers": 0,
+            "finger_states": [False]*5,
+            "message": "",
+            "processed_frame": "",
+            "current_exercise": self.current_exercise_id,
+            "exercise_name": self.current_exercise.name if self.current_exercise else "unknown",
+            "status": "skipped"
+        }
+
+    def error_response(self, message):
+        return {
+            "hand_detected": False,
+            "raised_fingers": 0,
+            "finger_states": [False]*5,
+            "message": message,
+            "processed_frame": "",
+            "current_exercise": self.current_exercise_id,
+            "exercise_name": self.current_exercise.name if self.current_exercise else "unknown",
+            "status": "error"
+        }
@@ -9,7 +9,9 @@ import logging
 logger = logging.getLogger('LFK.Exercises')
 
 # Базовый класс
-from .base_exercise import BaseExercise, BodyPart, LandmarkPoint
+from .base_exercise import BaseExercise, BodyPart, LandmarkPoint, LandmarkList
+# Табличный автомат удержаний (шаги -> циклы) для упражнений
+from .hold_machine import HoldMachine, Step
 
 # Существующие упражнения (работают без изменений)
 from .fist_exercise import FistExercise
@@ -35,6 +37,9 @@ __all__ = [
     'BaseExercise',
     'BodyPart',
     'LandmarkPoint',
+    'LandmarkList',
+    'HoldMachine',
+    'Step',
     'FistExercise',
     'FistIndexExercise',
     'FistPalmExercise',
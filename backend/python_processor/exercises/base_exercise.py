@@ -1,15 +1,32 @@
 from abc import ABC, abstractmethod
 import cv2
+import itertools
 import logging
 import numpy as np
 from typing import List, Tuple, Dict, Any, Optional
 from dataclasses import dataclass, field
 from enum import Enum
 
+from .clock import system_clock
+from .overlay import panel_cache
+from .landmark_math import (POSE_NOSE, POSE_LEFT_SHOULDER, POSE_RIGHT_SHOULDER, POSE_ROW_NOSE,
+                            POSE_ROW_LEFT_SHOULDER, POSE_ROW_RIGHT_SHOULDER, hand_array, pose_array,
+                            finger_states as hand_finger_states, tip_positions as hand_tip_positions)
+
 # Настройка логгера
 logger = logging.getLogger('LFK.Exercises.Base')
 
 
+POSE_POINTS = {'nose': POSE_NOSE, 'left_shoulder': POSE_LEFT_SHOULDER, 'right_shoulder': POSE_RIGHT_SHOULDER}
+HAND_POINTS_COUNT = 21
+
+# Версии structured-состояния общие для всех упражнений процесса: версия одного упражнения
+# не совпадет с версией другого, и подтверждение клиента от прежнего упражнения не подойдет
+_state_versions = itertools.count(1)
+_STALE = object()
+_MISSING = object()
+
+
 class BodyPart(Enum):
     HAND = "hand"
     POSE = "pose"
@@ -36,6 +53,55 @@ class LandmarkPoint:
         return (dx*dx + dy*dy + dz*dz) ** 0.5
 
 
+@dataclass
+class LandmarkList:
+    """Набор точек с тем же доступом, что и у MediaPipe (hand_landmarks.landmark[i].x)"""
+    landmark: List[LandmarkPoint] = field(default_factory=list)
+
+    @classmethod
+    def from_points(cls, points) -> 'LandmarkList':
+        """[[x, y, z?, visibility?], ...] (нормализованные координаты) -> LandmarkList"""
+        if not isinstance(points, (list, tuple)):
+            raise ValueError("landmarks must be a list of points")
+        landmark = []
+        for point in points:
+            if not isinstance(point, (list, tuple)) or not 2 <= len(point) <= 4:
+                raise ValueError("point must be [x, y, z?, visibility?]")
+            landmark.append(LandmarkPoint(*(float(v) for v in point)))
+        return cls(landmark)
+
+    @classmethod
+    def from_hand(cls, points) -> 'LandmarkList':
+        """21 точка руки MediaPipe Hands"""
+        hand = cls.from_points(points)
+        if len(hand.landmark) != HAND_POINTS_COUNT:
+            raise ValueError(f"hand must have {HAND_POINTS_COUNT} points")
+        return hand
+
+    @classmethod
+    def from_pose(cls, points, required: Tuple[str, ...] = tuple(POSE_POINTS)) -> 'LandmarkList':
+        """Поза: список точек MediaPipe Pose или словарь {'nose': [x, y], ...}
+        required - точки из POSE_POINTS, без которых поза не принимается (остальные - с нулевой
+        видимостью); список может обрываться после последней из них (запись детектора лица - только нос)"""
+        if isinstance(points, dict):
+            landmark = [LandmarkPoint(0.0, 0.0, 0.0, 0.0) for _ in range(max(POSE_POINTS.values()) + 1)]
+            for name, idx in POSE_POINTS.items():
+                if name in points:
+                    landmark[idx] = cls.from_points([points[name]]).landmark[0]
+                elif name in required:
+                    raise ValueError(f"pose point '{name}' is missing")
+            return cls(landmark)
+
+        pose = cls.from_points(points)
+        for name in required:
+            if len(pose.landmark) <= POSE_POINTS[name]:
+                raise ValueError(f"pose point '{name}' is missing")
+        # Недостающие точки - с нулевой видимостью, как плечи у детектора лица
+        missing = max(POSE_POINTS.values()) + 1 - len(pose.landmark)
+        pose.landmark.extend(LandmarkPoint(0.0, 0.0, 0.0, 0.0) for _ in range(missing))
+        return pose
+
+
 class BaseExercise(ABC):
     """
     Базовый класс для всех упражнений
@@ -61,6 +127,20 @@ class BaseExercise(ABC):
         self.exercise_id = "base"
         self.body_part = BodyPart.HAND
 
+        # Источник времени для таймеров (см. clock.py)
+        self.clock = system_clock
+        # Время последней оценки кадра - по нему считаются таймеры в structured-состоянии
+        self.state_time = 0.0
+
+        # Structured-состояние собирается по запросу и только если изменился state_key()
+        self.state_version = 0
+        self._structured = None
+        self._structured_key = _STALE
+        self._structured_prev = (0, None)
+
+        # Детектор, давший точки позы на прошлом кадре ('pose', 'face'; None - точки клиента)
+        self.pose_source = None
+
         self.logger = logging.getLogger(f'LFK.Exercise.{self.__class__.__name__}')
         self._debug_mode = False
         self._frame_counter = 0
@@ -91,6 +171,56 @@ class BaseExercise(ABC):
         # Если нет - возвращаем заглушку
         return False, "Метод check не реализован"
 
+    def uses_pose(self) -> bool:
+        """Упражнение работает по позе (MediaPipe Pose), а не по руке"""
+        return self.body_part in (BodyPart.POSE, BodyPart.HEAD, BodyPart.SHOULDER)
+
+    def required_landmarks(self) -> Tuple[str, ...]:
+        """Точки, которые нужны упражнению: по ним менеджер выбирает самый дешевый детектор
+        ('hand' - точки руки; имена из POSE_POINTS - точки позы)"""
+        if self.uses_pose():
+            return tuple(POSE_POINTS)
+        return ('hand',)
+
+    def pose_source_changed(self):
+        """Точки позы теперь дает другой детектор: у детекторов свое смещение точек
+        (нос BlazeFace и нос Pose не совпадают) - упражнения с базовым положением его учитывают"""
+
+    def set_clock(self, clock):
+        """Подменяет источник времени (ManualClock для воспроизведения записей)"""
+        self.clock = clock
+
+    # ============ ОЦЕНКА КАДРА (без отрисовки) ============
+
+    def evaluate_hand(self, hand_landmarks, frame_shape: Tuple[int, int, int]):
+        """Состояние пальцев и проверка упражнения по точкам руки
+        hand_landmarks - массив (21, 3) (landmark_math.hand_array) или landmarks MediaPipe
+        Возвращает (finger_states, tip_positions, is_correct, message)"""
+        points = hand_array(hand_landmarks)
+        self.state_time = self.clock()
+        finger_states, tip_positions = self.get_finger_states(points, frame_shape)
+        is_correct, message = self.check_fingers(finger_states, points, frame_shape)
+        return finger_states, tip_positions, is_correct, message
+
+    def evaluate_pose(self, pose_landmarks, frame_shape: Tuple[int, int, int],
+                      source: str = None) -> Tuple[bool, str]:
+        """Проверка упражнения по точкам позы
+        pose_landmarks - массив (3, 4) (landmark_math.pose_array) или landmarks MediaPipe;
+        source - детектор точек ('pose', 'face'), его смена посреди упражнения - pose_source_changed()"""
+        if source is not None:
+            if self.pose_source is not None and source != self.pose_source:
+                self.pose_source_changed()
+            self.pose_source = source
+        points = pose_array(pose_landmarks)
+        self.state_time = self.clock()
+        landmarks = {
+            'pose': points,
+            'nose': points[POSE_ROW_NOSE],
+            'left_shoulder': points[POSE_ROW_LEFT_SHOULDER],
+            'right_shoulder': points[POSE_ROW_RIGHT_SHOULDER],
+        }
+        return self.check(landmarks, frame_shape)
+
     # ============ СТАРЫЙ ИНТЕРФЕЙС (для обратной совместимости) ============
 
     def check_fingers(self, finger_states: List[bool], hand_landmarks, frame_shape: Tuple[int, int, int]) -> Tuple[bool, str]:
@@ -109,27 +239,8 @@ class BaseExercise(ABC):
 
     def get_finger_states(self, hand_landmarks, frame_shape: Tuple[int, int, int]) -> Tuple[List[bool], List[Tuple[int, int]]]:
         """Получает состояние пальцев (поднят/сжат)"""
-        h, w, _ = frame_shape
-        finger_tips = [4, 8, 12, 16, 20]
-        finger_pips = [3, 6, 10, 14, 18]
-
-        finger_states = []
-        tip_positions = []
-
-        for i in range(5):
-            tip = hand_landmarks.landmark[finger_tips[i]]
-            pip = hand_landmarks.landmark[finger_pips[i]]
-            x, y = int(tip.x * w), int(tip.y * h)
-            tip_positions.append((x, y))
-
-            if i == 0:  # Большой палец
-                index_mcp = hand_landmarks.landmark[5]
-                dist = abs(tip.x - index_mcp.x) + abs(tip.y - index_mcp.y)
-                finger_states.append(dist > 0.15)
-            else:
-                finger_states.append(tip.y < pip.y - 0.02)
-
-        return finger_states, tip_positions
+        points = hand_array(hand_landmarks)
+        return hand_finger_states(points), hand_tip_positions(points, frame_shape)
 
     def draw_feedback(self, frame, finger_states: List[bool], tip_positions: List[Tuple[int, int]],
                       is_correct: bool, message: str) -> np.ndarray:
@@ -152,7 +263,12 @@ class BaseExercise(ABC):
         return frame
 
     def _draw_info_panel(self, frame, is_correct: bool, message: str, fingers_up: int):
-        """Рисует информационную панель"""
+        """Рисует информационную панель (готовую из кэша, если ее содержимое не менялось)"""
+        x, y, w, h = self._feedback_panel_rect
+        panel_cache.draw(frame, (self.exercise_id, 'info', is_correct, message, fingers_up), y + h + 2,
+                         lambda canvas: self._render_info_panel(canvas, is_correct, message, fingers_up))
+
+    def _render_info_panel(self, frame, is_correct: bool, message: str, fingers_up: int):
         x, y, w, h = self._feedback_panel_rect
 
         cv2.rectangle(frame, (x, y), (x + w, y + h), self.COLORS['black'], -1)
@@ -181,9 +297,57 @@ class BaseExercise(ABC):
 
     # ============ ОПЦИОНАЛЬНЫЕ МЕТОДЫ ============
 
+    def _get_structured_data(self) -> Optional[Dict[str, Any]]:
+        """Собирает структурированные данные для клиента (None - упражнение их не отдает)"""
+        return None
+
+    def state_key(self) -> Optional[tuple]:
+        """Значения, от которых зависит _get_structured_data(); пока ключ тот же, данные не пересобираются.
+        None - пересобирать при каждом запросе"""
+        return None
+
+    # ============ STRUCTURED-СОСТОЯНИЕ ============
+
+    def invalidate_state(self):
+        """Пересобрать structured-данные при следующем запросе (изменение вне state_key)"""
+        self._structured_key = _STALE
+
+    def structured_state(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(версия, данные). Версия меняется только если данные действительно изменились"""
+        key = self.state_key()
+        if key is None or key != self._structured_key:
+            data = self._get_structured_data()
+            if data != self._structured:
+                self._structured_prev = (self.state_version, self._structured)
+                self.state_version = next(_state_versions)
+                self._structured = data
+            self._structured_key = _STALE if key is None else key
+        return self.state_version, self._structured
+
+    def renew_state_version(self):
+        """Новый номер версии без изменения данных: упражнение снова стало текущим в сессии,
+        и версия состояния сессии не должна уменьшиться"""
+        if self.state_version:
+            self._structured_prev = (self.state_version, self._structured)
+            self.state_version = next(_state_versions)
+
     def get_structured_data(self) -> Optional[Dict[str, Any]]:
         """Возвращает структурированные данные для клиента"""
-        return None
+        return self.structured_state()[1]
+
+    def structured_delta(self, since_version: Optional[int]) -> Tuple[int, Optional[Dict[str, Any]], bool]:
+        """Данные для клиента, у которого есть версия since_version: (версия, данные, дельта ли это)
+        Данные None - у клиента актуальная версия. Дельта - только изменившиеся ключи относительно
+        предыдущей версии (удаленные ключи - None); для более старой версии - полные данные"""
+        version, data = self.structured_state()
+        if data is None or since_version == version:
+            return version, None, False
+        prev_version, prev = self._structured_prev
+        if since_version and since_version == prev_version and prev is not None:
+            delta = {k: v for k, v in data.items() if prev.get(k, _MISSING) != v}
+            delta.update((k, None) for k in prev if k not in data)
+            return version, delta, True
+        return version, data, False
 
     def reset(self) -> bool:
         """Сбрасывает упражнение"""
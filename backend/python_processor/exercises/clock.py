@@ -0,0 +1,33 @@
+"""
+Часы упражнений
+Таймеры удержания и калибровки берут время через exercise.clock(), а не time.time() напрямую:
+в работе это системное время, при воспроизведении записи - время кадров из записи.
+"""
+
+import time
+
+
+class SystemClock:
+    """Текущее время (секунды, как time.time())"""
+
+    def __call__(self) -> float:
+        return time.time()
+
+
+class ManualClock:
+    """Время задается извне (replay, тесты)"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def set(self, timestamp: float):
+        self.now = timestamp
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+system_clock = SystemClock()
@@ -2,10 +2,13 @@
 Упражнение "Считалочка" - поочередное касание пальцев с большим (УЛЬТРА-ОПТИМИЗИРОВАННО)
 """
 
-import time
 import logging
 from .base_exercise import BaseExercise
+from .overlay import panel_cache
+from .hold_machine import HoldMachine, Step, EVENT_STEP_DONE, EVENT_CYCLE_DONE, EVENT_COMPLETED
+from .landmark_math import HAND_TIPS, HAND_DIPS, HAND_MCPS, hand_array, finger_states, tip_positions, manhattan
 import cv2
+import numpy as np
 
 logger = logging.getLogger('LFK.Exercise.FingerTouching')
 
@@ -37,102 +40,108 @@ class FingerTouchingExercise(BaseExercise):
         self.description = "Поочередное касание пальцев - развивает мелкую моторику"
         self.exercise_id = "finger-touching"
 
-        # Состояние
-        self.state = self.STATE_WAITING
-        self.hold_start = 0.0
         self.hold_duration = 0.7
-
-        # Счетчики
-        self.current_cycle = 0
-        self.current_finger = 0
         self.total_cycles = 5
 
-        # Флаги
-        self.completed = False
-        self.auto_reset = False
-        self.cycle_completed = False
-
         # Для касания - адаптивные пороги
         self.base_threshold = 0.045
         self.touch_cooldown = 0.2
-        self.last_touch_time = 0.0
+
+        # Шаг - касание большим пальцем очередного пальца. Контекст кадра:
+        # (расстояние до пальца, адаптивный порог, расстояние в размерах пальца)
+        # Для отпускания используется порог побольше (гистерезис)
+        self.machine = HoldMachine([
+            Step(f'finger_{finger}', self._is_touching, self.hold_duration, keep=self._is_still_touching,
+                 cooldown=self.touch_cooldown, finger=finger, tip=self.FINGER_TIPS[finger])
+            for finger in range(1, 5)
+        ], self.total_cycles)
+
+        # Флаги
+        self.auto_reset = False
+        self.cycle_completed = False
 
         # Для адаптивного порога (учитываем толщину пальцев)
-        self.finger_sizes = [0.0] * 5  # размеры пальцев
+        self.finger_sizes = np.zeros(5)  # размеры пальцев
         self.calibrated = False
         self.calibration_start = 0.0
         self.calibration_duration = 1.5
 
-        self.structured_data = self._get_structured_data()
         logger.info(f"Упражнение инициализировано: {self.name}")
 
+    # Состояние упражнения - из автомата
+    @property
+    def state(self):
+        return self.STATE_HOLDING if self.machine.holding else self.STATE_WAITING
+
+    @property
+    def current_cycle(self):
+        return self.machine.cycle
+
+    @property
+    def current_finger(self):
+        return self.machine.step_idx
+
+    @property
+    def completed(self):
+        return self.machine.completed
+
+    @property
+    def hold_start(self):
+        return self.machine.hold_start
+
+    @staticmethod
+    def _is_touching(ctx):
+        distance, threshold, normalized_distance = ctx
+        return distance < threshold or normalized_distance < 0.5
+
+    @staticmethod
+    def _is_still_touching(ctx):
+        distance, threshold, _ = ctx
+        return distance < threshold * 1.3
+
     def reset(self):
         """Быстрый сброс"""
-        self.state = self.STATE_WAITING
-        self.current_cycle = 0
-        self.current_finger = 0
-        self.completed = False
+        self.machine.reset()
         self.auto_reset = False
         self.cycle_completed = False
-        self.hold_start = 0.0
-        self.last_touch_time = 0.0
         self.calibrated = False
-        self.finger_sizes = [0.0] * 5
-        self.structured_data = self._get_structured_data()
+        self.finger_sizes = np.zeros(5)
         return True
 
-    def _calibrate_finger_sizes(self, hand_landmarks):
+    def _calibrate_finger_sizes(self, points):
         """Калибровка размеров пальцев пользователя"""
         if not self.calibrated:
             if self.calibration_start == 0.0:
-                self.calibration_start = time.time()
+                self.calibration_start = self.clock()
                 return False
 
-            if time.time() - self.calibration_start >= self.calibration_duration:
+            if self.clock() - self.calibration_start >= self.calibration_duration:
                 # Калибровка завершена
                 self.calibrated = True
                 # Усредняем и корректируем пороги
-                avg_size = sum(self.finger_sizes) / 5 if any(self.finger_sizes) else 0.045
+                avg_size = float(self.finger_sizes.mean()) if self.finger_sizes.any() else 0.045
                 self.touch_threshold = avg_size * 0.8  # 80% от среднего размера
                 logger.info(f"Калибровка завершена, порог: {self.touch_threshold:.3f}")
                 return True
             return False
 
         # Собираем данные о размерах пальцев
-        for i in range(5):
-            tip = hand_landmarks.landmark[self.FINGER_TIPS[i]]
-            mcp = hand_landmarks.landmark[self.FINGER_MCP[i]]
-            # Размер пальца = расстояние от кончика до сустава
-            size = abs(tip.y - mcp.y)
-            # Экспоненциальное сглаживание
-            self.finger_sizes[i] = self.finger_sizes[i] * 0.7 + size * 0.3
+        # Размер пальца = расстояние от кончика до сустава
+        sizes = np.abs(points[HAND_TIPS, 1] - points[HAND_MCPS, 1])
+        # Экспоненциальное сглаживание
+        self.finger_sizes = self.finger_sizes * 0.7 + sizes * 0.3
 
         return False
 
     def get_finger_states(self, hand_landmarks, frame_shape):
         """Быстрое получение позиций пальцев"""
-        h, w, _ = frame_shape
-        tip_positions = []
-        finger_states = [False] * 5
+        points = hand_array(hand_landmarks)
 
         # Калибровка
-        self._calibrate_finger_sizes(hand_landmarks)
+        self._calibrate_finger_sizes(points)
 
-        for i in range(5):
-            tip = hand_landmarks.landmark[self.FINGER_TIPS[i]]
-            x = int(tip.x * w)
-            y = int(tip.y * h)
-            tip_positions.append((x, y))
-
-            if i == 0:
-                index_mcp = hand_landmarks.landmark[5]
-                dist = abs(tip.x - index_mcp.x) + abs(tip.y - index_mcp.y)
-                finger_states[i] = dist > 0.15
-            else:
-                pip = hand_landmarks.landmark[self.FINGER_TIPS[i] - 1]
-                finger_states[i] = tip.y < pip.y - 0.02
-
-        return finger_states, tip_positions
+        # Поднятость пальца - относительно дистального сустава (кончик - 1)
+        return finger_states(points, HAND_DIPS), tip_positions(points, frame_shape)
 
     def reset_for_new_attempt(self):
         return self.reset()
@@ -152,18 +161,25 @@ class FingerTouchingExercise(BaseExercise):
         next_cycle = min(self.current_cycle + 1, self.total_cycles)
 
         if not self.calibrated:
-            return f"🔧 Калибровка... держите пальцы раскрытыми ({int(self.calibration_duration - (time.time() - self.calibration_start))}с)"
+            return f"🔧 Калибровка... держите пальцы раскрытыми ({int(self.calibration_duration - (self.state_time - self.calibration_start))}с)"
 
         if self.state == self.STATE_WAITING:
             if self.current_finger == 0:
                 return f"Коснитесь указательным пальцем (цикл {next_cycle}/{self.total_cycles})"
             return f"Коснитесь {self.FINGER_NAMES[self.current_finger]} пальцем (цикл {next_cycle}/{self.total_cycles})"
         else:
-            remaining = int(self.hold_duration - (time.time() - self.hold_start)) + 1
+            remaining = int(self.hold_duration - (self.state_time - self.hold_start)) + 1
             if self.current_finger == 0:
                 return f"Держите... {remaining}с (цикл {next_cycle}/{self.total_cycles})"
             return f"Держите... {remaining}с"
 
+    def state_key(self):
+        machine = self.machine
+        # Во время удержания и калибровки в сообщении - обратный отсчет
+        timed = machine.holding or not self.calibrated
+        return (machine.step_idx, machine.cycle, machine.holding, machine.completed, self.cycle_completed,
+                self.auto_reset, self.calibrated, self.state_time if timed else None)
+
     def _get_structured_data(self):
         data = {
             "state": self.state,
@@ -179,7 +195,7 @@ class FingerTouchingExercise(BaseExercise):
         }
 
         if self.state == self.STATE_HOLDING and self.hold_start:
-            elapsed = time.time() - self.hold_start
+            elapsed = self.state_time - self.hold_start
             remaining = int(self.hold_duration - elapsed) + 1
             data["countdown"] = remaining
             data["hold_progress"] = min(100, (elapsed / self.hold_duration) * 100)
@@ -207,7 +223,7 @@ class FingerTouchingExercise(BaseExercise):
         """Возвращает адаптивный порог для конкретного пальца"""
         if self.calibrated and self.finger_sizes[finger_idx] > 0:
             # Порог = 60% от размера пальца (но не меньше базового)
-            return max(self.base_threshold, self.finger_sizes[finger_idx] * 0.6)
+            return max(self.base_threshold, float(self.finger_sizes[finger_idx]) * 0.6)
         return self.base_threshold
 
     def check_fingers(self, finger_states, hand_landmarks, frame_shape):
@@ -218,64 +234,33 @@ class FingerTouchingExercise(BaseExercise):
             self.auto_reset = False
 
         if self.completed:
-            self.structured_data = self._get_structured_data()
-            return True, self.structured_data["message"]
+            return True, self.get_structured_data()["message"]
 
         # Если калибровка не завершена
         if not self.calibrated:
-            self.structured_data = self._get_structured_data()
-            return True, self.structured_data["message"]
-
-        current_time = time.time()
+            return True, self.get_structured_data()["message"]
 
-        # Быстрое получение координат
-        thumb = hand_landmarks.landmark[self.FINGER_TIPS[0]]
-        target_idx = self.current_finger + 1
-        target = hand_landmarks.landmark[self.FINGER_TIPS[target_idx]]
+        current_time = self.clock()
 
-        # Манхэттенское расстояние
-        dx = thumb.x - target.x
-        dy = thumb.y - target.y
-        distance = abs(dx) + abs(dy)
+        # Манхэттенское расстояние от большого пальца до текущего
+        step = self.machine.step
+        target_idx = step.data['finger']
+        distance = manhattan(hand_array(hand_landmarks), self.FINGER_TIPS[0], step.data['tip'])
 
         # Адаптивный порог для текущего пальца
         threshold = self._get_adaptive_threshold(target_idx)
 
         # Дополнительная проверка: учитываем также относительное расстояние
         # Нормализуем по размеру пальца
-        finger_size = self.finger_sizes[target_idx]
-        normalized_distance = distance / max(finger_size, 0.01)
-        is_touching = distance < threshold or normalized_distance < 0.5
+        finger_size = float(self.finger_sizes[target_idx])
+        event = self.machine.update((distance, threshold, distance / max(finger_size, 0.01)), current_time)
 
-        self.cycle_completed = False
+        self.cycle_completed = event in (EVENT_STEP_DONE, EVENT_CYCLE_DONE, EVENT_COMPLETED)
+        if event == EVENT_COMPLETED:
+            self.auto_reset = True
+            logger.info("Упражнение завершено!")
 
-        if self.state == self.STATE_WAITING:
-            if is_touching and (current_time - self.last_touch_time) > self.touch_cooldown:
-                self.state = self.STATE_HOLDING
-                self.hold_start = current_time
-                self.last_touch_time = current_time
-
-        elif self.state == self.STATE_HOLDING:
-            # Для отпускания используем чуть больший порог (гистерезис)
-            release_threshold = threshold * 1.3
-            if distance >= release_threshold:
-                self.state = self.STATE_WAITING
-            elif current_time - self.hold_start >= self.hold_duration:
-                self.state = self.STATE_WAITING
-                self.current_finger += 1
-                self.cycle_completed = True
-
-                if self.current_finger >= 4:
-                    self.current_finger = 0
-                    self.current_cycle += 1
-
-                    if self.current_cycle >= self.total_cycles:
-                        self.completed = True
-                        self.auto_reset = True
-                        logger.info("Упражнение завершено!")
-
-        self.structured_data = self._get_structured_data()
-        return True, self.structured_data["message"]
+        return True, self.get_structured_data()["message"]
 
     def draw_feedback(self, frame, finger_states, tip_positions, is_correct, message):
         """Быстрая отрисовка с большими точками"""
@@ -292,33 +277,34 @@ class FingerTouchingExercise(BaseExercise):
             cv2.putText(frame, str(i + 1), (x - 8, y + 8),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
-        # Информационная панель
-        h, w = frame.shape[:2]
+        # Информационная панель - из кэша, пока не изменились калибровка, прогресс и сообщение
+        progress = self._get_progress_percent() if self.calibrated else None
+        msg = message[:35]
+        panel_cache.draw(frame, (self.exercise_id, progress, msg), 100,
+                         lambda canvas: self._draw_panel(canvas, progress, msg))
+
+        return frame
+
+    def _draw_panel(self, frame, progress, msg):
         cv2.rectangle(frame, (5, 5), (400, 95), (0, 0, 0), -1)
         cv2.putText(frame, self.name[:12], (15, 28),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1)
 
         # Статус калибровки
-        if not self.calibrated:
+        if progress is None:
             cv2.putText(frame, "КАЛИБРОВКА...", (15, 48),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
         else:
             # Прогресс
-            progress = self._get_progress_percent()
             bar_width = int(progress / 100 * 250)
             cv2.rectangle(frame, (15, 40), (15 + bar_width, 52), (0, 255, 0), -1)
             cv2.putText(frame, f"{progress}%", (280, 50),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
 
         # Сообщение
-        msg = message[:35]
         cv2.putText(frame, msg, (15, 75),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
 
-        return frame
-
-    def get_structured_data(self):
-        return self.structured_data
 
     def force_reset_if_needed(self):
         if self.completed:
@@ -3,12 +3,13 @@
 Чередование сжатия и разжатия пальцев для улучшения кровообращения
 """
 
-import time
 import logging
 
 import cv2
 
 from .base_exercise import BaseExercise
+from .overlay import panel_cache
+from .hold_machine import HoldMachine, Step, EVENT_STARTED, EVENT_CYCLE_DONE, EVENT_COMPLETED
 
 logger = logging.getLogger('LFK.Exercise.FistPalm')
 
@@ -37,35 +38,51 @@ class FistPalmExercise(BaseExercise):
         self.description = "Сжимайте и разжимайте пальцы"
         self.exercise_id = "fist-palm"
 
-        # Состояние
-        self.state = self.STATE_WAITING_FIST
-        self.state_start_time = 0.0
         self.hold_duration = 2.5
-
-        # Счетчики
-        self.current_cycle = 0
         self.total_cycles = 5
 
+        # Кулак: 0-1 палец поднят, Ладонь: 4-5 пальцев поднято (контекст - число поднятых пальцев)
+        self.machine = HoldMachine((
+            Step('fist', lambda raised: raised <= 1, self.hold_duration,
+                 waiting=self.STATE_WAITING_FIST, holding=self.STATE_HOLDING_FIST,
+                 waiting_name="Ожидание кулака", holding_name="Держите кулак",
+                 prompt="Сожмите кулак", hold_message="Держите кулак"),
+            Step('palm', lambda raised: raised >= 4, self.hold_duration,
+                 waiting=self.STATE_WAITING_PALM, holding=self.STATE_HOLDING_PALM,
+                 waiting_name="Ожидание ладони", holding_name="Держите ладонь",
+                 prompt="Раскройте ладонь", hold_message="Держите ладонь"),
+        ), self.total_cycles)
+
         # Таймер
         self.countdown = self.hold_duration
 
         # Флаги
         self.cycle_completed = False
-        self.completed_flag = False
         self.auto_reset_on_next_start = False
 
-        self.structured_data = self._get_structured_data()
         logger.info(f"Упражнение инициализировано: {self.name}")
 
+    # Состояние упражнения - из автомата
+    @property
+    def state(self):
+        if self.machine.completed:
+            return self.STATE_COMPLETED
+        step = self.machine.step
+        return step.data['holding'] if self.machine.holding else step.data['waiting']
+
+    @property
+    def current_cycle(self):
+        return self.machine.cycle
+
+    @property
+    def completed_flag(self):
+        return self.machine.completed
+
     def reset(self):
-        self.state = self.STATE_WAITING_FIST
-        self.state_start_time = 0.0
-        self.current_cycle = 0
+        self.machine.reset()
         self.countdown = self.hold_duration
         self.cycle_completed = False
-        self.completed_flag = False
         self.auto_reset_on_next_start = False
-        self.structured_data = self._get_structured_data()
         return True
 
     def reset_for_new_attempt(self):
@@ -82,39 +99,36 @@ class FistPalmExercise(BaseExercise):
         return False
 
     def _get_state_name(self):
-        names = {
-            self.STATE_WAITING_FIST: "Ожидание кулака",
-            self.STATE_HOLDING_FIST: "Держите кулак",
-            self.STATE_WAITING_PALM: "Ожидание ладони",
-            self.STATE_HOLDING_PALM: "Держите ладонь",
-            self.STATE_COMPLETED: "Упражнение завершено"
-        }
-        return names.get(self.state, "Неизвестно")
+        if self.machine.completed:
+            return "Упражнение завершено"
+        step = self.machine.step
+        return step.data['holding_name'] if self.machine.holding else step.data['waiting_name']
 
     def _get_state_message(self):
-        if self.state == self.STATE_COMPLETED:
+        if self.machine.completed:
             return f"Завершено! {self.total_cycles} циклов"
 
-        next_cycle = min(self.current_cycle + 1, self.total_cycles)
+        step = self.machine.step
+        if self.machine.holding:
+            return f"{step.data['hold_message']}... {self.countdown}с"
 
-        if self.state == self.STATE_WAITING_FIST:
-            return f"Сожмите кулак ({next_cycle}/{self.total_cycles})"
-        elif self.state == self.STATE_HOLDING_FIST:
-            return f"Держите кулак... {self.countdown}с"
-        elif self.state == self.STATE_WAITING_PALM:
-            return f"Раскройте ладонь ({next_cycle}/{self.total_cycles})"
-        elif self.state == self.STATE_HOLDING_PALM:
-            return f"Держите ладонь... {self.countdown}с"
+        next_cycle = min(self.current_cycle + 1, self.total_cycles)
+        return f"{step.data['prompt']} ({next_cycle}/{self.total_cycles})"
 
-        return ""
+    def state_key(self):
+        machine = self.machine
+        return (machine.step_idx, machine.cycle, machine.holding, machine.completed, self.countdown,
+                self.cycle_completed, self.auto_reset_on_next_start,
+                self.state_time if machine.holding else None)
 
     def _get_structured_data(self):
+        holding = self.machine.holding and not self.machine.completed
         data = {
             "state": self.state,
             "state_name": self._get_state_name(),
             "current_cycle": self.current_cycle,
             "total_cycles": self.total_cycles,
-            "countdown": None,
+            "countdown": self.countdown if holding else None,
             "progress_percent": 0,
             "message": self._get_state_message(),
             "cycle_completed": self.cycle_completed,
@@ -122,76 +136,27 @@ class FistPalmExercise(BaseExercise):
             "auto_reset": self.auto_reset_on_next_start
         }
 
-        if self.state in (self.STATE_HOLDING_FIST, self.STATE_HOLDING_PALM):
-            data["countdown"] = self.countdown
-            if self.state_start_time:
-                elapsed = time.time() - self.state_start_time
-                data["progress_percent"] = min(100, (elapsed / self.hold_duration) * 100)
+        if holding and self.machine.hold_start:
+            elapsed = self.state_time - self.machine.hold_start
+            data["progress_percent"] = min(100, (elapsed / self.hold_duration) * 100)
 
         return data
 
     def check_fingers(self, finger_states, hand_landmarks, frame_shape):
         self.check_and_reset_if_needed()
 
-        raised_fingers = sum(finger_states)
-        current_time = time.time()
-
-        # Кулак: 0-1 палец поднят, Ладонь: 4-5 пальцев поднято
-        is_fist = raised_fingers <= 1
-        is_palm = raised_fingers >= 4
+        current_time = self.clock()
+        event = self.machine.update(sum(finger_states), current_time)
 
-        self.cycle_completed = False
+        self.cycle_completed = event in (EVENT_CYCLE_DONE, EVENT_COMPLETED)
+        if event == EVENT_STARTED:
+            self.countdown = self.hold_duration
+        elif self.machine.holding:
+            self.countdown = self.machine.countdown(current_time)
+        elif event == EVENT_COMPLETED:
+            self.auto_reset_on_next_start = True
 
-        if self.state == self.STATE_WAITING_FIST:
-            if is_fist:
-                self.state = self.STATE_HOLDING_FIST
-                self.state_start_time = current_time
-                self.countdown = self.hold_duration
-
-        elif self.state == self.STATE_HOLDING_FIST:
-            if not is_fist:
-                self.state = self.STATE_WAITING_FIST
-            else:
-                elapsed = current_time - self.state_start_time
-                new_countdown = int(self.hold_duration - elapsed) + 1
-                if new_countdown != self.countdown:
-                    self.countdown = new_countdown
-
-                if elapsed >= self.hold_duration:
-                    self.state = self.STATE_WAITING_PALM
-                    self.state_start_time = current_time
-                    self.countdown = self.hold_duration
-
-        elif self.state == self.STATE_WAITING_PALM:
-            if is_palm:
-                self.state = self.STATE_HOLDING_PALM
-                self.state_start_time = current_time
-                self.countdown = self.hold_duration
-
-        elif self.state == self.STATE_HOLDING_PALM:
-            if not is_palm:
-                self.state = self.STATE_WAITING_PALM
-            else:
-                elapsed = current_time - self.state_start_time
-                new_countdown = int(self.hold_duration - elapsed) + 1
-                if new_countdown != self.countdown:
-                    self.countdown = new_countdown
-
-                if elapsed >= self.hold_duration:
-                    self.current_cycle += 1
-                    self.cycle_completed = True
-
-                    if self.current_cycle >= self.total_cycles:
-                        self.state = self.STATE_COMPLETED
-                        self.completed_flag = True
-                        self.auto_reset_on_next_start = True
-                    else:
-                        self.state = self.STATE_WAITING_FIST
-                        self.state_start_time = current_time
-                        self.countdown = self.hold_duration
-
-        self.structured_data = self._get_structured_data()
-        return True, self.structured_data["message"]
+        return True, self.get_structured_data()["message"]
 
     def get_finger_colors(self, finger_states):
         """Цвета для пальцев"""
@@ -219,7 +184,13 @@ class FistPalmExercise(BaseExercise):
             cv2.circle(frame, (x, y), 18, color, -1)
             cv2.circle(frame, (x, y), 18, self.COLORS['white'], 1)
 
-        # МАЛЕНЬКАЯ панель сверху слева (только основная информация)
+        # МАЛЕНЬКАЯ панель сверху слева - меняется только с номером цикла
+        cycle = self.current_cycle
+        panel_cache.draw(frame, (self.exercise_id, cycle), 60, lambda canvas: self._draw_panel(canvas, cycle))
+
+        return frame
+
+    def _draw_panel(self, frame, cycle):
         cv2.rectangle(frame, (5, 5), (250, 55), self.COLORS['black'], -1)
         cv2.rectangle(frame, (5, 5), (250, 55), self.COLORS['white'], 1)
 
@@ -228,13 +199,9 @@ class FistPalmExercise(BaseExercise):
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.COLORS['white'], 1)
 
         # Прогресс (цикл)
-        cv2.putText(frame, f"Cycle: {self.current_cycle}/{self.total_cycles}", (15, 45),
+        cv2.putText(frame, f"Cycle: {cycle}/{self.total_cycles}", (15, 45),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.45, self.COLORS['green'], 1)
 
-        return frame
-
-    def get_structured_data(self):
-        return self.structured_data
 
     def force_reset_if_needed(self):
         if self.state == self.STATE_COMPLETED or self.completed_flag:
@@ -0,0 +1,122 @@
+"""
+Табличный автомат упражнений "ожидание -> удержание -> следующий шаг -> цикл -> завершено"
+Упражнение описывается списком шагов: условие входа в удержание, условие продолжения
+(гистерезис), длительность удержания и минимальная пауза между попытками. Автомат хранит
+только индексы и время - за кадр это выборка текущего шага и вызов одного условия.
+
+Условия получают контекст кадра, который упражнение считает само (число поднятых пальцев,
+расстояние до пальца, направление движения головы).
+"""
+
+import logging
+from typing import Any, Callable, Optional, Sequence
+
+logger = logging.getLogger('LFK.Exercises.HoldMachine')
+
+# События update()
+EVENT_NONE = 0
+EVENT_STARTED = 1      # условие выполнено, удержание началось
+EVENT_RELEASED = 2     # удержание прервано
+EVENT_STEP_DONE = 3    # шаг удержан, следующий шаг того же цикла
+EVENT_CYCLE_DONE = 4   # последний шаг удержан, начат следующий цикл
+EVENT_COMPLETED = 5    # последний шаг последнего цикла
+
+Predicate = Callable[[Any], bool]
+
+
+def always(ctx) -> bool:
+    return True
+
+
+class Step:
+    """Шаг упражнения (неизменяемая строка таблицы)"""
+
+    __slots__ = ('name', 'enter', 'keep', 'hold', 'cooldown', 'data')
+
+    def __init__(self, name: str, enter: Predicate, hold: float, keep: Optional[Predicate] = None,
+                 cooldown: float = 0.0, **data):
+        self.name = name
+        self.enter = enter
+        # Условие продолжения удержания; по умолчанию - то же, что и входа
+        self.keep = keep or enter
+        self.hold = hold
+        # Новое удержание не раньше, чем через cooldown секунд после начала предыдущего
+        self.cooldown = cooldown
+        # Данные упражнения для шага: подписи, сообщения, индексы точек
+        self.data = data
+
+
+class HoldMachine:
+    """Проход по шагам total_cycles раз с удержанием каждого шага"""
+
+    __slots__ = ('steps', 'total_cycles', 'step_idx', 'cycle', 'holding', 'hold_start',
+                 'last_enter', 'completed')
+
+    def __init__(self, steps: Sequence[Step], total_cycles: int):
+        self.steps = tuple(steps)
+        self.total_cycles = total_cycles
+        self.reset()
+
+    def reset(self):
+        self.step_idx = 0
+        self.cycle = 0
+        self.holding = False
+        self.hold_start = 0.0
+        self.last_enter = 0.0
+        self.completed = False
+
+    @property
+    def step(self) -> Step:
+        return self.steps[self.step_idx]
+
+    def update(self, ctx, now: float) -> int:
+        """Один кадр: условие текущего шага по контексту ctx в момент now"""
+        if self.completed:
+            return EVENT_NONE
+
+        step = self.steps[self.step_idx]
+        if not self.holding:
+            if step.cooldown and now - self.last_enter <= step.cooldown:
+                return EVENT_NONE
+            if not step.enter(ctx):
+                return EVENT_NONE
+            self.holding = True
+            self.hold_start = self.last_enter = now
+            return EVENT_STARTED
+
+        if not step.keep(ctx):
+            self.holding = False
+            return EVENT_RELEASED
+        if now - self.hold_start < step.hold:
+            return EVENT_NONE
+
+        self.holding = False
+        self.step_idx += 1
+        if self.step_idx < len(self.steps):
+            return EVENT_STEP_DONE
+
+        self.step_idx = 0
+        self.cycle += 1
+        if self.cycle < self.total_cycles:
+            return EVENT_CYCLE_DONE
+        self.completed = True
+        return EVENT_COMPLETED
+
+    # ============ ВРЕМЯ УДЕРЖАНИЯ ============
+
+    def elapsed(self, now: float) -> float:
+        return now - self.hold_start if self.holding else 0.0
+
+    def countdown(self, now: float) -> int:
+        """Оставшиеся секунды удержания, округленные вверх (как на экране)"""
+        return int(self.step.hold - (now - self.hold_start)) + 1
+
+    def hold_fraction(self, now: float) -> float:
+        """Доля удержания текущего шага 0..1"""
+        if not self.holding:
+            return 0.0
+        return min(1.0, (now - self.hold_start) / self.step.hold)
+
+    def steps_done(self) -> int:
+        """Пройдено шагов с начала упражнения"""
+        return self.cycle * len(self.steps) + self.step_idx
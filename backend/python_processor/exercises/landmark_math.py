@@ -0,0 +1,107 @@
+"""
+Точки руки/позы как массивы NumPy
+Менеджер один раз на кадр переводит landmarks MediaPipe в массив float32, и упражнения
+считают состояния пальцев, расстояния и углы операциями над массивом, а не обходом
+protobuf-объектов по атрибутам.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+# Точки позы, которые используют упражнения (индексы MediaPipe Pose)
+POSE_NOSE, POSE_LEFT_SHOULDER, POSE_RIGHT_SHOULDER = 0, 11, 12
+POSE_POINTS_COUNT = 33
+
+# Индексы MediaPipe Hands (срезы - представления без копирования)
+HAND_TIPS = slice(4, 21, 4)      # 4, 8, 12, 16, 20
+HAND_DIPS = slice(3, 20, 4)      # 3, 7, 11, 15, 19
+HAND_MCPS = slice(1, 18, 4)      # 1, 5, 9, 13, 17
+# Средние суставы 6, 10, 14, 18; для большого пальца (2) значение не используется
+HAND_PIPS = slice(2, 19, 4)
+THUMB_TIP, INDEX_MCP = 4, 5
+
+# Строки массива позы: нос, левое плечо, правое плечо
+POSE_SUBSET = (POSE_NOSE, POSE_LEFT_SHOULDER, POSE_RIGHT_SHOULDER)
+POSE_ROW_NOSE, POSE_ROW_LEFT_SHOULDER, POSE_ROW_RIGHT_SHOULDER = 0, 1, 2
+
+# Пороги определения поднятого пальца (нормализованные координаты)
+THUMB_RAISED_DISTANCE = 0.15
+FINGER_RAISED_MARGIN = 0.02
+
+
+def hand_array(hand_landmarks) -> np.ndarray:
+    """Точки руки -> (21, 3) float32: x, y, z. Массив возвращается как есть"""
+    if isinstance(hand_landmarks, np.ndarray):
+        return hand_landmarks
+    return np.array([(p.x, p.y, p.z) for p in hand_landmarks.landmark], dtype=np.float32)
+
+
+def pose_array(pose_landmarks) -> np.ndarray:
+    """Точки позы, нужные упражнениям -> (3, 4) float32: x, y, z, visibility (строки POSE_ROW_*)"""
+    if isinstance(pose_landmarks, np.ndarray):
+        return pose_landmarks
+    points = pose_landmarks.landmark
+    return np.array([(points[i].x, points[i].y, points[i].z, points[i].visibility) for i in POSE_SUBSET],
+                    dtype=np.float32)
+
+
+def nose_pose(nose) -> np.ndarray:
+    """Поза из одной точки носа (детектор лица) -> (33, 4) float32: нос в строке POSE_NOSE,
+    остальные точки NaN - так ее пишет запись сессии"""
+    points = np.full((POSE_POINTS_COUNT, 4), np.nan, dtype=np.float32)
+    points[POSE_NOSE] = nose
+    return points
+
+
+def landmarks_array(landmark_list, visibility: bool = False) -> np.ndarray:
+    """Все точки -> (N, 3) или (N, 4) float32 с visibility (отрисовка скелета позы)"""
+    if visibility:
+        return np.array([(p.x, p.y, p.z, p.visibility) for p in landmark_list.landmark], dtype=np.float32)
+    return np.array([(p.x, p.y, p.z) for p in landmark_list.landmark], dtype=np.float32)
+
+
+# Функции ниже принимают и один кадр (21, 3), и пачку кадров (N, 21, 3) - например, всю запись сессии
+
+def raised_fingers(points: np.ndarray, joints=HAND_PIPS) -> np.ndarray:
+    """Поднят ли каждый палец: кончик выше сустава joints; большой - далеко от основания указательного"""
+    y = points[..., 1]
+    states = y[..., HAND_TIPS] < y[..., joints] - FINGER_RAISED_MARGIN
+    states[..., 0] = manhattan(points, THUMB_TIP, INDEX_MCP) > THUMB_RAISED_DISTANCE
+    return states
+
+
+def finger_states(points: np.ndarray, joints=HAND_PIPS) -> List[bool]:
+    """raised_fingers одного кадра списком (для ответа клиенту и check_fingers)"""
+    return raised_fingers(points, joints).tolist()
+
+
+def tip_positions(points: np.ndarray, frame_shape: Tuple[int, int, int]) -> List[Tuple[int, int]]:
+    """Кончики пальцев в пикселях кадра"""
+    h, w = frame_shape[:2]
+    # Умножение в float64 - те же пиксели, что int(tip.x * w) у точек MediaPipe (float32)
+    pixels = (points[HAND_TIPS, :2] * np.array([w, h], dtype=np.float64)).astype(np.int32)
+    return list(map(tuple, pixels.tolist()))
+
+
+def _value(result):
+    return float(result) if np.ndim(result) == 0 else result
+
+
+def manhattan(points: np.ndarray, a: int, b: int):
+    """|dx| + |dy| между точками a и b"""
+    return _value(np.abs(points[..., a, :2] - points[..., b, :2]).sum(-1))
+
+
+def distance(points: np.ndarray, a: int, b: int):
+    """Евклидово расстояние между точками a и b (x, y, z)"""
+    return _value(np.linalg.norm(points[..., a, :3] - points[..., b, :3], axis=-1))
+
+
+def angle(points: np.ndarray, a: int, b: int, c: int):
+    """Угол abc в градусах (в плоскости кадра)"""
+    ba = points[..., a, :2] - points[..., b, :2]
+    bc = points[..., c, :2] - points[..., b, :2]
+    norm = np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1)
+    cos = np.einsum('...i,...i', ba, bc) / np.maximum(norm, 1e-12)
+    return _value(np.degrees(np.arccos(np.clip(cos, -1.0, 1.0))))
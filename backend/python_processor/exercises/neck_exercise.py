@@ -3,11 +3,11 @@
 Без калибровки - просто отслеживаем движение носа
 """
 
-import time
 import logging
 from typing import Tuple, List, Dict, Any
 from collections import deque
 from .base_exercise import BaseExercise, BodyPart
+from .hold_machine import HoldMachine, Step, always, EVENT_STARTED, EVENT_STEP_DONE, EVENT_CYCLE_DONE, EVENT_COMPLETED
 
 logger = logging.getLogger('LFK.Exercise.Neck')
 
@@ -30,17 +30,16 @@ class NeckExercise(BaseExercise):
         ]
 
         
-        self.current_move_idx = 0
-        self.current_move = self.movements[self.current_move_idx]
-
-        
-        self.current_cycle = 0
         self.total_cycles = 3  
-
-        
-        self.hold_start = None
         self.hold_duration = 1.5
-        self.is_holding = False
+
+        # Шаг - движение головы; начатое удержание не прерывается
+        self.machine = HoldMachine([
+            Step(move['type'], lambda movement, required=move['type']: movement == required,
+                 self.hold_duration, keep=always, move=move)
+            for move in self.movements
+        ], self.total_cycles)
+        self.current_move = self.movements[0]
 
         
         self.base_x = None
@@ -49,23 +48,47 @@ class NeckExercise(BaseExercise):
 
         
         self.nose_history = deque(maxlen=5)
-
-        
-        self.completed = False
+        # Сменился детектор носа - на следующем кадре база сдвигается на скачок между детекторами
+        self._source_jump = False
 
         
         self.threshold = 0.008  
 
-        self.structured_data = self._get_structured_data()
         logger.info("Простое упражнение для шеи инициализировано")
 
+    # Состояние упражнения - из автомата
+    @property
+    def current_move_idx(self):
+        return self.machine.step_idx
+
+    @property
+    def current_cycle(self):
+        return self.machine.cycle
+
+    @property
+    def is_holding(self):
+        return self.machine.holding
+
+    @property
+    def hold_start(self):
+        return self.machine.hold_start
+
+    @property
+    def completed(self):
+        return self.machine.completed
+
+    def state_key(self):
+        machine = self.machine
+        return (machine.step_idx, machine.cycle, machine.holding, machine.completed, self.current_move['type'],
+                self.state_time if machine.holding else None)
+
     def _get_structured_data(self) -> Dict[str, Any]:
         progress = self.get_progress()
 
         if self.completed:
             message = "🎉 Упражнение выполнено!"
         elif self.is_holding:
-            remaining = max(0, int(self.hold_duration - (time.time() - self.hold_start)) + 1)
+            remaining = max(0, int(self.hold_duration - (self.state_time - self.hold_start)) + 1)
             message = f"✅ Держите... {remaining}с"
         else:
             message = f"👉 {self.current_move['action']}"
@@ -82,19 +105,25 @@ class NeckExercise(BaseExercise):
             "message": message,
             "completed": self.completed,
             "is_holding": self.is_holding,
-            "countdown": max(0, int(self.hold_duration - (time.time() - self.hold_start)) + 1) if self.is_holding and self.hold_start else None
+            "countdown": max(0, int(self.hold_duration - (self.state_time - self.hold_start)) + 1) if self.is_holding and self.hold_start else None
         }
 
+    def required_landmarks(self) -> Tuple[str, ...]:
+        # Только нос: хватает детектора лица, полная поза не нужна
+        return ('nose',)
+
     def _get_nose_position(self, landmarks: Dict) -> Tuple[float, float]:
         """Получает позицию носа из landmarks"""
-        nose = landmarks.get('nose') or landmarks.get(0)
-        if not nose:
+        nose = landmarks.get('nose')
+        if nose is None:
+            nose = landmarks.get(0)
+        if nose is None:
             return None, None
 
         try:
             x = nose.x if hasattr(nose, 'x') else nose[0]
             y = nose.y if hasattr(nose, 'y') else nose[1]
-            return x, y
+            return float(x), float(y)
         except:
             return None, None
 
@@ -126,10 +155,11 @@ class NeckExercise(BaseExercise):
         x, y = self._get_nose_position(landmarks)
 
         if x is None or y is None:
-            self.structured_data = self._get_structured_data()
             return False, "❌ Лицо не найдено. Повернитесь к камере"
 
-        
+        if self._source_jump:
+            self._rebase(x, y)
+
         self.nose_history.append((x, y))
         if len(self.nose_history) >= 3:
             smooth_x = sum(p[0] for p in self.nose_history) / len(self.nose_history)
@@ -143,7 +173,6 @@ class NeckExercise(BaseExercise):
             self.base_y = smooth_y
             self.is_initialized = True
             logger.info(f"Базовое положение установлено: ({self.base_x:.3f}, {self.base_y:.3f})")
-            self.structured_data = self._get_structured_data()
             return True, "Готово! Начинайте движения"
 
         if self.completed:
@@ -151,47 +180,38 @@ class NeckExercise(BaseExercise):
 
         
         movement = self._get_movement(smooth_x, smooth_y)
-        required = self.current_move['type']
+        current_time = self.clock()
+        event = self.machine.update(movement, current_time)
 
-        current_time = time.time()
+        if event == EVENT_COMPLETED:
+            return True, "🎉 Поздравляю! Упражнение выполнено!"
 
-        
-        if self.is_holding:
-            elapsed = current_time - self.hold_start
-            if elapsed >= self.hold_duration:
-                
-                self.is_holding = False
-                self.current_move_idx += 1
-
-                if self.current_move_idx >= len(self.movements):
-                    self.current_move_idx = 0
-                    self.current_cycle += 1
-
-                    if self.current_cycle >= self.total_cycles:
-                        self.completed = True
-                        self.structured_data = self._get_structured_data()
-                        return True, "🎉 Поздравляю! Упражнение выполнено!"
-
-                self.current_move = self.movements[self.current_move_idx]
-                logger.info(f"Следующее: {self.current_move['name']} (круг {self.current_cycle + 1}/{self.total_cycles})")
-            else:
-                self.structured_data = self._get_structured_data()
-                return True, f"✅ Держите... {int(self.hold_duration - elapsed) + 1}с"
-            return True, ""
-
-        
-        if movement == required:
-            
-            self.is_holding = True
-            self.hold_start = current_time
+        if event in (EVENT_STEP_DONE, EVENT_CYCLE_DONE):
+            self.current_move = self.machine.step.data['move']
+            logger.info(f"Следующее: {self.current_move['name']} (круг {self.current_cycle + 1}/{self.total_cycles})")
+        elif event == EVENT_STARTED:
             logger.info(f"✅ Правильно! {self.current_move['name']}")
+        elif self.is_holding:
+            return True, f"✅ Держите... {self.machine.countdown(current_time)}с"
         elif movement != 'neutral':
             
-            self.structured_data = self._get_structured_data()
             return False, f"❌ {self.current_move['action']}"
 
-        self.structured_data = self._get_structured_data()
-        return True, self.structured_data["message"]
+        return True, self.get_structured_data()["message"]
+
+    def pose_source_changed(self):
+        self._source_jump = True
+
+    def _rebase(self, x: float, y: float):
+        """Нос от другого детектора: скачок между последней точкой прежнего детектора и первой
+        нового - смещение детекторов, а не движение головы. База сдвигается на него (отклонение
+        от базы и начатое удержание сохраняются), история сглаживания начинается заново."""
+        self._source_jump = False
+        if self.is_initialized and self.nose_history:
+            last_x, last_y = self.nose_history[-1]
+            self.base_x += x - last_x
+            self.base_y += y - last_y
+        self.nose_history.clear()
 
     def get_finger_colors(self, finger_states: List[bool]) -> List[Tuple[int, int, int]]:
         return [(128, 128, 128)] * 5
@@ -204,30 +224,23 @@ class NeckExercise(BaseExercise):
         done = self.current_cycle * len(self.movements) + self.current_move_idx
 
         if self.is_holding and self.hold_start:
-            elapsed = time.time() - self.hold_start
+            elapsed = self.state_time - self.hold_start
             done += elapsed / self.hold_duration
 
         return min(99.0, (done / total) * 100)
 
     def reset(self) -> bool:
-        self.current_move_idx = 0
+        self.machine.reset()
         self.current_move = self.movements[0]
-        self.current_cycle = 0
-        self.completed = False
-        self.is_holding = False
-        self.hold_start = None
 
         self.is_initialized = False
         self.base_x = None
         self.base_y = None
         self.nose_history.clear()
+        self._source_jump = False
 
-        self.structured_data = self._get_structured_data()
         logger.info("Упражнение сброшено")
         return True
 
     def reset_for_new_attempt(self) -> bool:
         return self.reset()
-
-    def get_structured_data(self) -> Dict[str, Any]:
-        return self.structured_data
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Отрисовка оверлея кадра (render=frame) без повторной работы на каждом кадре
+    SkeletonStyle - стили точек и связей MediaPipe, разобранные один раз: связи сгруппированы
+                    по (цвет, толщина) в массивы индексов и рисуются одним cv2.polylines на группу;
+    PanelCache    - панели с текстом (cv2.rectangle + cv2.putText) рисуются один раз на ключ
+                    (упражнение, сообщение, состояние), дальше - копирование готовых пикселей по маске.
+Панели попиксельно совпадают с прямой отрисовкой, скелет - с mp_drawing.draw_landmarks
+(кроме пересечений связей разного цвета: порядок связей в frozenset MediaPipe и так не задан).
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Как в mediapipe.python.solutions.drawing_utils
+WHITE_COLOR = (224, 224, 224)
+VISIBILITY_THRESHOLD = 0.5
+
+
+def _spec(spec) -> Tuple[Tuple[int, int, int], int, int]:
+    """DrawingSpec MediaPipe -> (цвет, толщина, радиус)"""
+    return tuple(int(c) for c in spec.color), int(spec.thickness), int(spec.circle_radius)
+
+
+class SkeletonStyle:
+    """Разобранные стили скелета: группы связей и параметры кругов точек"""
+
+    def __init__(self, connections: Iterable[Tuple[int, int]], landmark_spec, connection_spec):
+        # landmark_spec/connection_spec - DrawingSpec или словарь {индекс/связь: DrawingSpec}
+        groups: Dict[Tuple, list] = {}
+        for connection in connections:
+            spec = connection_spec[connection] if isinstance(connection_spec, Mapping) else connection_spec
+            color, thickness, _ = _spec(spec)
+            groups.setdefault((color, thickness), []).append(connection)
+        self.connections = [(color, thickness, np.array(pairs, dtype=np.intp))
+                            for (color, thickness), pairs in groups.items()]
+        self.landmark_spec = landmark_spec
+        self._points: Dict[int, list] = {}
+
+    def point_specs(self, count: int):
+        """(индекс, цвет, толщина, радиус, радиус белой окантовки) для count точек"""
+        specs = self._points.get(count)
+        if specs is None:
+            specs = []
+            for idx in range(count):
+                spec = self.landmark_spec[idx] if isinstance(self.landmark_spec, Mapping) else self.landmark_spec
+                color, thickness, radius = _spec(spec)
+                specs.append((idx, color, thickness, radius, max(radius + 1, int(radius * 1.2))))
+            self._points[count] = specs
+        return specs
+
+
+def pixel_points(points: np.ndarray, frame_shape) -> Tuple[np.ndarray, np.ndarray]:
+    """Нормализованные точки (N, 2+) -> пиксели (N, 2) int32 и маска видимых точек
+    (за пределами кадра или с visibility < 0.5 - не рисуются, как у MediaPipe)"""
+    h, w = frame_shape[:2]
+    xy = points[:, :2].astype(np.float64)
+    valid = ((xy >= 0.0) & (xy <= 1.0)).all(axis=1)
+    if points.shape[1] > 3:
+        valid &= points[:, 3] >= VISIBILITY_THRESHOLD
+    pixels = np.floor(xy * (w, h))
+    np.minimum(pixels, (w - 1, h - 1), out=pixels)
+    return pixels.astype(np.int32), valid
+
+
+def draw_skeleton(frame: np.ndarray, points: np.ndarray, style: SkeletonStyle) -> np.ndarray:
+    """Скелет по нормализованным точкам (N, 3) или (N, 4) с visibility, как mp_drawing.draw_landmarks"""
+    pixels, valid = pixel_points(points, frame.shape)
+    all_valid = bool(valid.all())
+
+    for color, thickness, pairs in style.connections:
+        if not all_valid:
+            pairs = pairs[valid[pairs].all(axis=1)]
+            if not len(pairs):
+                continue
+        # (связи, 2 конца, x/y): каждая связь - отдельная ломаная из двух точек
+        cv2.polylines(frame, list(pixels[pairs]), False, color, thickness)
+
+    coords = pixels.tolist()
+    for idx, color, thickness, radius, border in style.point_specs(len(coords)):
+        if all_valid or valid[idx]:
+            center = coords[idx]
+            cv2.circle(frame, center, border, WHITE_COLOR, thickness)
+            cv2.circle(frame, center, radius, color, thickness)
+    return frame
+
+
+class PanelCache:
+    """Готовые панели оверлея: отрисовка один раз на ключ, дальше - копирование по маске
+
+    Панель рисуется функцией draw(canvas) в координатах кадра на двух холстах - черном и белом.
+    Пиксели, одинаковые на обоих, закрашены панелью (текст и рамки рисуются без сглаживания),
+    остальные остаются от кадра. Холст занимает полосу кадра от верхнего края до height;
+    хранится только рамка закрашенных пикселей.
+    """
+
+    def __init__(self, limit: int = 256):
+        self.limit = limit
+        self._panels: "OrderedDict[Hashable, Optional[tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def draw(self, frame: np.ndarray, key: Hashable, height: int, draw: Callable[[np.ndarray], None]):
+        h, w = frame.shape[:2]
+        height = min(height, h)
+        cache_key = (key, w, height)
+        with self._lock:
+            found = cache_key in self._panels
+            if found:
+                panel = self._panels[cache_key]
+                self._panels.move_to_end(cache_key)
+                self.hits += 1
+        if not found:
+            # Рисуем вне lock: промах на одном ключе не задерживает другие сессии
+            panel = self._render(w, height, draw)
+            with self._lock:
+                self.misses += 1
+                self._panels[cache_key] = panel
+                while len(self._panels) > self.limit:
+                    self._panels.popitem(last=False)
+        if panel is None:
+            return frame
+
+        y0, x0, pixels, holes, painted = panel
+        roi = frame[y0:y0 + pixels.shape[0], x0:x0 + pixels.shape[1]]
+        if painted is not None:
+            # Панели мало в своей рамке (например, текст без подложки) - только закрашенные пиксели
+            roi[painted[0], painted[1]] = painted[2]
+        elif holes is not None:
+            # Рамка почти целиком закрашена: копируем ее и возвращаем фон в немногие "дыры" (углы рамки)
+            background = roi[holes]
+            roi[...] = pixels
+            roi[holes] = background
+        else:
+            roi[...] = pixels
+        return frame
+
+    @staticmethod
+    def _render(w: int, height: int, draw):
+        dark = np.zeros((height, w, 3), dtype=np.uint8)
+        light = np.full((height, w, 3), 255, dtype=np.uint8)
+        draw(dark)
+        draw(light)
+
+        painted = (dark == light).all(axis=2)
+        rows, cols = np.nonzero(painted.any(axis=1))[0], np.nonzero(painted.any(axis=0))[0]
+        if not len(rows):
+            return None
+        y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        mask = painted[y0:y1, x0:x1]
+        pixels = np.ascontiguousarray(dark[y0:y1, x0:x1])
+        holes = painted_idx = None
+        unpainted = int(mask.size - np.count_nonzero(mask))
+        if unpainted * 2 > mask.size:
+            rows, cols = np.nonzero(mask)
+            painted_idx = (rows, cols, pixels[rows, cols])
+        elif unpainted:
+            holes = np.nonzero(~mask)
+        return int(y0), int(x0), pixels, holes, painted_idx
+
+    def info(self):
+        with self._lock:
+            return {"panels": len(self._panels), "hits": self.hits, "misses": self.misses}
+
+
+# Общий кэш процесса: одинаковые панели у всех сессий
+panel_cache = PanelCache()
@@ -0,0 +1,164 @@
+"""
+Воспроизведение записанных landmarks через упражнение
+Кадры подаются с их исходными временными метками (ManualClock), поэтому таймеры удержания
+и калибровки ведут себя так же, как в живой сессии, но без ожидания в реальном времени.
+Результат - timeline: structured-состояние упражнения после каждого кадра. Одинаковая запись
+всегда дает одинаковый timeline - его можно сохранить и сверять после изменений в упражнениях.
+
+Формат записи (JSON Lines), одна строка на кадр:
+    {"t": 12.345, "hand": [[x, y, z], ...21]}
+    {"t": 12.378, "pose": [[x, y, z, visibility], ...] | {"nose": [x, y], ...}}
+    {"t": 12.411}                                   - рука/тело не найдены
+Координаты нормализованные, как у MediaPipe; "image_size": [w, h] - размер кадра (по умолчанию 640x480).
+Бинарные записи сессий (*.lfkrec, landmark_recorder.py) читаются напрямую.
+
+Запуск (из backend/python_processor):
+    python -m exercises.replay session.jsonl --exercise fist-palm [--repeat 1000]
+    python -m exercises.replay session.jsonl --exercise neck --timeline > expected.jsonl
+    python -m exercises.replay session.jsonl --exercise neck --expect expected.jsonl
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from . import EXERCISE_CLASSES
+from .base_exercise import BaseExercise, LandmarkList
+from .clock import ManualClock
+from .landmark_math import hand_array, pose_array
+
+DEFAULT_IMAGE_SIZE = (640, 480)
+
+
+def load_recording(path: str) -> List[Dict[str, Any]]:
+    """Кадры записи: бинарная запись сессии (*.lfkrec) или JSON Lines"""
+    if path.endswith('.lfkrec'):
+        # Формат записи описан рядом с процессором (backend/python_processor)
+        from landmark_recorder import iter_frames
+        return list(iter_frames(path))
+    return load_jsonl(path)
+
+
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Кадры записи в порядке следования"""
+    frames = []
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            frame = json.loads(line)
+            if 't' not in frame:
+                raise ValueError(f"{path}:{line_no}: frame has no timestamp 't'")
+            frames.append(frame)
+    return frames
+
+
+class ReplayRunner:
+    """Прогоняет кадры записи через упражнение со временем из записи"""
+
+    def __init__(self, exercise: BaseExercise, image_size=DEFAULT_IMAGE_SIZE):
+        self.exercise = exercise
+        self.clock = ManualClock()
+        self.exercise.set_clock(self.clock)
+        w, h = image_size
+        self.frame_shape = (int(h), int(w), 3)
+
+    @classmethod
+    def for_exercise(cls, exercise_id: str, image_size=DEFAULT_IMAGE_SIZE) -> 'ReplayRunner':
+        if exercise_id not in EXERCISE_CLASSES:
+            raise ValueError(f"Unknown exercise: {exercise_id}")
+        return cls(EXERCISE_CLASSES[exercise_id](), image_size)
+
+    def step(self, frame: Dict[str, Any]) -> Dict[str, Any]:
+        """Один кадр записи -> запись timeline"""
+        self.clock.set(float(frame['t']))
+        frame_shape = self.frame_shape
+        if frame.get('image_size'):
+            w, h = frame['image_size']
+            frame_shape = (int(h), int(w), 3)
+
+        # Как в ExerciseManager: без руки/тела упражнение не вызывается
+        if self.exercise.uses_pose():
+            points = frame.get('pose')
+            if points:
+                pose = pose_array(LandmarkList.from_pose(points, self.exercise.required_landmarks()))
+                is_correct, message = self.exercise.evaluate_pose(pose, frame_shape)
+            else:
+                is_correct, message = False, "Тело не обнаружено"
+        else:
+            points = frame.get('hand')
+            if points:
+                hand = hand_array(LandmarkList.from_hand(points))
+                _, _, is_correct, message = self.exercise.evaluate_hand(hand, frame_shape)
+            else:
+                is_correct, message = False, "Рука не обнаружена"
+
+        return {
+            "t": frame['t'],
+            "detected": bool(points),
+            "correct": bool(is_correct),
+            "message": message,
+            # Упражнения меняют свои словари на месте - фиксируем состояние на этот кадр
+            "structured": copy.deepcopy(self.exercise.get_structured_data())
+        }
+
+    def run(self, frames: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for frame in frames:
+            yield self.step(frame)
+
+
+def replay(exercise_id: str, frames: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Timeline записи для упражнения (каждый прогон - новый экземпляр упражнения)"""
+    return list(ReplayRunner.for_exercise(exercise_id).run(frames))
+
+
+def diff_timelines(actual: List[Dict[str, Any]], expected: List[Dict[str, Any]]) -> Optional[str]:
+    """Первое расхождение timeline или None"""
+    for idx, (got, want) in enumerate(zip(actual, expected)):
+        if got != want:
+            return f"frame {idx} (t={want.get('t')}): expected {json.dumps(want, ensure_ascii=False)}, " \
+                   f"got {json.dumps(got, ensure_ascii=False)}"
+    if len(actual) != len(expected):
+        return f"timeline length: expected {len(expected)}, got {len(actual)}"
+    return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Воспроизведение записи landmarks через упражнение")
+    parser.add_argument('recording', help="запись сессии (*.lfkrec или JSON Lines)")
+    parser.add_argument('--exercise', required=True, choices=sorted(EXERCISE_CLASSES))
+    parser.add_argument('--repeat', type=int, default=1, help="прогонов записи (для замера скорости)")
+    parser.add_argument('--timeline', action='store_true', help="вывести timeline в stdout (JSON Lines)")
+    parser.add_argument('--expect', help="сверить timeline с сохраненным")
+    args = parser.parse_args(argv)
+
+    frames = load_recording(args.recording)
+
+    started = time.perf_counter()
+    for _ in range(max(1, args.repeat)):
+        timeline = replay(args.exercise, frames)
+    elapsed = time.perf_counter() - started
+
+    if args.timeline:
+        for entry in timeline:
+            print(json.dumps(entry, ensure_ascii=False))
+
+    total = len(frames) * max(1, args.repeat)
+    print(f"{args.exercise}: {total} кадров за {elapsed:.3f} с ({total / max(elapsed, 1e-9):.0f} кадров/с)",
+          file=sys.stderr)
+
+    if args.expect:
+        mismatch = diff_timelines(timeline, load_jsonl(args.expect))
+        if mismatch:
+            print(f"Timeline не совпадает: {mismatch}", file=sys.stderr)
+            return 1
+        print("Timeline совпадает", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Адаптивный интервал обработки кадров
+Вместо постоянного FRAME_PROCESS_INTERVAL интервал подбирается по измеренной задержке:
+- на сессию - по скользящей задержке ее кадров (ожидание + обработка);
+- глобально - по задержке всех сессий и загрузке CPU, выделенного сервису (квота cgroup контейнера).
+Действующий интервал сессии - максимум из двух. При перегрузке (утренний наплыв пациентов)
+процессор обрабатывает реже, но не копит очередь; при спаде интервал возвращается к базовому.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import (FRAME_PROCESS_INTERVAL, ADAPTIVE_INTERVAL, TARGET_LATENCY_MS,
+                    MAX_FRAME_INTERVAL, CPU_HIGH_WATERMARK)
+
+# Сглаживание скользящей задержки (EWMA)
+LATENCY_ALPHA = 0.2
+# Интервал сессии меняется не чаще, чем раз в N измерений - чтобы EWMA успела отреагировать
+ADJUST_EVERY = 5
+# Глобальный интервал пересчитывается не чаще раза в секунду
+GLOBAL_UPDATE_PERIOD = 1.0
+
+# Пороги относительно целевой задержки
+RAISE_AT = 1.2
+LOWER_AT = 0.6
+
+
+# Иерархия cgroup контейнера: v2 (единая) или v1 (контроллеры cpu и cpuacct по отдельности)
+CGROUP_ROOT = '/sys/fs/cgroup'
+CGROUP_V1_CPU = ('cpu', 'cpu,cpuacct')
+CGROUP_V1_CPUACCT = ('cpuacct', 'cpu,cpuacct')
+
+
+def _ewma(current: Optional[float], value: float) -> float:
+    return value if current is None else current + LATENCY_ALPHA * (value - current)
+
+
+def _read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def _process_cpu_time() -> float:
+    """CPU-время процесса и завершенных дочерних процессов, секунды"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class CpuUsage:
+    """Потраченное CPU-время и число доступных ядер: cgroup контейнера или, без нее, сам процесс
+    Квота контейнера (docker-compose limits) - это и есть мощность сервиса: загрузка машины другими
+    контейнерами его не касается, а упор в квоту (throttling) виден как загрузка 100%."""
+
+    def __init__(self, root: str = CGROUP_ROOT):
+        self.source, self._used = self._usage_reader(root)
+        self.cpus = self._cpu_limit(root)
+
+    def used(self) -> float:
+        """CPU-время с произвольного начала отсчета, секунды"""
+        try:
+            return self._used()
+        except (OSError, ValueError):
+            # Файлы cgroup пропали (или не читаются) - дальше считаем по процессу
+            self.source, self._used = 'process', _process_cpu_time
+            return self._used()
+
+    @staticmethod
+    def _usage_reader(root: str):
+        stat = os.path.join(root, 'cpu.stat')
+        if os.path.exists(stat):
+            def cgroup2() -> float:
+                for line in _read(stat).splitlines():
+                    key, _, value = line.partition(' ')
+                    if key == 'usage_usec':
+                        return int(value) / 1e6
+                raise ValueError("usage_usec is missing in cpu.stat")
+            return 'cgroup2', cgroup2
+        for controller in CGROUP_V1_CPUACCT:
+            usage = os.path.join(root, controller, 'cpuacct.usage')
+            if os.path.exists(usage):
+                return 'cgroup1', lambda path=usage: int(_read(path)) / 1e9
+        return 'process', _process_cpu_time
+
+    @staticmethod
+    def _cpu_limit(root: str) -> float:
+        """Ядер доступно сервису: квота cgroup, если она меньше ядер, на которых разрешено работать"""
+        try:
+            cpus = float(len(os.sched_getaffinity(0)))
+        except AttributeError:
+            cpus = float(os.cpu_count() or 1)
+
+        quota = None
+        try:
+            if os.path.exists(os.path.join(root, 'cpu.max')):
+                limit, period = _read(os.path.join(root, 'cpu.max')).split()[:2]
+                if limit != 'max':
+                    quota = int(limit) / int(period)
+            else:
+                for controller in CGROUP_V1_CPU:
+                    path = os.path.join(root, controller, 'cpu.cfs_quota_us')
+                    if os.path.exists(path):
+                        limit = int(_read(path))
+                        if limit > 0:
+                            quota = limit / int(_read(os.path.join(root, controller, 'cpu.cfs_period_us')))
+                        break
+        except (OSError, ValueError):
+            pass
+        return min(cpus, quota) if quota else cpus
+
+
+class LoadMonitor:
+    """Глобальная нагрузка процесса: задержка всех сессий и загрузка CPU"""
+
+    def __init__(self, adaptive: bool = ADAPTIVE_INTERVAL, target_ms: float = TARGET_LATENCY_MS,
+                 cpu_usage: CpuUsage = None):
+        self.adaptive = adaptive
+        # False - кадры уже отобраны выше (воркер пула): обрабатывается каждый полученный кадр
+        self.gating = True
+        self.target_ms = target_ms
+        self.interval = 1
+        self.latency_ms: Optional[float] = None
+        self.cpu = 0.0
+        self._lock = threading.Lock()
+        self._updated_at = 0.0
+        self._cpu_usage = cpu_usage or CpuUsage()
+        self._cpu_prev = None
+
+    def record(self, latency_ms: float):
+        with self._lock:
+            self.latency_ms = _ewma(self.latency_ms, latency_ms)
+            now = time.monotonic()
+            if now - self._updated_at < GLOBAL_UPDATE_PERIOD:
+                return
+            self._updated_at = now
+            self.cpu = self._sample_cpu()
+
+            overloaded = self.cpu >= CPU_HIGH_WATERMARK or self.latency_ms > self.target_ms * RAISE_AT
+            relaxed = self.cpu < CPU_HIGH_WATERMARK - 0.15 and self.latency_ms < self.target_ms * LOWER_AT
+            if overloaded and self.interval < MAX_FRAME_INTERVAL:
+                self.interval += 1
+            elif relaxed and self.interval > 1:
+                self.interval -= 1
+
+    def _sample_cpu(self) -> float:
+        """Доля CPU сервиса (квоты контейнера), занятая с прошлого замера"""
+        now, used = time.monotonic(), self._cpu_usage.used()
+        prev, self._cpu_prev = self._cpu_prev, (now, used)
+        if prev is None or now == prev[0]:
+            return self.cpu
+        return min(1.0, max(0.0, (used - prev[1]) / ((now - prev[0]) * self._cpu_usage.cpus)))
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "adaptive": self.adaptive,
+            "interval": self.interval,
+            "latency_ms": round(self.latency_ms or 0.0, 1),
+            "target_latency_ms": self.target_ms,
+            "cpu": round(self.cpu, 2),
+            "cpu_source": self._cpu_usage.source,
+            "cpu_limit": round(self._cpu_usage.cpus, 2)
+        }
+
+
+# Нагрузка текущего процесса
+load_monitor = LoadMonitor()
+
+
+class IntervalController:
+    """Интервал обработки кадров одной сессии"""
+
+    def __init__(self, monitor: LoadMonitor = None, base_interval: int = FRAME_PROCESS_INTERVAL):
+        self.monitor = monitor or load_monitor
+        self.base_interval = max(1, base_interval)
+        self.interval = self.base_interval
+        self.latency_ms: Optional[float] = None
+        self._counter = 0
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    def effective_interval(self) -> int:
+        if not self.monitor.adaptive:
+            return self.base_interval
+        return min(MAX_FRAME_INTERVAL, max(self.interval, self.monitor.interval))
+
+    def should_process(self) -> bool:
+        """Обрабатывать ли очередной кадр (каждый N-й, N - действующий интервал)"""
+        if not self.monitor.gating:
+            return True
+        with self._lock:
+            self._counter += 1
+            if self._counter < self.effective_interval():
+                return False
+            self._counter = 0
+            return True
+
+    def record(self, latency_ms: float):
+        """Задержка обработанного кадра: от поступления до готового ответа"""
+        if not (self.monitor.adaptive and self.monitor.gating):
+            return
+        with self._lock:
+            self.latency_ms = _ewma(self.latency_ms, latency_ms)
+            self._samples += 1
+            if self._samples >= ADJUST_EVERY:
+                target = self.monitor.target_ms
+                if self.latency_ms > target * RAISE_AT and self.interval < MAX_FRAME_INTERVAL:
+                    self.interval += 1
+                    self._samples = 0
+                elif self.latency_ms < target * LOWER_AT and self.interval > self.base_interval:
+                    self.interval -= 1
+                    self._samples = 0
+        self.monitor.record(latency_ms)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "interval": self.effective_interval(),
+            "latency_ms": round(self.latency_ms or 0.0, 1)
+        }
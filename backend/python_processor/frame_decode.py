@@ -0,0 +1,102 @@
+"""
+Декодирование кадра под разрешение инференса
+MediaPipe сам уменьшает кадр до входа модели (192-256 px), поэтому полный кадр телефона
+(1280x720, 1920x1080) ему не нужен. Для инференса кадр ограничивается по длинной стороне
+(LFK_INFERENCE_MAX_SIDE) и только потом переводится в RGB.
+
+Без отрисовки (render=none) полный кадр не декодируется вовсе: JPEG декодируется сразу
+уменьшенным в 2/4/8 раз (масштабирование DCT в libjpeg, IMREAD_REDUCED_COLOR_*), остаток -
+ресайзом. При render=frame кадр декодируется целиком - оверлей рисуется в разрешении клиента.
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Флаги уменьшенного декодирования по коэффициенту
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Маркеры SOF (начало кадра) JPEG: все C0-CF, кроме DHT (C4), JPG (C8) и DAC (CC)
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data) -> Optional[Tuple[int, int]]:
+    """(ширина, высота) из заголовка JPEG без декодирования; None - не JPEG или заголовок не разобран"""
+    data = memoryview(data).cast('B')
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i, end = 2, len(data)
+    while i + 9 <= end:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        # Заполняющие байты 0xFF и маркеры без длины
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            return (data[i + 7] << 8) | data[i + 8], (data[i + 5] << 8) | data[i + 6]
+        if marker == 0xDA:
+            return None
+        i += 2 + ((data[i + 2] << 8) | data[i + 3])
+    return None
+
+
+def reduce_factor(size: Tuple[int, int], max_side: int) -> int:
+    """Наибольший коэффициент 2/4/8, после которого длинная сторона не меньше max_side"""
+    if max_side <= 0:
+        return 1
+    long_side = max(size)
+    for factor, _ in _REDUCED_FLAGS:
+        if long_side // factor >= max_side:
+            return factor
+    return 1
+
+
+def fit_side(frame: np.ndarray, max_side: int) -> np.ndarray:
+    """Кадр с длинной стороной не больше max_side; кадр меньше - без копии
+
+    INTER_LINEAR, а не INTER_AREA: при дробном коэффициенте INTER_AREA в разы медленнее
+    (1080p -> 640: ~5 мс против ~1 мс), а MediaPipe все равно уменьшает кадр билинейно.
+    """
+    h, w = frame.shape[:2]
+    long_side = max(h, w)
+    if max_side <= 0 or long_side <= max_side:
+        return frame
+    scale = max_side / long_side
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+
+
+def decode_frame(buffer: np.ndarray, max_side: int, full: bool
+                 ) -> Tuple[Optional[np.ndarray], Tuple[int, int]]:
+    """Декодирует JPEG/PNG из буфера uint8
+
+    full=True - кадр в исходном разрешении (для отрисовки оверлея), иначе - уменьшенный, но не
+    меньше max_side по длинной стороне. Возвращает (BGR-кадр или None, (h, w) исходного кадра):
+    пиксельные пороги упражнений считаются в размере кадра клиента.
+    """
+    size = None if full else jpeg_size(buffer)
+    factor = reduce_factor(size, max_side) if size else 1
+    if factor == 1:
+        frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if frame is None:
+            return None, (0, 0)
+        return frame, frame.shape[:2]
+
+    frame = cv2.imdecode(buffer, dict(_REDUCED_FLAGS)[factor])
+    if frame is None:
+        return None, (0, 0)
+    w, h = size
+    # Заголовок хранит размер до поворота по EXIF, который imdecode применяет
+    if (frame.shape[0] > frame.shape[1]) != (h > w):
+        h, w = w, h
+    return frame, (h, w)
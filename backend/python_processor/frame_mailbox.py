@@ -0,0 +1,87 @@
+"""
+Почтовый ящик кадров сессии: "последний кадр побеждает"
+Пока кадр сессии обрабатывается, следующий ждет в единственном слоте; более новый кадр
+вытесняет ждущий (тот сразу получает ответ skipped). Очередь из устаревших кадров не копится,
+а при свободной мощности обрабатывается каждый кадр.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+# Сигналы ждущему кадру (LocalEngine: кадр обрабатывает поток, который его прислал)
+TURN = 'turn'
+DROPPED = 'dropped'
+
+# Окно для расчета фактического FPS обработки, секунды
+FPS_WINDOW = 2.0
+
+
+class MailboxEntry:
+    __slots__ = ('payload', 'future')
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.future = Future()
+
+
+class FrameMailbox:
+    """Один обрабатываемый кадр + один ждущий (самый свежий)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._busy = False
+        self._pending: Optional[MailboxEntry] = None
+        self._done_at = deque(maxlen=64)
+
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def offer(self, payload) -> Tuple[MailboxEntry, bool]:
+        """Кладет кадр. True - ящик был свободен и кадр нужно обработать сразу"""
+        with self._lock:
+            self.received += 1
+            entry = MailboxEntry(payload)
+            if not self._busy:
+                self._busy = True
+                return entry, True
+
+            replaced, self._pending = self._pending, entry
+            if replaced is not None:
+                self.dropped += 1
+        if replaced is not None:
+            replaced.future.set_result(DROPPED)
+        return entry, False
+
+    def complete(self, processed: bool = True) -> Optional[MailboxEntry]:
+        """Кадр обработан (processed=False - пропущен по интервалу или ошибка).
+        Возвращает следующий ждущий кадр (ящик остается занятым) или None"""
+        with self._lock:
+            if processed:
+                self.processed += 1
+                self._done_at.append(time.monotonic())
+            entry, self._pending = self._pending, None
+            if entry is None:
+                self._busy = False
+            return entry
+
+    def processed_fps(self) -> float:
+        with self._lock:
+            if len(self._done_at) < 2:
+                return 0.0
+            now = time.monotonic()
+            recent = [t for t in self._done_at if now - t <= FPS_WINDOW]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(recent[-1] - recent[0], 1e-6)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "processed_fps": round(self.processed_fps(), 1),
+            "frames_received": self.received,
+            "frames_processed": self.processed,
+            "frames_dropped": self.dropped
+        }
@@ -0,0 +1,410 @@
+"""
+Пул процессов инференса с привязкой сессий к воркерам
+Каждый воркер - отдельный процесс со своими графами MediaPipe Hands/Pose и своим реестром сессий.
+Трекинг MediaPipe (static_image_mode=False) и состояние упражнения зависят от предыдущих кадров,
+поэтому все кадры одной сессии всегда уходят в один и тот же воркер (crc32(session_id) % N).
+
+Пре-форк (LFK_WORKER_START_METHOD=forkserver): cv2, MediaPipe и упражнения один раз импортирует
+однопоточный сервер форков, воркеры - его копии при записи. Воркер (и перезапущенный тоже) не тратит
+секунду на импорт, а страницы модулей общие для всех воркеров. Графы MediaPipe каждый воркер строит
+и прогревает сам до первой задачи (потоки TFLite нельзя унаследовать через fork).
+"""
+
+import gc
+import importlib
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+import zlib
+from multiprocessing.connection import wait as wait_connections
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, wait as wait_futures
+from typing import Any, Dict, List, Tuple
+
+from config import (INFERENCE_TIMEOUT, SESSION_MAX, SESSION_IDLE_TTL, WORKER_QUEUE_LIMIT, WORKER_START_METHOD,
+                    PREDICT_SKIPPED, PRELOAD)
+from engine import merge_stats, dropped_response, notify_state, resolve_future, get_exercise_list
+from frame_controller import IntervalController, load_monitor
+from frame_mailbox import FrameMailbox, TURN
+from metrics import stage_metrics, merge_snapshots
+from sessions import SessionRegistry
+from state_watch import StateWatch
+
+log = logging.getLogger('LFK')
+
+# Служебные операции воркера (не относятся к конкретной сессии)
+OP_STATS = '_stats'
+OP_EVICT = '_evict'
+OP_METRICS = '_metrics'
+OP_PRELOAD = '_preload'
+
+# Модули, которые импортирует родитель воркеров при пре-форке (fork/forkserver)
+PREFORK_MODULES = ('exercise_manager',)
+
+# Поля кадра, нужные ответу по модели движения (без самого кадра)
+PREDICT_KEYS = ('exercise_type', 'state_version', 'mark_completed')
+
+
+def _worker_main(worker_idx, inbox, results):
+    """Цикл воркера: операции выполняются последовательно, как в однопроцессном режиме"""
+    # results - собственный канал воркера: при падении одного воркера общий lock очереди
+    # не останется захваченным и остальные воркеры продолжат отвечать
+    # Объекты, унаследованные от родителя при fork, - в постоянное поколение: сборщик мусора
+    # не пишет в их заголовки, и страницы остаются общими
+    gc.freeze()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Интервал кадров регулирует родительский процесс - воркер обрабатывает все, что получил
+    load_monitor.gating = False
+    logging.basicConfig(level=logging.INFO,
+                        format=f'[%(levelname)-8s] [worker {worker_idx}] %(message)s')
+
+    from engine import LocalEngine
+    engine = LocalEngine()
+    # Графы строятся до первой задачи - и при старте пула, и при перезапуске упавшего воркера
+    if PRELOAD:
+        try:
+            engine.preload()
+        except Exception as e:
+            log.error(f"Воркер {worker_idx}: ошибка загрузки моделей: {e}")
+    log.info(f"Воркер {worker_idx} запущен")
+
+    evict_interval = max(1.0, min(60.0, SESSION_IDLE_TTL / 2))
+    while True:
+        try:
+            job = inbox.get(timeout=evict_interval)
+        except queue.Empty:
+            engine.evict_idle()
+            continue
+        if job is None:
+            break
+
+        job_id, op, session_id, payload = job
+        if op == OP_STATS:
+            reply = engine.raw_stats()
+        elif op == OP_EVICT:
+            reply = engine.evict_idle()
+        elif op == OP_METRICS:
+            reply = engine.metrics()
+        elif op == OP_PRELOAD:
+            try:
+                reply = engine.preload()
+            except Exception as e:
+                reply = {"status": "error", "message": str(e)}, 500
+        else:
+            reply = engine.call(op, session_id, payload)
+        results.send((job_id, reply))
+
+    engine.shutdown()
+    log.info(f"Воркер {worker_idx} остановлен")
+
+
+class InferencePool:
+    """Пул процессов с тем же интерфейсом, что и LocalEngine"""
+
+    def __init__(self, workers: int, timeout: float = INFERENCE_TIMEOUT,
+                 queue_limit: int = WORKER_QUEUE_LIMIT, start_method: str = WORKER_START_METHOD):
+        self.workers = workers
+        self.timeout = timeout
+        self.queue_limit = queue_limit
+        self.start_method = start_method
+
+        self._ctx = None
+        self._procs = []
+        self._inboxes = []
+        self._readers = []
+        self._pending: Dict[int, Tuple[Future, int]] = {}
+        self._inflight = [0] * workers
+        # Номер последней задачи на момент (пере)запуска воркера
+        self._spawn_seq = [0] * workers
+        self._lock = threading.Lock()
+        self._job_seq = 0
+        self._closed = False
+        self._collector = None
+
+        # Почтовый ящик и интервал кадров сессий: в воркер уходит не больше одного кадра сессии
+        # за раз, пока он обрабатывается, ждет только самый свежий
+        self.frame_sessions = SessionRegistry(lambda session_id: (FrameMailbox(), IntervalController()),
+                                              max_sessions=SESSION_MAX, idle_ttl=SESSION_IDLE_TTL)
+        # Long-poll состояния: версии приходят в ответах воркеров
+        self.watch = StateWatch()
+
+        self.restarts = 0
+        self.rejected = 0
+        self.frames_dropped = 0
+        self.frames_skipped = 0
+        # Обработанные кадры и их время по часам фронтенда (с очередью воркера) - для /health
+        self.frames_processed = 0
+        self.processing_time_total = 0.0
+
+    # ============ ЖИЗНЕННЫЙ ЦИКЛ ============
+
+    def start(self):
+        self._ctx = multiprocessing.get_context(self.start_method)
+        if self.start_method == 'forkserver':
+            self._ctx.set_forkserver_preload(list(PREFORK_MODULES))
+        elif self.start_method == 'fork':
+            for name in PREFORK_MODULES:
+                importlib.import_module(name)
+        for idx in range(self.workers):
+            self._procs.append(None)
+            self._inboxes.append(None)
+            self._readers.append(None)
+            self._spawn(idx)
+
+        self._collector = threading.Thread(target=self._collect, name='lfk-pool-collector', daemon=True)
+        self._collector.start()
+        log.info(f"Пул инференса запущен: {self.workers} воркеров ({self.start_method})")
+        return self
+
+    def _spawn(self, idx):
+        inbox = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(target=_worker_main, args=(idx, inbox, writer),
+                                 name=f'lfk-worker-{idx}', daemon=True)
+        proc.start()
+        writer.close()
+        with self._lock:
+            old_reader = self._readers[idx]
+            self._inboxes[idx] = inbox
+            self._readers[idx] = reader
+            self._procs[idx] = proc
+            self._spawn_seq[idx] = self._job_seq
+        if old_reader is not None:
+            old_reader.close()
+
+    def preload(self) -> Dict[str, float]:
+        """Ждет загрузки во всех воркерах; время этапов - по самому медленному воркеру"""
+        timings = {}
+        # Без таймаута: построение графов дольше таймаута кадра, а упавший воркер ответит ошибкой
+        replies = self._broadcast(OP_PRELOAD, timeout=None)
+        if len(replies) < self.workers:
+            raise RuntimeError(f"загрузились {len(replies)} из {self.workers} воркеров")
+        for reply in replies:
+            for stage, seconds in reply.items():
+                timings[stage] = max(timings.get(stage, 0.0), seconds)
+        started = time.perf_counter()
+        get_exercise_list()
+        timings['exercises'] = time.perf_counter() - started
+        return timings
+
+    def shutdown(self):
+        self._closed = True
+        for inbox in self._inboxes:
+            if inbox is not None:
+                inbox.put(None)
+        for proc in self._procs:
+            if proc is not None:
+                proc.join(timeout=5)
+                if proc.is_alive():
+                    proc.terminate()
+
+    # ============ МАРШРУТИЗАЦИЯ ============
+
+    def worker_for(self, session_id: str) -> int:
+        return zlib.crc32(session_id.encode('utf-8')) % self.workers
+
+    def _send(self, worker_idx: int, op: str, session_id: str, payload, limit: bool) -> Future:
+        future = Future()
+        with self._lock:
+            if limit and self._inflight[worker_idx] >= self.queue_limit:
+                self.rejected += 1
+                future.set_result(({"status": "error", "message": "Processor busy"}, 503))
+                return future
+            self._job_seq += 1
+            job_id = self._job_seq
+            self._pending[job_id] = (future, worker_idx)
+            self._inflight[worker_idx] += 1
+            # Под блокировкой: перезапуск воркера не должен подменить очередь между регистрацией и отправкой
+            self._inboxes[worker_idx].put((job_id, op, session_id, payload))
+        return future
+
+    def submit(self, op: str, session_id: str, payload: Dict[str, Any] = None) -> Future:
+        if op == 'process':
+            future = self._submit_frame(session_id, payload or {})
+        else:
+            future = self._send(self.worker_for(session_id), op, session_id, payload or {}, limit=True)
+        if op != 'state':
+            future.add_done_callback(lambda done: done.cancelled() or
+                                     notify_state(self.watch, session_id, done.result()))
+        return future
+
+    def _submit_frame(self, session_id: str, payload: Dict[str, Any]) -> Future:
+        mailbox, controller = self.frame_sessions.get(session_id)
+        result = Future()
+        if not controller.should_process():
+            with self._lock:
+                self.frames_skipped += 1
+            if not PREDICT_SKIPPED:
+                result.set_result((dropped_response(payload.get('exercise_type'), dropped=False), 200))
+                return result
+            # Пропущенный кадр отвечает воркер сессии по модели движения - сам кадр не пересылается
+            predict = {key: payload[key] for key in PREDICT_KEYS if key in payload}
+            job = self._send(self.worker_for(session_id), 'predict', session_id, predict, limit=True)
+
+            def on_predicted(job_future):
+                reply, status = job_future.result()
+                if status != 200:
+                    reply, status = dropped_response(payload.get('exercise_type'), dropped=False), 200
+                resolve_future(result, (reply, status))
+
+            job.add_done_callback(on_predicted)
+            return result
+
+        started = time.perf_counter()
+        entry, run_now = mailbox.offer(payload)
+
+        def on_turn(signal):
+            if signal.result() == TURN:
+                self._dispatch_frame(session_id, mailbox, controller, entry.payload, result, started)
+            else:
+                with self._lock:
+                    self.frames_dropped += 1
+                resolve_future(result, (dropped_response(entry.payload.get('exercise_type')), 200))
+
+        if run_now:
+            self._dispatch_frame(session_id, mailbox, controller, payload, result, started)
+        else:
+            entry.future.add_done_callback(on_turn)
+        return result
+
+    def _dispatch_frame(self, session_id: str, mailbox: FrameMailbox, controller: IntervalController,
+                        payload, result: Future, started: float):
+        job = self._send(self.worker_for(session_id), 'process', session_id, payload, limit=True)
+
+        def on_done(job_future):
+            reply, status = job_future.result()
+            processed = (status == 200 and isinstance(reply, dict) and reply.get('status') == 'success'
+                         and not reply.get('idle'))
+            following = mailbox.complete(processed)
+            try:
+                if isinstance(reply, dict) and status == 200:
+                    if processed:
+                        elapsed = (time.perf_counter() - started) * 1000
+                        controller.record(elapsed)
+                        with self._lock:
+                            self.frames_processed += 1
+                            self.processing_time_total += elapsed
+                    reply['pipeline'] = dict(mailbox.info(), **controller.info())
+                resolve_future(result, (reply, status))
+            finally:
+                # Очередь сессии движется дальше, даже если ответ этого кадра уже никто не ждет
+                if following is not None:
+                    following.future.set_result(TURN)
+
+        job.add_done_callback(on_done)
+
+    def call(self, op: str, session_id: str, payload: Dict[str, Any] = None) -> Tuple[Dict[str, Any], int]:
+        try:
+            return self.submit(op, session_id, payload).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            log.error(f"Таймаут операции {op} (сессия {session_id})")
+            return {"status": "error", "message": "Processing timeout"}, 504
+
+    def _broadcast(self, op: str, timeout: float = INFERENCE_TIMEOUT) -> List[Any]:
+        """Операция во все воркеры; один срок на всех: зависшие воркеры не складывают таймауты"""
+        futures = [self._send(idx, op, '', {}, limit=False) for idx in range(self.workers)]
+        done, _ = wait_futures(futures, timeout=timeout)
+        replies = []
+        for future in futures:
+            if future not in done:
+                continue
+            reply = future.result()
+            # (ответ, статус) - ошибка (воркер перезапускается, очередь занята)
+            if not isinstance(reply, tuple):
+                replies.append(reply)
+        return replies
+
+    # ============ СБОР РЕЗУЛЬТАТОВ ============
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while not self._closed:
+            with self._lock:
+                readers = [reader for reader in self._readers if reader is not None]
+
+            for reader in wait_connections(readers, timeout=1.0):
+                try:
+                    job_id, reply = reader.recv()
+                except (EOFError, OSError):
+                    # Воркер умер - канал закрыт, перезапуск сделает _check_workers
+                    last_check = 0.0
+                    continue
+
+                with self._lock:
+                    entry = self._pending.pop(job_id, None)
+                    if entry:
+                        self._inflight[entry[1]] -= 1
+                if entry:
+                    resolve_future(entry[0], reply)
+
+            now = time.monotonic()
+            if now - last_check >= 1.0:
+                last_check = now
+                self._check_workers()
+
+    def _check_workers(self):
+        for idx, proc in enumerate(self._procs):
+            if self._closed or proc is None or proc.is_alive():
+                continue
+
+            log.error(f"Воркер {idx} завершился (код {proc.exitcode}), перезапуск")
+            self.restarts += 1
+            self._spawn(idx)
+
+            # Задачи, отправленные погибшему воркеру, уже не вернутся
+            with self._lock:
+                lost = [(job_id, future) for job_id, (future, w) in self._pending.items()
+                        if w == idx and job_id <= self._spawn_seq[idx]]
+                for job_id, _ in lost:
+                    del self._pending[job_id]
+                self._inflight[idx] -= len(lost)
+            for _, future in lost:
+                resolve_future(future, ({"status": "error", "message": "Worker restarted"}, 503))
+
+    # ============ СТАТИСТИКА ============
+
+    def stats(self) -> Dict[str, Any]:
+        stats = merge_stats(self._broadcast(OP_STATS))
+        # Вытесненные кадры не доходят до воркеров
+        stats['frames_dropped'] += self.frames_dropped
+        stats['frames_skipped'] += self.frames_skipped
+        return stats
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            depth = list(self._inflight)
+        return {
+            "mode": "pool",
+            "workers": self.workers,
+            "alive": sum(1 for proc in self._procs if proc is not None and proc.is_alive()),
+            "queue_depth": depth,
+            "queue_limit": self.queue_limit,
+            "restarts": self.restarts,
+            "rejected": self.rejected
+        }
+
+    def metrics(self):
+        # Инференс - в воркерах, сериализация ответа - в процессе фронтенда
+        return merge_snapshots(self._broadcast(OP_METRICS) + [stage_metrics.snapshot()])
+
+    def current_exercise(self, session_id: str):
+        # Состояние сессий живет в воркерах - не блокируем /health запросом к ним
+        return None
+
+    def health_stats(self) -> Dict[str, Any]:
+        """Сводка для /health из счетчиков фронтенда: без запроса к воркерам (он ждал бы за кадрами
+        в их очередях); статистика воркеров - в /stats"""
+        with self._lock:
+            frames, total = self.frames_processed, self.processing_time_total
+        return {
+            "frames_processed": frames,
+            "avg_processing_time": round(total / frames, 1) if frames else 0,
+            "active_sessions": self.frame_sessions.info()['active'],
+            "workers": self.workers
+        }
+
+    def evict_idle(self) -> int:
+        self.frame_sessions.evict_idle()
+        return sum(reply for reply in self._broadcast(OP_EVICT) if isinstance(reply, int))
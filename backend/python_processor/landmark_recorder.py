@@ -0,0 +1,273 @@
+"""
+Запись landmarks сессий в компактный бинарный файл
+Включается переменной LFK_RECORD_DIR. На каждый кадр пишутся время, уверенность детекции
+и точки руки/позы. Кадры без руки/тела тоже пишутся (уверенность 0, точки NaN) - при
+воспроизведении таймеры упражнений видят те же пропуски, что и в живой сессии.
+
+Формат (little-endian), все массивы фиксированной ширины - файл читается через np.memmap без разбора:
+    заголовок файла   FILE_HEADER (16 байт)
+    блок *            CHUNK_HEADER (16 байт)
+                      timestamps  float64[frames]           - time.time() кадра
+                      confidence  float32[frames]           - NaN, если детектор ее не сообщил
+                      landmarks   float32[frames, points, 4] - x, y, z, visibility (нормализованные)
+                      выравнивание до 8 байт
+Блок содержит кадры одного вида (рука - 21 точка, поза - 33 точки); при смене упражнения
+начинается новый блок.
+
+Путь кадра только копирует точки в заранее выделенный массив. Заполненный блок уходит
+в ограниченную очередь фонового писателя; при переполнении очереди блок отбрасывается
+(с предупреждением в логе), а кадр не ждет диска.
+"""
+
+import logging
+import math
+import os
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from config import RECORD_DIR, RECORD_CHUNK_FRAMES, RECORD_QUEUE_LIMIT
+
+log = logging.getLogger('LFK.Recorder')
+
+FILE_MAGIC = b'LFKLMRK1'
+CHUNK_MAGIC = b'CHNK'
+FORMAT_VERSION = 1
+FILE_EXTENSION = '.lfkrec'
+
+FILE_HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('reserved', '<u4')])
+CHUNK_HEADER = np.dtype([('magic', 'S4'), ('kind', '<u4'), ('frames', '<u4'), ('points', '<u4')])
+
+# Вид блока -> (ключ кадра при воспроизведении, точек на кадр)
+KIND_HAND = 1
+KIND_POSE = 2
+KIND_POINTS = {KIND_HAND: 21, KIND_POSE: 33}
+KIND_NAMES = {KIND_HAND: 'hand', KIND_POSE: 'pose'}
+
+POINT_FIELDS = 4
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+def chunk_size(frames: int, points: int) -> int:
+    size = CHUNK_HEADER.itemsize + frames * (8 + 4) + frames * points * POINT_FIELDS * 4
+    return size + _padding(size)
+
+
+# ==================== ЗАПИСЬ ====================
+class RecordingWriter:
+    """Фоновый писатель блоков: один поток на процесс, ограниченная очередь"""
+
+    def __init__(self, queue_limit: int = RECORD_QUEUE_LIMIT):
+        self._queue = queue.Queue(maxsize=max(1, queue_limit))
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.chunks_written = 0
+        self.chunks_dropped = 0
+
+    def submit(self, path: str, data: bytes) -> bool:
+        """Блок в очередь без ожидания. False - очередь полна, блок отброшен"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((path, data))
+            return True
+        except queue.Full:
+            self.chunks_dropped += 1
+            log.warning(f"Очередь записи переполнена, блок {path} отброшен")
+            return False
+
+    def flush(self, timeout: float = 5.0):
+        """Дождаться записи всех блоков из очереди (остановка процесса)"""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='lfk-recorder', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            path, data = self._queue.get()
+            try:
+                with open(path, 'ab') as f:
+                    f.write(data)
+                self.chunks_written += 1
+            except OSError as e:
+                log.error(f"Ошибка записи {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "chunks_written": self.chunks_written,
+            "chunks_dropped": self.chunks_dropped,
+            "queue_depth": self._queue.qsize()
+        }
+
+
+# Писатель текущего процесса
+recording_writer = RecordingWriter()
+
+
+def _safe_name(session_id: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', session_id)[:64] or 'session'
+
+
+class SessionRecorder:
+    """Запись одной сессии: текущий блок в памяти, заполненные - фоновому писателю"""
+
+    def __init__(self, path: str, chunk_frames: int = RECORD_CHUNK_FRAMES,
+                 writer: RecordingWriter = None):
+        self.path = path
+        self.chunk_frames = max(1, chunk_frames)
+        self.writer = writer or recording_writer
+        self.frames_recorded = 0
+        self._header_pending = True
+        self._lock = threading.Lock()
+        self._kind = None
+        self._count = 0
+        self._timestamps = self._confidence = self._landmarks = None
+
+    @classmethod
+    def open(cls, session_id: str, directory: str = RECORD_DIR) -> Optional['SessionRecorder']:
+        """Запись сессии в directory или None, если запись выключена"""
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        name = f"{_safe_name(session_id)}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}{FILE_EXTENSION}"
+        return cls(os.path.join(directory, name))
+
+    def _allocate(self, kind: int):
+        points = KIND_POINTS[kind]
+        self._kind = kind
+        self._count = 0
+        self._timestamps = np.empty(self.chunk_frames, dtype='<f8')
+        self._confidence = np.empty(self.chunk_frames, dtype='<f4')
+        self._landmarks = np.full((self.chunk_frames, points, POINT_FIELDS), np.nan, dtype='<f4')
+
+    def record(self, kind: int, landmark_list=None, confidence: float = math.nan, timestamp: float = None):
+        """Кадр: landmark_list - точки руки/позы (с .landmark или массив x, y, z[, visibility]) или None"""
+        with self._lock:
+            if kind != self._kind:
+                self._flush_locked()
+                self._allocate(kind)
+
+            row = self._count
+            self._timestamps[row] = time.time() if timestamp is None else timestamp
+            if landmark_list is None:
+                self._confidence[row] = 0.0
+            else:
+                self._confidence[row] = confidence
+                points = self._landmarks[row]
+                if isinstance(landmark_list, np.ndarray):
+                    count = min(len(points), len(landmark_list))
+                    cols = min(POINT_FIELDS, landmark_list.shape[1])
+                    points[:count, :cols] = landmark_list[:count, :cols]
+                    if cols < POINT_FIELDS:
+                        points[:count, cols:] = 1.0
+                else:
+                    for i, lm in enumerate(landmark_list.landmark[:len(points)]):
+                        points[i] = (lm.x, lm.y, lm.z, getattr(lm, 'visibility', 1.0))
+
+            self._count += 1
+            self.frames_recorded += 1
+            if self._count == self.chunk_frames:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._count:
+            return
+        frames, points = self._count, KIND_POINTS[self._kind]
+        header = np.zeros(1, dtype=CHUNK_HEADER)
+        header[0] = (CHUNK_MAGIC, self._kind, frames, points)
+
+        parts = []
+        if self._header_pending:
+            file_header = np.zeros(1, dtype=FILE_HEADER)
+            file_header[0] = (FILE_MAGIC, FORMAT_VERSION, 0)
+            parts.append(file_header.tobytes())
+        parts += [header.tobytes(), self._timestamps[:frames].tobytes(),
+                  self._confidence[:frames].tobytes(), self._landmarks[:frames].tobytes()]
+        size = sum(len(p) for p in parts[-4:])
+        parts.append(b'\0' * _padding(size))
+
+        # Заголовок файла уходит с первым принятым блоком
+        if self.writer.submit(self.path, b''.join(parts)):
+            self._header_pending = False
+        # Буферы переиспользуются: tobytes() уже скопировал данные
+        self._landmarks[:frames] = np.nan
+        self._count = 0
+
+    def close(self):
+        """Отдать неполный блок писателю (сессия закрыта или вытеснена)"""
+        with self._lock:
+            self._flush_locked()
+            self._kind = None
+
+
+# ==================== ЧТЕНИЕ ====================
+class RecordedChunk(NamedTuple):
+    kind: int
+    timestamps: np.ndarray   # (frames,) float64
+    confidence: np.ndarray   # (frames,) float32
+    landmarks: np.ndarray    # (frames, points, 4) float32
+
+
+def read_chunks(path: str) -> Iterator[RecordedChunk]:
+    """Блоки записи - представления над np.memmap, без копирования.
+    Недописанный последний блок (процесс упал во время записи) пропускается"""
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(data) < FILE_HEADER.itemsize:
+        raise ValueError(f"{path}: not a landmark recording")
+    file_header = data[:FILE_HEADER.itemsize].view(FILE_HEADER)[0]
+    if file_header['magic'] != FILE_MAGIC:
+        raise ValueError(f"{path}: not a landmark recording")
+    if file_header['version'] != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported recording version {file_header['version']}")
+
+    offset = FILE_HEADER.itemsize
+    while offset + CHUNK_HEADER.itemsize <= len(data):
+        header = data[offset:offset + CHUNK_HEADER.itemsize].view(CHUNK_HEADER)[0]
+        frames, points = int(header['frames']), int(header['points'])
+        if header['magic'] != CHUNK_MAGIC or offset + chunk_size(frames, points) > len(data):
+            log.warning(f"{path}: поврежденный блок на смещении {offset}, чтение остановлено")
+            return
+
+        pos = offset + CHUNK_HEADER.itemsize
+        timestamps = data[pos:pos + frames * 8].view('<f8')
+        pos += frames * 8
+        confidence = data[pos:pos + frames * 4].view('<f4')
+        pos += frames * 4
+        landmarks = data[pos:pos + frames * points * POINT_FIELDS * 4].view('<f4')
+        yield RecordedChunk(int(header['kind']), timestamps, confidence,
+                            landmarks.reshape(frames, points, POINT_FIELDS))
+        offset += chunk_size(frames, points)
+
+
+def iter_frames(path: str) -> Iterator[Dict[str, Any]]:
+    """Кадры записи в формате exercises.replay ({"t": ..., "hand" | "pose": [[x, y, z, v], ...]})"""
+    for chunk in read_chunks(path):
+        key = KIND_NAMES.get(chunk.kind)
+        for t, confidence, points in zip(chunk.timestamps, chunk.confidence, chunk.landmarks):
+            frame = {"t": float(t)}
+            if key is not None and confidence != 0.0:
+                # Точки, которых не было у источника (поза с клиента - только нос и плечи), - NaN
+                valid = ~np.isnan(points[:, 0])
+                last = int(np.nonzero(valid)[0][-1]) + 1 if valid.any() else 0
+                frame[key] = points[:last].tolist()
+                if not math.isnan(confidence):
+                    frame["confidence"] = float(confidence)
+            yield frame
@@ -0,0 +1,68 @@
+"""
+Настройка логирования процессора (общая для Flask и ASGI фронтендов)
+"""
+
+import logging
+from datetime import datetime
+
+
+class ColoredTableFormatter(logging.Formatter):
+    """Форматтер с цветами и табличным выводом"""
+    grey = "\x1b[38;20m"
+    blue = "\x1b[34;20m"
+    cyan = "\x1b[36;20m"
+    yellow = "\x1b[33;20m"
+    red = "\x1b[31;20m"
+    bold_red = "\x1b[31;1m"
+    green = "\x1b[32;20m"
+    reset = "\x1b[0m"
+
+    LEVEL_WIDTH = 10
+    TIME_WIDTH = 23
+
+    def format(self, record):
+        level_colors = {
+            logging.DEBUG: self.cyan,
+            logging.INFO: self.green,
+            logging.WARNING: self.yellow,
+            logging.ERROR: self.red,
+            logging.CRITICAL: self.bold_red
+        }
+        level_color = level_colors.get(record.levelno, self.grey)
+        level_name = f"{record.levelname}".ljust(self.LEVEL_WIDTH - 2)
+        level_colored = f"{level_color}[{level_name}]{self.reset}"
+        timestamp = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
+        timestamp_colored = f"{self.blue}[{timestamp}]{self.reset}"
+        duration = ""
+        if hasattr(record, 'duration'):
+            duration = f"{self.yellow}[{record.duration:>8}ms]{self.reset} "
+        message = record.getMessage()
+        return f"{level_colored} {timestamp_colored} {duration}{message}"
+
+
+
+def setup_logging():
+    """Настраивает логгер LFK и приглушает болтливые библиотеки"""
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger('LFK')
+    logger.setLevel(logging.INFO)  # INFO вместо DEBUG для скорости
+
+    logger.handlers.clear()
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_formatter = ColoredTableFormatter()
+    console_handler.setFormatter(console_formatter)
+    logger.addHandler(console_handler)
+
+    # Файловый логгер - отключаем для скорости на HDD
+    # file_handler = logging.FileHandler('lfk_python.log')
+    # file_handler.setLevel(logging.INFO)
+    # file_formatter = logging.Formatter('[%(levelname)s] [%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    # file_handler.setFormatter(file_formatter)
+    # logger.addHandler(file_handler)
+
+    # Отключаем лишние логи
+    for name in ('werkzeug', 'socketio', 'engineio', 'mediapipe', 'uvicorn.access'):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    return logger
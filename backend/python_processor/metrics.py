@@ -0,0 +1,124 @@
+"""
+Метрики процессора: гистограммы времени этапов обработки кадра
+Формат вывода - текстовый формат Prometheus (/metrics).
+На горячем пути только perf_counter() и инкремент счетчика корзины под коротким lock,
+без внешних зависимостей. В режиме пула каждый воркер копит свои гистограммы,
+фронтенд собирает снимки и складывает их (как merge_stats для /stats).
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Этапы обработки кадра
+STAGE_BASE64 = 'base64_decode'
+STAGE_IMDECODE = 'imdecode'
+STAGE_RESIZE = 'resize'
+STAGE_GATE = 'motion_gate'
+STAGE_COLOR = 'color_convert'
+STAGE_INFERENCE = 'inference'
+STAGE_EXERCISE = 'exercise_logic'
+STAGE_DRAW = 'draw'
+STAGE_ENCODE = 'jpeg_encode'
+STAGE_JSON = 'json_serialize'
+STAGE_TOTAL = 'total'
+
+# Счетчики кадров из ExerciseManager.stats: суммируются по сессиям и воркерам (/stats)
+# и выводятся в /metrics как lfk_<счетчик>_total
+STAT_COUNTERS = ('frames_processed', 'hands_detected', 'pose_detected', 'frames_skipped',
+                 'frames_dropped', 'landmarks_processed', 'roi_frames', 'roi_fallbacks',
+                 'frames_predicted', 'frames_gated', 'frames_idle', 'face_frames', 'face_fallbacks')
+
+# Границы корзин, секунды (от долей миллисекунды до секунды)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# (этап, упражнение) -> [счетчики корзин..., +Inf, сумма, количество]
+Snapshot = Dict[Tuple[str, str], List[float]]
+
+
+class StageHistograms:
+    """Гистограммы времени этапов с метками stage / exercise"""
+
+    def __init__(self, buckets: Iterable[float] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self._data: Snapshot = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, exercise: str, seconds: float):
+        idx = bisect_left(self.buckets, seconds)
+        key = (stage, exercise)
+        with self._lock:
+            series = self._data.get(key)
+            if series is None:
+                series = self._data[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[idx] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def snapshot(self) -> Snapshot:
+        with self._lock:
+            return {key: list(series) for key, series in self._data.items()}
+
+
+# Гистограммы текущего процесса
+stage_metrics = StageHistograms()
+
+
+def merge_snapshots(parts: Iterable[Snapshot]) -> Snapshot:
+    merged: Snapshot = {}
+    for part in parts:
+        for key, series in part.items():
+            total = merged.get(key)
+            if total is None:
+                merged[key] = list(series)
+            else:
+                for i, value in enumerate(series):
+                    total[i] += value
+    return merged
+
+
+def _labels(**labels) -> str:
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def render_prometheus(snapshot: Snapshot, stats: Dict[str, Any] = None,
+                      buckets: Tuple[float, ...] = BUCKETS) -> str:
+    """Текст для /metrics: гистограммы этапов и счетчики из /stats"""
+    lines = [
+        "# HELP lfk_stage_duration_seconds Время этапа обработки кадра",
+        "# TYPE lfk_stage_duration_seconds histogram",
+    ]
+    for (stage, exercise), series in sorted(snapshot.items()):
+        labels = _labels(stage=stage, exercise=exercise)
+        cumulative = 0
+        for bound, count in zip(buckets, series):
+            cumulative += count
+            lines.append(f'lfk_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += series[len(buckets)]
+        lines.append(f'lfk_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f'lfk_stage_duration_seconds_sum{{{labels}}} {series[-2]:.6f}')
+        lines.append(f'lfk_stage_duration_seconds_count{{{labels}}} {series[-1]}')
+
+    if stats:
+        for key in STAT_COUNTERS:
+            if key in stats:
+                lines.append(f"# TYPE lfk_{key}_total counter")
+                lines.append(f"lfk_{key}_total {stats[key]}")
+
+        sessions = stats.get('sessions', {})
+        lines.append("# TYPE lfk_sessions_active gauge")
+        lines.append(f"lfk_sessions_active {sessions.get('active', 0)}")
+        lines.append("# TYPE lfk_sessions_evicted_total counter")
+        lines.append(f"lfk_sessions_evicted_total {sessions.get('evicted', 0)}")
+
+        pool = stats.get('pool', {})
+        if pool.get('workers'):
+            lines.append("# TYPE lfk_worker_queue_depth gauge")
+            for idx, depth in enumerate(pool.get('queue_depth', [])):
+                lines.append(f'lfk_worker_queue_depth{{{_labels(worker=idx)}}} {depth}')
+            lines.append("# TYPE lfk_worker_restarts_total counter")
+            lines.append(f"lfk_worker_restarts_total {pool.get('restarts', 0)}")
+            lines.append("# TYPE lfk_frames_rejected_total counter")
+            lines.append(f"lfk_frames_rejected_total {pool.get('rejected', 0)}")
+
+    return '\n'.join(lines) + '\n'
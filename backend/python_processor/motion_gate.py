@@ -0,0 +1,58 @@
+"""
+Пропуск инференса на неподвижных кадрах
+Пациент держит кулак 2.5 с - кадры почти одинаковые, а MediaPipe каждый раз считает заново.
+Перед инференсом кадр уменьшается до миниатюры в оттенках серого (64-127 px по ширине) и сравнивается
+с миниатюрой последнего кадра, на котором инференс был: при средней разнице ниже порога берутся
+прежние результаты. Подряд результаты переиспользуются не больше MOTION_GATE_MAX_REUSE раз -
+медленный дрейф руки не накапливается.
+"""
+
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from config import MOTION_GATE, MOTION_GATE_THRESHOLD, MOTION_GATE_MAX_REUSE
+
+# Кадр уменьшается вдвое, пока ширина не станет меньше 2 * THUMBNAIL_WIDTH
+THUMBNAIL_WIDTH = 64
+
+
+class MotionGate:
+    """Сравнение кадра сессии с последним кадром, прошедшим инференс"""
+
+    def __init__(self, enabled: bool = MOTION_GATE, threshold: float = MOTION_GATE_THRESHOLD,
+                 max_reuse: int = MOTION_GATE_MAX_REUSE):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.reference: Optional[np.ndarray] = None
+        self.reused = 0
+
+    def thumbnail(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """BGR-кадр -> миниатюра uint8 в оттенках серого (None - сравнение выключено)"""
+        if not self.enabled:
+            return None
+        # Уменьшение вдвое INTER_LINEAR - среднее 2x2, шум камеры усредняется как у INTER_AREA,
+        # но в 2 раза быстрее (640x360: ~0.17 мс против ~0.4 мс)
+        while image.shape[1] >= 2 * THUMBNAIL_WIDTH and image.shape[0] >= 2:
+            image = cv2.resize(image, (image.shape[1] // 2, image.shape[0] // 2), interpolation=cv2.INTER_LINEAR)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def still(self, thumbnail: Optional[np.ndarray]) -> bool:
+        """True - кадр почти не изменился с последнего инференса, можно взять его результаты"""
+        reference = self.reference
+        if thumbnail is None or reference is None or reference.shape != thumbnail.shape:
+            return False
+        if self.reused >= self.max_reuse:
+            return False
+        # Средняя абсолютная разница яркости на пиксель (0-255)
+        if cv2.norm(thumbnail, reference, cv2.NORM_L1) / thumbnail.size >= self.threshold:
+            return False
+        self.reused += 1
+        return True
+
+    def inferred(self, thumbnail: Optional[np.ndarray]):
+        """Инференс выполнен на кадре с этой миниатюрой"""
+        self.reference = thumbnail
+        self.reused = 0
@@ -0,0 +1,66 @@
+"""
+Модель движения точек сессии для пропущенных кадров
+Под нагрузкой контроллер интервала пропускает кадры (frame_controller.py). Вместо пустого ответа
+"skipped" пропущенный кадр получает точки, экстраполированные от последних детекций с постоянной
+скоростью (скорость сглажена EWMA), и упражнение обрабатывает их как обычный кадр - таймеры
+удержания идут, клиент не видит мигания "рука не найдена".
+
+Экстраполяция ограничена по времени: после PREDICT_MAX_GAP без детекции предсказания нет,
+а горизонт сдвига - PREDICT_HORIZON (дальше точки стоят на месте, а не улетают по инерции).
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from config import PREDICT_SKIPPED, PREDICT_MAX_GAP
+
+# Сглаживание скорости: доля новой оценки
+VELOCITY_ALPHA = 0.5
+# Горизонт экстраполяции, секунды
+PREDICT_HORIZON = 0.2
+
+
+class MotionModel:
+    """Постоянная скорость по последним детекциям одной сессии"""
+
+    def __init__(self, enabled: bool = PREDICT_SKIPPED, max_gap: float = PREDICT_MAX_GAP):
+        self.enabled = enabled
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self.kind = None
+        self.points: Optional[np.ndarray] = None
+        self.velocity: Optional[np.ndarray] = None
+        self.time = 0.0
+
+    def observe(self, kind: str, points: np.ndarray, now: float):
+        """Детекция: точки (N, 3) или (N, 4) с visibility в нормализованных координатах кадра"""
+        if not self.enabled:
+            return
+        points = np.array(points, dtype=np.float32)
+        dt = now - self.time
+        if self.points is None or self.kind != kind or self.points.shape != points.shape \
+                or dt <= 0 or dt > self.max_gap:
+            velocity = np.zeros_like(points)
+        else:
+            velocity = (points - self.points) / dt
+            velocity = velocity if self.velocity is None else \
+                self.velocity + VELOCITY_ALPHA * (velocity - self.velocity)
+        # visibility не экстраполируется
+        velocity[:, 3:] = 0.0
+        self.kind, self.points, self.velocity, self.time = kind, points, velocity, now
+
+    def lost(self):
+        """Кадр без детекции: пропущенные кадры тоже без руки/тела"""
+        self.reset()
+
+    def predict(self, kind: str, now: float) -> Optional[np.ndarray]:
+        """Точки в момент now или None (нет свежей детекции этого вида)"""
+        if not self.enabled or self.points is None or self.kind != kind:
+            return None
+        dt = now - self.time
+        if dt < 0 or dt > self.max_gap:
+            return None
+        return self.points + self.velocity * min(dt, PREDICT_HORIZON)
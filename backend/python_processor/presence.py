@@ -0,0 +1,52 @@
+"""
+Присутствие пациента в кадре
+Пациент отошел от телефона - кадры продолжают идти, и каждый проходит полный инференс, рисование
+плашки "NO HAND" и кодирование JPEG. После PRESENCE_IDLE_AFTER кадров подряд без руки/тела сессия
+переходит в режим ожидания: инференс - не чаще раза в PRESENCE_PROBE_INTERVAL секунд, остальные
+кадры получают короткий ответ "по-прежнему нет" без декодирования и кодирования кадра.
+Первая же детекция возвращает обычный режим.
+"""
+
+import time
+
+from config import PRESENCE_IDLE_AFTER, PRESENCE_PROBE_INTERVAL
+
+
+class Presence:
+    """Счетчик промахов детекции одной сессии"""
+
+    def __init__(self, idle_after: int = PRESENCE_IDLE_AFTER, probe_interval: float = PRESENCE_PROBE_INTERVAL):
+        self.idle_after = idle_after
+        self.probe_interval = probe_interval
+        self.reset()
+
+    def reset(self):
+        self.misses = 0
+        self.idle = False
+        self.probed_at = 0.0
+
+    def should_probe(self, now: float = None) -> bool:
+        """Нужен ли инференс на этом кадре (в обычном режиме - всегда)"""
+        if not self.idle:
+            return True
+        now = time.monotonic() if now is None else now
+        if now - self.probed_at < self.probe_interval:
+            return False
+        self.probed_at = now
+        return True
+
+    def detected(self) -> bool:
+        """Детекция на кадре; True - сессия вышла из режима ожидания"""
+        woke = self.idle
+        self.misses = 0
+        self.idle = False
+        return woke
+
+    def missed(self, now: float = None) -> bool:
+        """Кадр без детекции; True - сессия только что перешла в режим ожидания"""
+        self.misses += 1
+        if self.idle or self.idle_after <= 0 or self.misses < self.idle_after:
+            return False
+        self.idle = True
+        self.probed_at = time.monotonic() if now is None else now
+        return True
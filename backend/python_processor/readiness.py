@@ -0,0 +1,76 @@
+"""
+Готовность процессора к приему кадров
+Импорт cv2/MediaPipe и построение графов Hands/Pose занимают секунды. Фронтенд отвечает на /health
+сразу (процесс жив), а загрузка идет в фоновом потоке; /ready отвечает 200 только после нее -
+балансировщик не отправляет первого пациента на процессор, который еще строит графы.
+Время этапов загрузки видно в /ready и в логе.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from config import PRELOAD
+
+log = logging.getLogger('LFK')
+
+# Момент импорта модуля - практически старт процесса (фронтенды импортируют его первыми)
+PROCESS_STARTED = time.monotonic()
+
+
+class Readiness:
+    """Состояние загрузки процесса: этапы, время, ошибка"""
+
+    def __init__(self):
+        self._ready = threading.Event()
+        self._thread = None
+        # Этап -> секунды
+        self.stages: Dict[str, float] = {}
+        self.ready_after = None
+        self.error = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def start(self, load: Callable[[], Dict[str, float]], enabled: bool = PRELOAD):
+        """Запускает load() в фоне; выключенная загрузка - процессор готов сразу (все лениво)"""
+        if not enabled:
+            self._set_ready()
+            return
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(load,), name='lfk-preload', daemon=True)
+        self._thread.start()
+
+    def _run(self, load):
+        try:
+            self.stages.update(load())
+        except Exception as e:
+            self.error = str(e)
+            log.error(f"Ошибка загрузки моделей: {e}")
+            return
+        self._set_ready()
+        stages = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.stages.items())
+        log.info(f"Процессор готов через {self.ready_after:.1f}с после старта ({stages})")
+
+    def _set_ready(self):
+        self.ready_after = time.monotonic() - PROCESS_STARTED
+        self._ready.set()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime": round(time.monotonic() - PROCESS_STARTED, 1),
+            "ready_after": round(self.ready_after, 2) if self.ready_after is not None else None,
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+            "error": self.error
+        }
+
+
+# Один на процесс фронтенда
+readiness = Readiness()
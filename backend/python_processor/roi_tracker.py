@@ -0,0 +1,78 @@
+"""
+Слежение за областью руки/головы между кадрами сессии (ROI)
+После уверенной детекции запоминается рамка точек: рука - все 21 точка, поза - нос и плечи.
+Следующий кадр подается в MediaPipe вырезанным по расширенной квадратной рамке: меньше пикселей
+на перевод в RGB, копирование в граф и поиск ладони/лица. Точки из вырезки переводятся обратно
+в нормализованные координаты всего кадра, поэтому упражнения и отрисовка разницы не видят.
+Если в вырезке ничего не найдено, кадр сразу обрабатывается целиком, а слежение сбрасывается.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from config import ROI_TRACKING, ROI_MIN_SCORE, ROI_MAX_AREA
+
+# Расширение рамки точек (по большей стороне): раскрытая ладонь больше кулака,
+# а голова при повороте уходит в сторону от плеч
+ROI_SCALE = {'hand': 2.5, 'pose': 2.2}
+# Меньше этой стороны (пиксели кадра инференса) вырезка не делается - детектору нужен контекст
+ROI_MIN_SIDE = 96
+
+Box = Tuple[int, int, int, int]
+
+
+class RoiTracker:
+    """Рамка последней уверенной детекции одной сессии"""
+
+    def __init__(self, enabled: bool = ROI_TRACKING):
+        self.enabled = enabled
+        self.kind = None
+        # (x0, y0, x1, y1) точек в нормализованных координатах кадра
+        self.bounds = None
+
+    def reset(self):
+        self.kind = None
+        self.bounds = None
+
+    def update(self, kind: str, points: np.ndarray, score: float):
+        """Точки детекции (N, 2+) в координатах кадра и ее оценка; неуверенная детекция сбрасывает рамку"""
+        if not self.enabled or not score >= ROI_MIN_SCORE:
+            self.reset()
+            return
+        xy = points[:, :2]
+        x0, y0 = xy.min(axis=0).tolist()
+        x1, y1 = xy.max(axis=0).tolist()
+        self.kind = kind
+        self.bounds = (x0, y0, x1, y1)
+
+    def crop_box(self, kind: str, w: int, h: int) -> Optional[Box]:
+        """Пиксельная рамка вырезки для кадра w x h или None - обрабатывать кадр целиком"""
+        if self.bounds is None or self.kind != kind:
+            return None
+        x0, y0, x1, y1 = self.bounds
+        side = max((x1 - x0) * w, (y1 - y0) * h, 1.0) * ROI_SCALE[kind]
+        side = max(side, ROI_MIN_SIDE)
+        cx, cy = (x0 + x1) * 0.5 * w, (y0 + y1) * 0.5 * h
+
+        left, top = max(0, int(cx - side / 2)), max(0, int(cy - side / 2))
+        right, bottom = min(w, int(cx + side / 2) + 1), min(h, int(cy + side / 2) + 1)
+        # Рамка вне кадра или почти весь кадр - выигрыша нет
+        if right - left < 2 or bottom - top < 2:
+            return None
+        if (right - left) * (bottom - top) > ROI_MAX_AREA * w * h:
+            return None
+        return left, top, right, bottom
+
+
+def to_frame(landmark_list, box: Box, w: int, h: int):
+    """Точки MediaPipe из координат вырезки box в координаты кадра w x h (на месте)"""
+    x0, y0, x1, y1 = box
+    sx, sy = (x1 - x0) / w, (y1 - y0) / h
+    ox, oy = x0 / w, y0 / h
+    for p in landmark_list.landmark:
+        p.x = p.x * sx + ox
+        p.y = p.y * sy + oy
+        # z в масштабе ширины изображения
+        p.z = p.z * sx
+    return landmark_list
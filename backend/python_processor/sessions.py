@@ -0,0 +1,155 @@
+"""
+Реестр сессий процессора
+Каждая сессия (пользователь / Socket.IO клиент) владеет своим состоянием упражнений.
+Память ограничена: LRU по числу сессий + вытеснение по времени простоя.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('LFK.Sessions')
+
+DEFAULT_SESSION_ID = "default"
+
+
+def resolve_session_id(data=None, header=None, query=None) -> str:
+    """Идентификатор сессии: тело запроса, заголовок X-Session-ID или query-параметр"""
+    session_id = None
+    if isinstance(data, dict):
+        session_id = data.get('session_id') or data.get('user_id')
+    if not session_id:
+        session_id = header or query
+    return str(session_id) if session_id else DEFAULT_SESSION_ID
+
+
+class SessionRegistry:
+    """Потокобезопасный реестр сессий с LRU и idle-TTL вытеснением"""
+
+    def __init__(self, factory: Callable[[str], Any], max_sessions: int = 5000,
+                 idle_ttl: float = 600.0, on_evict: Optional[Callable[[str, Any], None]] = None):
+        self._factory = factory
+        self._sessions: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict
+
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Any:
+        """Возвращает сессию, создавая её при первом обращении"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                evicted = self._touch_locked(session_id, entry[0])
+        if entry is not None:
+            self._notify(evicted)
+            return entry[0]
+
+        # Новая сессия строится без lock (ExerciseManager, запись сессии): запросы других сессий
+        # ее не ждут. Если ту же сессию успел создать параллельный запрос, берется его сессия
+        created = self._factory(session_id)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                session = created
+                self.created += 1
+            else:
+                session = entry[0]
+            evicted = self._touch_locked(session_id, session)
+
+        if session is not created:
+            self._discard(session_id, created)
+        self._notify(evicted)
+        return session
+
+    def _touch_locked(self, session_id: str, session: Any) -> List[Tuple[str, Any]]:
+        now = time.monotonic()
+        self._sessions[session_id] = (session, now)
+        self._sessions.move_to_end(session_id)
+        return self._evict_locked(now)
+
+    def peek(self, session_id: str) -> Optional[Any]:
+        """Возвращает сессию без создания и без обновления времени доступа"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry[0] if entry else None
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return False
+        self._notify([(session_id, entry[0])])
+        return True
+
+    def evict_idle(self) -> int:
+        """Принудительный проход вытеснения (вызывается фоновым потоком)"""
+        with self._lock:
+            evicted = self._evict_locked(time.monotonic())
+        self._notify(evicted)
+        return len(evicted)
+
+    def _evict_locked(self, now: float) -> List[Tuple[str, Any]]:
+        evicted = []
+
+        # Самые старые по доступу - в начале словаря
+        while len(self._sessions) > self.max_sessions:
+            session_id, (session, _) = self._sessions.popitem(last=False)
+            evicted.append((session_id, session))
+
+        if self.idle_ttl > 0:
+            while self._sessions:
+                session_id, (session, last_seen) = next(iter(self._sessions.items()))
+                if now - last_seen < self.idle_ttl:
+                    break
+                self._sessions.popitem(last=False)
+                evicted.append((session_id, session))
+
+        self.evicted += len(evicted)
+        return evicted
+
+    def _notify(self, evicted: List[Tuple[str, Any]]):
+        for session_id, session in evicted:
+            logger.debug(f"Сессия вытеснена: {session_id}")
+            if self.on_evict:
+                try:
+                    self.on_evict(session_id, session)
+                except Exception as e:
+                    logger.error(f"Ошибка при вытеснении сессии {session_id}: {e}")
+
+    def _discard(self, session_id: str, session: Any):
+        """Лишняя копия сессии, проигравшая гонку создания: в реестр не попала, закрывается как вытесненная"""
+        logger.debug(f"Параллельно созданная сессия отброшена: {session_id}")
+        if self.on_evict:
+            try:
+                self.on_evict(session_id, session)
+            except Exception as e:
+                logger.error(f"Ошибка при закрытии сессии {session_id}: {e}")
+
+    def sessions(self) -> List[Any]:
+        with self._lock:
+            return [entry[0] for entry in self._sessions.values()]
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            active = len(self._sessions)
+        return {
+            "active": active,
+            "max_sessions": self.max_sessions,
+            "idle_ttl": self.idle_ttl,
+            "created": self.created,
+            "evicted": self.evicted
+        }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
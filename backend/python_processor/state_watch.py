@@ -0,0 +1,57 @@
+"""
+Ожидание изменения состояния сессии (long-poll /exercise_state и get_state_only)
+Движок после каждой операции над сессией сообщает версию structured-состояния из ответа;
+ждущий клиент получает Future, который завершается, когда версия стала отличаться от его версии.
+Future одинаково ждут и потоки Flask (result(timeout)), и event loop (asyncio.wrap_future).
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+
+class StateWatch:
+    """Ждущие изменения состояния по сессиям"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, List[Tuple[Optional[int], Future]]] = {}
+
+    def watch(self, session_id: str, since_version: Optional[int]) -> Future:
+        """Future завершится при следующем изменении состояния сессии относительно since_version"""
+        future = Future()
+        with self._lock:
+            self._waiters.setdefault(session_id, []).append((since_version, future))
+        return future
+
+    def cancel(self, session_id: str, future: Future):
+        """Снять ожидание (ответ уже отправлен или истек таймаут)"""
+        with self._lock:
+            waiters = self._waiters.get(session_id)
+            if not waiters:
+                return
+            waiters[:] = [entry for entry in waiters if entry[1] is not future]
+            if not waiters:
+                del self._waiters[session_id]
+
+    def notify(self, session_id: str, version: Optional[int] = None):
+        """Состояние сессии могло измениться. version None - неизвестно, будим всех ждущих"""
+        # Без ждущих - только проверка словаря (вызывается на каждый кадр)
+        if session_id not in self._waiters:
+            return
+        with self._lock:
+            waiters = self._waiters.pop(session_id, None)
+            if not waiters:
+                return
+            woken, remaining = [], []
+            for entry in waiters:
+                (woken if version is None or entry[0] != version else remaining).append(entry)
+            if remaining:
+                self._waiters[session_id] = remaining
+        for _, future in woken:
+            if not future.done():
+                future.set_result(version)
+
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(len(waiters) for waiters in self._waiters.values())